@@ -1,74 +1,168 @@
 from fastapi import FastAPI, Request, Depends
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 from pathlib import Path
 from contextlib import asynccontextmanager
-from .routes import inventario, remisiones, auth, dashboard
-from .models.database import create_tables, engine_async as engine, Base
-from .routes.auth import obtener_usuario_actual
+from sqlalchemy.orm import configure_mappers
+from .models import cargar_modelos
+from .models.database import create_tables, close_engines
+from .servicios.eventos import bus_remisiones
+from .servicios.facturacion_mensual import detener_corridas
+from .servicios.programador import programador
+from .servicios.metricas import MiddlewareMetricas, registro as registro_metricas, Indicador
+from .servicios.compresion import MiddlewareCompresion
+from .servicios.condicional import NoModificado, responder_no_modificado
+from .servicios.plantillas import templates, precompilar
+from .servicios.estaticos import EstaticosInmutables
+from .servicios import cache
 import asyncio
+import time
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Duración de cada fase de crear_app() en este worker (ver scripts/perfil_arranque.py)
+duracion_arranque = registro_metricas.registrar(Indicador(
+    "aps_arranque_segundos", "Duración de las fases de arranque de la aplicación", ("fase",)))
 
 # Contexto de ciclo de vida de la aplicación
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Inicializar base de datos al inicio
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await create_tables()
+    # Compilar (o leer del bytecode en disco) las plantillas antes de atender
+    precompilar()
+    # Facturas vencidas, alertas de stock bajo y de entregas atrasadas
+    programador.iniciar()
     yield
-    # Cualquier limpieza necesaria al apagar la aplicación puede ir aquí
+    # Detener las tareas programadas
+    await programador.detener()
+    # Terminar los flujos de eventos abiertos para no retrasar el apagado
+    bus_remisiones.cerrar()
+    # Las corridas de facturación se reanudan desde su último bloque confirmado
+    await detener_corridas()
+    # Cerrar las conexiones de los pools al apagar la aplicación
+    await close_engines()
 
-# Crear la aplicación FastAPI
-app = FastAPI(
-    title="APS - Sistema Administrativo",
-    description="Sistema de gestión para el Asilo Perpetuo Socorro",
-    version="0.8.0",
-    lifespan=lifespan
-)
+def registrar_routers(app: FastAPI) -> None:
+    # Las rutas se importan aquí y no al importar este módulo; el orden de
+    # registro es fijo
+    from .routes import inventario, remisiones, auth, dashboard, busqueda, facturacion, alertas, exportaciones, importaciones
+    from .servicios import tareas  # Registra las tareas programadas
 
-# Configurar archivos estáticos y templates
-BASE_DIR = Path(__file__).resolve().parent
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
-# Ruta principal
-@app.get("/")
-async def pagina_principal(
-    request: Request
-):
-    try:
-        usuario = await obtener_usuario_actual(request)
-        # Si el usuario está autenticado, redirigir al dashboard
-        return RedirectResponse(url="/dashboard")
-    except Exception:
-        # Si no hay usuario autenticado, mostrar página principal
+    # Incluir las rutas de inventario, remisiones, facturación, autenticación, dashboard y búsqueda
+    app.include_router(inventario.router)
+    app.include_router(remisiones.router)
+    app.include_router(facturacion.router)
+    app.include_router(auth.router, prefix="/auth", tags=["autenticación"])
+    app.include_router(dashboard.router, tags=["dashboard"])
+    app.include_router(busqueda.router)
+    app.include_router(alertas.router)
+    app.include_router(exportaciones.router)
+    app.include_router(importaciones.router)
+
+def registrar_paginas(app: FastAPI) -> None:
+    from .routes.auth import obtener_usuario_actual
+
+    # Ruta principal
+    @app.get("/")
+    async def pagina_principal(
+        request: Request
+    ):
+        try:
+            usuario = await obtener_usuario_actual(request)
+            # Si el usuario está autenticado, redirigir al dashboard
+            return RedirectResponse(url="/dashboard")
+        except Exception:
+            # Si no hay usuario autenticado, mostrar página principal
+            return templates.TemplateResponse(
+                "index.html",
+                {"request": request, "titulo": "Bienvenido al Sistema APS"}
+            )
+
+    # Ruta de login
+    @app.get("/login")
+    async def login(request: Request):
         return templates.TemplateResponse(
-            "index.html",
-            {"request": request, "titulo": "Bienvenido al Sistema APS"}
+            "login.html",
+            {"request": request, "titulo": "Iniciar Sesión"}
         )
 
-# Ruta de login
-@app.get("/login")
-async def login(request: Request):
-    return templates.TemplateResponse(
-        "login.html", 
-        {"request": request, "titulo": "Iniciar Sesión"}
+    # Verificación del estado de la API
+    @app.get("/estado")
+    async def verificar_estado():
+        return {
+            "estado": "activo",
+            "version": "1.0.0",
+            "nombre": "Sistema Administrativo APS"
+        }
+
+    # Aciertos, fallos y tamaño de las cachés de lectura de este worker
+    @app.get("/estado/cache")
+    async def estado_cache():
+        return cache.estadisticas()
+
+    # Duración del arranque de este worker, por fase
+    @app.get("/estado/arranque")
+    async def estado_arranque():
+        return app.state.arranque
+
+    # Métricas de este worker en formato de texto de Prometheus
+    @app.get("/metrics", include_in_schema=False)
+    async def metricas():
+        return PlainTextResponse(registro_metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def crear_app() -> FastAPI:
+    # Fábrica de la aplicación; `uvicorn app.src.main:crear_app --factory`
+    # crea una por worker
+    fases = {}
+    inicio = time.perf_counter()
+
+    # Crear la aplicación FastAPI
+    app = FastAPI(
+        title="APS - Sistema Administrativo",
+        description="Sistema de gestión para el Asilo Perpetuo Socorro",
+        version="0.8.0",
+        lifespan=lifespan
     )
 
-# Verificación del estado de la API
-@app.get("/estado")
-async def verificar_estado():
-    return {
-        "estado": "activo",
-        "version": "1.0.0",
-        "nombre": "Sistema Administrativo APS"
-    }
-
-# Incluir las rutas de inventario, remisiones, autenticación y dashboard
-app.include_router(inventario.router)
-app.include_router(remisiones.router)
-app.include_router(auth.router, prefix="/auth", tags=["autenticación"])
-app.include_router(dashboard.router, tags=["dashboard"])
+    # Compresión gzip/br de las respuestas grandes (no de los flujos SSE)
+    app.add_middleware(MiddlewareCompresion)
+    # Latencia, errores y consultas por ruta; cabecera Server-Timing
+    app.add_middleware(MiddlewareMetricas)
+
+    # 304 de las peticiones condicionales (ver servicios/condicional.py)
+    app.add_exception_handler(NoModificado, responder_no_modificado)
+
+    # Configurar archivos estáticos (las plantillas son las de servicios/plantillas.py);
+    # los de static/dist llevan huella y se sirven como inmutables
+    app.mount("/static", EstaticosInmutables(directory=str(BASE_DIR / "static")), name="static")
+
+    fase = time.perf_counter()
+    registrar_paginas(app)
+    registrar_routers(app)
+    fases["rutas"] = time.perf_counter() - fase
+
+    # Configurar los mappers aquí y no con la primera consulta: una relación
+    # mal declarada falla al arrancar, siempre en el mismo punto, y ninguna
+    # petición paga la configuración
+    fase = time.perf_counter()
+    cargar_modelos()
+    configure_mappers()
+    fases["mappers"] = time.perf_counter() - fase
+
+    fases["total"] = time.perf_counter() - inicio
+    for nombre, segundos in fases.items():
+        duracion_arranque.fijar(segundos, fase=nombre)
+    app.state.arranque = {nombre: round(segundos, 4) for nombre, segundos in fases.items()}
+    return app
+
+def __getattr__(nombre):
+    # `app` se crea al pedirla por primera vez (uvicorn app.src.main:app, los
+    # scripts) y no al importar el módulo: con --factory, o en quien llama a
+    # crear_app(), la aplicación se construye una sola vez
+    if nombre == "app":
+        globals()["app"] = crear_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 if __name__ == "__main__":
     import uvicorn
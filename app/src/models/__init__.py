@@ -1,38 +1,90 @@
-from .database import Base, engine_sync as engine, get_db, create_tables
-from .colaboradores import Colaborador, TipoColaborador
-from .residentes import Residente, TipoSangre, EstadoResidente
-from .inventario import Producto, MovimientoInventario, CategoriaProducto, UnidadMedida
-from .remisiones import (
-    Remision, 
-    TipoRemision, 
-    EstadoRemision, 
-    SeguimientoRemision, 
-    TipoEvento,
-    TrazabilidadProfesional
+import importlib
+
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+
+# Los modelos se importan al pedirlos (PEP 562): `from app.src.models import
+# Producto` carga solo models/inventario.py y un proceso que solo usa la base
+# de datos no paga la importación de todos los módulos. Lo que necesita el
+# esquema completo (create_all, las migraciones, los triggers y la
+# configuración de los mappers, que resuelve las relaciones por nombre) llama
+# antes a cargar_modelos().
+MODULOS_MODELOS = (
+    "colaboradores",
+    "residentes",
+    "inventario",
+    "remisiones",
+    "facturacion",
+    "tareas",
+    "versiones",
+    "busqueda",  # Registra el índice de búsqueda de texto completo
 )
 
+# módulo -> nombres que exporta el paquete
+_EXPORTADOS = {
+    "database": ("Base", "engine", "get_db", "get_db_async", "get_db_escritura",
+                 "AsyncSessionEscritura", "AsyncSessionLocal", "create_tables"),
+    "colaboradores": ("Colaborador", "TipoColaborador"),
+    "residentes": ("Residente", "TipoSangre", "EstadoResidente"),
+    "inventario": ("Producto", "MovimientoInventario", "CategoriaProducto", "UnidadMedida"),
+    "remisiones": ("Remision", "TipoRemision", "EstadoRemision", "SeguimientoRemision",
+                   "TipoEvento", "TrazabilidadProfesional", "ContadorRemision"),
+    "facturacion": ("Factura", "DetalleFactura", "EstadoFactura", "CorridaFacturacion", "EstadoCorrida"),
+    "tareas": ("Alerta", "TipoAlerta", "BloqueoTarea"),
+    "versiones": ("VersionTabla",),
+}
+_ALIAS = {"engine": "engine_sync"}
+_MODULO_DE = {nombre: modulo for modulo, nombres in _EXPORTADOS.items() for nombre in nombres}
+
+def __getattr__(nombre):
+    modulo = _MODULO_DE.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f".{modulo}", __name__), _ALIAS.get(nombre, nombre))
+    globals()[nombre] = valor
+    return valor
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+def cargar_modelos() -> None:
+    # Importa todos los modelos en un orden fijo
+    for modulo in MODULOS_MODELOS:
+        importlib.import_module(f".{modulo}", __name__)
+
+@event.listens_for(Mapper, "before_configured")
+def _cargar_antes_de_configurar():
+    # Los mappers se configuran con la primera consulta: si para entonces
+    # falta algún modelo, una relationship("Factura") no encontraría su clase
+    cargar_modelos()
+
 __all__ = [
     # Database
     "Base",
     "engine",
     "get_db",
+    "get_db_async",
+    "get_db_escritura",
+    "AsyncSessionEscritura",
+    "AsyncSessionLocal",
     "create_tables",
-    
+    "cargar_modelos",
+
     # Colaboradores
     "Colaborador",
     "TipoColaborador",
-    
+
     # Residentes
     "Residente",
     "TipoSangre",
     "EstadoResidente",
-    
+
     # Inventario
     "Producto",
     "MovimientoInventario",
     "CategoriaProducto",
     "UnidadMedida",
-    
+
     # Remisiones
     "Remision",
     "TipoRemision",
@@ -40,4 +92,20 @@ __all__ = [
     "SeguimientoRemision",
     "TipoEvento",
     "TrazabilidadProfesional",
+    "ContadorRemision",
+
+    # Facturación
+    "Factura",
+    "DetalleFactura",
+    "EstadoFactura",
+    "CorridaFacturacion",
+    "EstadoCorrida",
+
+    # Tareas programadas
+    "Alerta",
+    "TipoAlerta",
+    "BloqueoTarea",
+
+    # Respuestas condicionales
+    "VersionTabla",
 ]
@@ -0,0 +1,94 @@
+from sqlalchemy import event, text
+from .database import Base
+
+# Índice de texto completo (SQLite FTS5) sobre residentes, productos y
+# remisiones. No es un modelo ORM: es una tabla virtual que mantienen
+# actualizada los triggers definidos abajo.
+#
+# El rowid codifica la entidad: rowid = id * 4 + código de tipo, de modo que
+# los triggers actualizan o borran una fila por clave primaria.
+TABLA_BUSQUEDA = "indice_busqueda"
+
+TIPOS_BUSQUEDA = {
+    "residente": 1,
+    "producto": 2,
+    "remision": 3,
+}
+
+# Columnas indexadas por tipo: (tabla, columnas que disparan la
+# reindexación, expresión del título, expresión del contenido)
+_FUENTES = {
+    "residente": (
+        "residentes",
+        "nombre, apellido_paterno, apellido_materno, numero_expediente, alergias, condiciones_medicas",
+        "{t}.nombre || ' ' || {t}.apellido_paterno || ' ' || coalesce({t}.apellido_materno, '')",
+        "{t}.numero_expediente || ' ' || coalesce({t}.alergias, '') || ' ' || coalesce({t}.condiciones_medicas, '')",
+    ),
+    "producto": (
+        "productos",
+        "codigo, nombre, descripcion",
+        "{t}.codigo || ' ' || {t}.nombre",
+        "coalesce({t}.descripcion, '')",
+    ),
+    "remision": (
+        "remisiones",
+        "numero_remision, institucion_destino, motivo, diagnostico_envio",
+        "{t}.numero_remision || ' ' || {t}.institucion_destino",
+        "{t}.motivo || ' ' || {t}.diagnostico_envio || ' ' || {t}.institucion_destino",
+    ),
+}
+
+def _insertar(tipo, alias):
+    tabla, _, titulo, contenido = _FUENTES[tipo]
+    return (
+        f"INSERT INTO {TABLA_BUSQUEDA}(rowid, tipo, titulo, contenido) "
+        f"VALUES ({alias}.id * 4 + {TIPOS_BUSQUEDA[tipo]}, '{tipo}', "
+        f"{titulo.format(t=alias)}, {contenido.format(t=alias)});"
+    )
+
+def _borrar(tipo, alias):
+    return f"DELETE FROM {TABLA_BUSQUEDA} WHERE rowid = {alias}.id * 4 + {TIPOS_BUSQUEDA[tipo]};"
+
+def _sentencias_triggers():
+    for tipo, (tabla, columnas, _, _) in _FUENTES.items():
+        yield (
+            f"CREATE TRIGGER IF NOT EXISTS {tabla}_busqueda_ai AFTER INSERT ON {tabla} "
+            f"BEGIN {_insertar(tipo, 'new')} END"
+        )
+        yield (
+            f"CREATE TRIGGER IF NOT EXISTS {tabla}_busqueda_au AFTER UPDATE OF {columnas} ON {tabla} "
+            f"BEGIN {_borrar(tipo, 'old')} {_insertar(tipo, 'new')} END"
+        )
+        yield (
+            f"CREATE TRIGGER IF NOT EXISTS {tabla}_busqueda_ad AFTER DELETE ON {tabla} "
+            f"BEGIN {_borrar(tipo, 'old')} END"
+        )
+
+def reconstruir_indice_busqueda(conn):
+    # Vuelve a poblar el índice completo desde las tablas de origen
+    conn.execute(text(f"DELETE FROM {TABLA_BUSQUEDA}"))
+    for tipo, (tabla, _, titulo, contenido) in _FUENTES.items():
+        conn.execute(text(
+            f"INSERT INTO {TABLA_BUSQUEDA}(rowid, tipo, titulo, contenido) "
+            f"SELECT t.id * 4 + {TIPOS_BUSQUEDA[tipo]}, '{tipo}', "
+            f"{titulo.format(t='t')}, {contenido.format(t='t')} FROM {tabla} t"
+        ))
+
+@event.listens_for(Base.metadata, "after_create")
+def crear_indice_busqueda(target, conn, **kw):
+    existe = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+        {"nombre": TABLA_BUSQUEDA},
+    ).first()
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_BUSQUEDA} USING fts5("
+        "tipo UNINDEXED, titulo, contenido, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    for sentencia in _sentencias_triggers():
+        conn.execute(text(sentencia))
+
+    # Bases de datos con datos previos: indexar lo que ya existe
+    if not existe:
+        reconstruir_indice_busqueda(conn)
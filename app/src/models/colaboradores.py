@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, Enum
-from .database import Base
+from sqlalchemy import Column, Integer, String, Boolean, Date, Enum, text
+from .database import Base, migracion
 import enum
 import hashlib
+import hmac
 import secrets
 
 class TipoColaborador(enum.Enum):
@@ -36,26 +37,81 @@ class Colaborador(Base):
     # Nuevos campos para autenticación
     contrasena = Column(String(255), nullable=False)
     rol = Column(Enum(RolAcceso), nullable=False)
+    # Segundos desde la época: los tokens emitidos antes quedan revocados
+    # (cierre de sesión). Se guarda en la base para que valga en todos los
+    # workers y tras un reinicio.
+    sesiones_validas_desde = Column(Integer, nullable=False, default=0, server_default="0")
 
     def verificar_contrasena(self, contrasena_ingresada):
         # Hashear la contraseña ingresada y comparar
-        salt, hash_guardado = self.contrasena.split('$')
-        hash_ingresado = hashlib.pbkdf2_hmac(
-            'sha256', 
-            contrasena_ingresada.encode(), 
-            salt.encode(), 
-            100000
-        ).hex()
-        return hash_ingresado == hash_guardado
+        return verificar_hash(contrasena_ingresada, self.contrasena)
+
+    def necesita_rehash(self):
+        # True si el hash se generó con un formato o iteraciones anteriores
+        return necesita_rehash(self.contrasena)
+
+    def tiene_contrasena(self):
+        # False mientras no se le asigne una (colaboradores importados)
+        return not self.contrasena.startswith(CONTRASENA_INUTILIZABLE)
 
     @staticmethod
     def hashear_contrasena(contrasena):
         # Método estático para hashear contraseñas con salt
-        salt = secrets.token_hex(16)  # Generar un salt aleatorio
-        hash_contrasena = hashlib.pbkdf2_hmac(
-            'sha256', 
-            contrasena.encode(), 
-            salt.encode(), 
-            100000
-        ).hex()
-        return f"{salt}${hash_contrasena}"
+        return hashear_contrasena(contrasena)
+
+@migracion(4)
+def _revocacion_de_sesiones(conn):
+    columnas = {fila[1] for fila in conn.execute(text("PRAGMA table_info(colaboradores)"))}
+    if "sesiones_validas_desde" not in columnas:
+        conn.execute(text(
+            "ALTER TABLE colaboradores ADD COLUMN sesiones_validas_desde INTEGER NOT NULL DEFAULT 0"
+        ))
+
+# Formato versionado del hash: pbkdf2_sha256$<iteraciones>$<salt>$<hash>.
+# Los hashes antiguos "<salt>$<hash>" se interpretan con 100000 iteraciones.
+# Para endurecer el hash basta con subir ITERACIONES_PBKDF2: las contraseñas
+# se re-hashean al siguiente inicio de sesión correcto.
+ALGORITMO_HASH = "pbkdf2_sha256"
+ITERACIONES_PBKDF2 = 100000
+ITERACIONES_LEGADO = 100000
+# Marca de contraseña inutilizable: no es un hash y ninguna contraseña la
+# verifica. Los colaboradores importados la tienen hasta que un
+# administrador les asigna una contraseña.
+CONTRASENA_INUTILIZABLE = "!"
+
+def _derivar(contrasena, salt, iteraciones):
+    return hashlib.pbkdf2_hmac(
+        'sha256',
+        contrasena.encode(),
+        salt.encode(),
+        iteraciones
+    ).hex()
+
+def _descomponer_hash(hash_guardado):
+    partes = hash_guardado.split('$')
+    if len(partes) == 2:
+        salt, valor = partes
+        return ITERACIONES_LEGADO, salt, valor
+    if len(partes) == 4 and partes[0] == ALGORITMO_HASH:
+        return int(partes[1]), partes[2], partes[3]
+    raise ValueError("Formato de hash de contraseña desconocido")
+
+def hashear_contrasena(contrasena, iteraciones=ITERACIONES_PBKDF2):
+    salt = secrets.token_hex(16)  # Generar un salt aleatorio
+    return f"{ALGORITMO_HASH}${iteraciones}${salt}${_derivar(contrasena, salt, iteraciones)}"
+
+def verificar_hash(contrasena, hash_guardado):
+    if hash_guardado.startswith(CONTRASENA_INUTILIZABLE):
+        return False
+    iteraciones, salt, valor = _descomponer_hash(hash_guardado)
+    # Comparación en tiempo constante
+    return hmac.compare_digest(_derivar(contrasena, salt, iteraciones), valor)
+
+def necesita_rehash(hash_guardado):
+    if hash_guardado.startswith(CONTRASENA_INUTILIZABLE):
+        return False
+    try:
+        iteraciones, _, _ = _descomponer_hash(hash_guardado)
+    except ValueError:
+        return True
+    return not hash_guardado.startswith(f"{ALGORITMO_HASH}$") or iteraciones < ITERACIONES_PBKDF2
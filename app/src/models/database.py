@@ -1,8 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from typing import AsyncGenerator, Generator
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 import logging
 
@@ -11,7 +11,7 @@ from pathlib import Path
 
 # Obtener la ruta absoluta al directorio actual
 BASE_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = BASE_DIR / 'aps.db'
+DB_PATH = Path(os.getenv("APS_DB_PATH", str(BASE_DIR / 'aps.db')))
 
 # Asegurar que el directorio de la base de datos exista
 os.makedirs(DB_PATH.parent, exist_ok=True)
@@ -20,11 +20,84 @@ os.makedirs(DB_PATH.parent, exist_ok=True)
 SQLALCHEMY_DATABASE_URL_ASYNC = f"sqlite+aiosqlite:///{DB_PATH}"
 SQLALCHEMY_DATABASE_URL_SYNC = f"sqlite:///{DB_PATH}"
 
-# Motor asíncrono
+# Perfiles de almacenamiento. "wal" permite que las lecturas (dashboard,
+# listados) continúen mientras se registran movimientos o facturas;
+# "compatibilidad" conserva el journal clásico de SQLite.
+PERFILES_ALMACENAMIENTO = {
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,      # milisegundos
+        "cache_size": -20000,      # negativo = KiB (≈20 MB por conexión)
+        "mmap_size": 268435456,    # 256 MB
+        "lectores": 5,
+    },
+    "compatibilidad": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "lectores": 1,
+    },
+}
+
+def cargar_perfil_almacenamiento() -> dict:
+    # El perfil se elige con APS_PERFIL_ALMACENAMIENTO y cada valor puede
+    # sobrescribirse con APS_SQLITE_<NOMBRE>, p. ej. APS_SQLITE_BUSY_TIMEOUT=10000
+    nombre = os.getenv("APS_PERFIL_ALMACENAMIENTO", "wal")
+    if nombre not in PERFILES_ALMACENAMIENTO:
+        raise ValueError(f"Perfil de almacenamiento desconocido: {nombre}")
+
+    perfil = dict(PERFILES_ALMACENAMIENTO[nombre])
+    for clave, valor in perfil.items():
+        variable = os.getenv(f"APS_SQLITE_{clave.upper()}")
+        if variable is not None:
+            perfil[clave] = type(valor)(variable)
+    return perfil
+
+PERFIL_ALMACENAMIENTO = cargar_perfil_almacenamiento()
+
+PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size")
+
+def _configurar_conexion(dbapi_connection, connection_record):
+    # Aplicar los pragmas del perfil a cada conexión nueva del pool
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}={PERFIL_ALMACENAMIENTO[pragma]}")
+    cursor.close()
+
+def _desactivar_begin_del_driver(dbapi_connection, connection_record):
+    # El driver emite BEGIN diferido solo antes de un DML; lo desactivamos
+    # para que el escritor controle su propia transacción
+    dbapi_connection.isolation_level = None
+
+def _begin_inmediato(conn):
+    # El escritor toma el bloqueo de escritura al iniciar la transacción,
+    # así lectura-verificación-escritura ocurre sin que otro proceso se cuele
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+# Motor asíncrono de lectura: pool de varias conexiones que, con WAL,
+# no esperan a que termine una escritura
 engine_async = create_async_engine(
     SQLALCHEMY_DATABASE_URL_ASYNC,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=PERFIL_ALMACENAMIENTO["lectores"],
+    max_overflow=0,
+    echo=False
+)
+
+# Motor asíncrono de escritura: una única conexión, de modo que las
+# escrituras del proceso se serializan en la cola del pool y no compiten
+# por el bloqueo de SQLite
+engine_async_escritura = create_async_engine(
+    SQLALCHEMY_DATABASE_URL_ASYNC,
+    connect_args={"check_same_thread": False},
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=30,
     echo=False
 )
 
@@ -32,10 +105,16 @@ engine_async = create_async_engine(
 engine_sync = create_engine(
     SQLALCHEMY_DATABASE_URL_SYNC,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool
+    poolclass=QueuePool
 )
 
-# Crear la sesión asíncrona
+for _motor in (engine_async.sync_engine, engine_async_escritura.sync_engine, engine_sync):
+    event.listen(_motor, "connect", _configurar_conexion)
+
+event.listen(engine_async_escritura.sync_engine, "connect", _desactivar_begin_del_driver)
+event.listen(engine_async_escritura.sync_engine, "begin", _begin_inmediato)
+
+# Crear la sesión asíncrona de lectura
 AsyncSessionLocal = async_sessionmaker(
     bind=engine_async,
     class_=AsyncSession,
@@ -44,6 +123,18 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+# Crear la sesión asíncrona de escritura. Las cachés de lectura no la
+# atienden (servicios/cache.py): lo que verifica antes de escribir se lee de
+# la base dentro de la misma transacción
+AsyncSessionEscritura = async_sessionmaker(
+    bind=engine_async_escritura,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+    info={"escritura": True}
+)
+
 # Crear la sesión síncrona
 SessionLocal = sessionmaker(
     bind=engine_sync,
@@ -54,7 +145,9 @@ SessionLocal = sessionmaker(
 # Crear la base para los modelos
 Base = declarative_base()
 
-# Función para obtener la sesión de base de datos asíncrona
+# Función para obtener la sesión de base de datos asíncrona.
+# Es la dependencia que deben usar todos los routers: las consultas se ejecutan
+# sin bloquear el bucle de eventos de uvicorn.
 async def get_db_async() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
@@ -66,7 +159,21 @@ async def get_db_async() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
-# Función para obtener la sesión de base de datos síncrona
+# Función para obtener la sesión de escritura asíncrona.
+# Usarla en los endpoints que insertan, actualizan o eliminan filas.
+async def get_db_escritura() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionEscritura() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+# Función para obtener la sesión de base de datos síncrona.
+# Reservada para scripts de línea de comandos; no usar dentro de handlers async.
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
@@ -80,10 +187,58 @@ def get_db() -> Generator[Session, None, None]:
 
 # Función para eliminar todas las tablas
 async def drop_tables():
-    async with engine_async.begin() as conn:
+    from . import cargar_modelos
+    cargar_modelos()
+    async with engine_async_escritura.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
 
+# Migraciones de datos versionadas con PRAGMA user_version. Cada modelo
+# registra las suyas con @migracion(n); se aplican en orden tras create_all.
+# Una base de datos recién creada ya tiene el esquema actual y solo se marca
+# con la última versión.
+MIGRACIONES = {}
+
+def migracion(version: int):
+    def registrar(funcion):
+        if version in MIGRACIONES:
+            raise ValueError(f"Migración {version} duplicada")
+        MIGRACIONES[version] = funcion
+        return funcion
+    return registrar
+
+@event.listens_for(Base.metadata, "after_create")
+def aplicar_migraciones(target, conn, tables=(), **kw):
+    if not MIGRACIONES:
+        return
+    ultima = max(MIGRACIONES)
+    actual = conn.execute(text("PRAGMA user_version")).scalar()
+    if actual >= ultima:
+        return
+
+    base_nueva = len(tables) == len(target.sorted_tables)
+    if not base_nueva:
+        for version in sorted(MIGRACIONES):
+            if version > actual:
+                MIGRACIONES[version](conn)
+    conn.execute(text(f"PRAGMA user_version = {ultima}"))
+
+# create_all no agrega índices nuevos a tablas que ya existen;
+# esta función los crea en bases de datos anteriores
+def create_missing_indexes(conn):
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(conn, checkfirst=True)
+
 # Función para crear todas las tablas
 async def create_tables():
-    async with engine_async.begin() as conn:
+    # El esquema, las migraciones y los triggers los registran los módulos de modelos
+    from . import cargar_modelos
+    cargar_modelos()
+    async with engine_async_escritura.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+
+# Función para cerrar los pools de conexiones al apagar la aplicación
+async def close_engines():
+    await engine_async.dispose()
+    await engine_async_escritura.dispose()
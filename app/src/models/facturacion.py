@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Text, ForeignKey, Boolean, Numeric
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Text, ForeignKey, Boolean, Numeric, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from .database import Base
+from sqlalchemy.types import TypeDecorator
+from datetime import timezone
+from .database import Base, migracion
 from .residentes import Residente
 from .inventario import Suministro
 import enum
@@ -12,21 +14,49 @@ class EstadoFactura(enum.Enum):
     VENCIDA = "vencida"
     CANCELADA = "cancelada"
 
+# Los vencimientos se guardan en UTC sin zona horaria (SQLite no la guarda y
+# compara las fechas como texto). Una fecha con zona, al guardarla o al
+# compararla con la columna, se pasa antes a UTC: `fecha_vencimiento <
+# datetime.now(timezone.utc)` compara lo mismo sea cual sea la zona del
+# servidor o la de la fecha recibida.
+class FechaUTC(TypeDecorator):
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def coerce_compared_value(self, op, value):
+        return self
+
 class Factura(Base):
     __tablename__ = "facturas"
 
     id = Column(Integer, primary_key=True, index=True)
     residente_id = Column(Integer, ForeignKey("residentes.id"), nullable=False)
     fecha_emision = Column(DateTime(timezone=True), server_default=func.now())
-    fecha_vencimiento = Column(DateTime(timezone=True), nullable=False)
+    fecha_vencimiento = Column(FechaUTC, nullable=False)
     estado = Column(String(20), nullable=False, default=EstadoFactura.PENDIENTE.value)
     total = Column(Numeric(10, 2), nullable=False)
     notas = Column(Text)
+    # Periodo YYYY-MM de las facturas generadas por la facturación mensual
+    periodo = Column(String(7))
 
     # Relaciones
     residente = relationship("Residente", back_populates="facturas")
     detalles = relationship("DetalleFactura", back_populates="factura")
 
+    # Una sola factura mensual por residente y periodo, aunque una corrida
+    # se reanude o se ejecute dos veces
+    __table_args__ = (
+        Index("ix_facturas_residente_periodo", residente_id, periodo, unique=True,
+              sqlite_where=periodo.isnot(None)),
+        # Facturas pendientes por vencimiento (tarea de facturas vencidas)
+        Index("ix_facturas_estado_vencimiento", estado, fecha_vencimiento),
+    )
+
 class DetalleFactura(Base):
     __tablename__ = "detalles_factura"
 
@@ -40,3 +70,32 @@ class DetalleFactura(Base):
     # Relaciones
     factura = relationship("Factura", back_populates="detalles")
     suministro = relationship("Suministro")
+
+class EstadoCorrida(enum.Enum):
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    COMPLETADA = "completada"
+    FALLIDA = "fallida"
+
+# Corrida de facturación mensual. Avanza por bloques de residentes en orden
+# de id; ultimo_residente_id es el punto de control desde el que se reanuda.
+class CorridaFacturacion(Base):
+    __tablename__ = "corridas_facturacion"
+
+    id = Column(Integer, primary_key=True, index=True)
+    periodo = Column(String(7), unique=True, nullable=False)
+    estado = Column(String(20), nullable=False, default=EstadoCorrida.PENDIENTE.value)
+    total_residentes = Column(Integer, nullable=False, default=0)
+    residentes_procesados = Column(Integer, nullable=False, default=0)
+    facturas_generadas = Column(Integer, nullable=False, default=0)
+    ultimo_residente_id = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    fecha_inicio = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    fecha_fin = Column(DateTime(timezone=True))
+
+@migracion(3)
+def _facturas_por_periodo(conn):
+    columnas = {fila[1] for fila in conn.execute(text("PRAGMA table_info(facturas)"))}
+    if "periodo" not in columnas:
+        conn.execute(text("ALTER TABLE facturas ADD COLUMN periodo VARCHAR(7)"))
@@ -1,9 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Text, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from .database import Base
+from sqlalchemy.types import TypeDecorator
+from decimal import Decimal, ROUND_HALF_UP
+from .database import Base, migracion
 import enum
 
+# Las cantidades de inventario se guardan como enteros en milésimas de la
+# unidad de medida (1.250 kg -> 1250). Así la aritmética de stock en SQL es
+# exacta y no acumula el error de redondeo de los flotantes.
+ESCALA_CANTIDAD = 1000
+
+class CantidadExacta(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        valor = value if isinstance(value, Decimal) else Decimal(str(value))
+        return int((valor * ESCALA_CANTIDAD).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        # Las columnas creadas antes como FLOAT devuelven 1250.0
+        return Decimal(int(round(value))) / ESCALA_CANTIDAD
+
+    def coerce_compared_value(self, op, value):
+        # Los literales comparados o sumados a una cantidad usan la misma escala
+        return self
+
 class CategoriaProducto(enum.Enum):
     MEDICAMENTO = "medicamento"
     MATERIAL_CURACION = "material_curacion"
@@ -39,8 +66,8 @@ class Producto(Base):
     descripcion = Column(Text)
     categoria = Column(Enum(CategoriaProducto), nullable=False)
     unidad_medida = Column(Enum(UnidadMedida), nullable=False)
-    stock_actual = Column(Float, default=0)
-    stock_minimo = Column(Float, nullable=False)
+    stock_actual = Column(CantidadExacta, default=0)
+    stock_minimo = Column(CantidadExacta, nullable=False)
     ubicacion = Column(String(100))
     notas = Column(Text)
     fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -48,18 +75,55 @@ class Producto(Base):
     # Relación con suministros
     suministros = relationship("Suministro", back_populates="producto")
 
+    # Índices para el listado paginado por cursor (keyset sobre id):
+    # cada filtro del catálogo tiene un índice que termina en id
+    __table_args__ = (
+        Index("ix_productos_categoria_id", categoria, id),
+        Index("ix_productos_ubicacion_id", ubicacion, id),
+        Index("ix_productos_bajo_minimo", id, sqlite_where=stock_actual < stock_minimo),
+    )
+
 class MovimientoInventario(Base):
     __tablename__ = "movimientos_inventario"
 
     id = Column(Integer, primary_key=True, index=True)
     producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
     tipo_movimiento = Column(String(20), nullable=False)  # entrada, salida
-    cantidad = Column(Float, nullable=False)
+    cantidad = Column(CantidadExacta, nullable=False)
     fecha_movimiento = Column(DateTime(timezone=True), server_default=func.now())
     responsable = Column(String(200), nullable=False)
     motivo = Column(Text, nullable=False)
     documento_referencia = Column(String(100))  # número de factura, remisión, etc.
     notas = Column(Text)
+    # Residente que consumió el producto (salidas facturables)
+    residente_id = Column(Integer, ForeignKey("residentes.id"))
+
+    # Consumo de cada residente por periodo para la facturación mensual
+    __table_args__ = (
+        Index("ix_movimientos_residente_fecha", residente_id, fecha_movimiento),
+    )
+
+# Bases de datos anteriores guardaban estas cantidades como flotantes sin escalar
+@migracion(1)
+def _cantidades_en_milesimas(conn):
+    conn.execute(text(
+        f"UPDATE productos SET "
+        f"stock_actual = CAST(ROUND(coalesce(stock_actual, 0) * {ESCALA_CANTIDAD}) AS INTEGER), "
+        f"stock_minimo = CAST(ROUND(stock_minimo * {ESCALA_CANTIDAD}) AS INTEGER)"
+    ))
+    conn.execute(text(
+        f"UPDATE movimientos_inventario SET "
+        f"cantidad = CAST(ROUND(cantidad * {ESCALA_CANTIDAD}) AS INTEGER)"
+    ))
+
+# Los movimientos registran al residente que consumió el producto
+@migracion(2)
+def _movimientos_por_residente(conn):
+    columnas = {fila[1] for fila in conn.execute(text("PRAGMA table_info(movimientos_inventario)"))}
+    if "residente_id" not in columnas:
+        conn.execute(text(
+            "ALTER TABLE movimientos_inventario ADD COLUMN residente_id INTEGER REFERENCES residentes(id)"
+        ))
 
 class Suministro(Base):
     __tablename__ = "suministros"
@@ -80,3 +144,9 @@ class Suministro(Base):
 
     # Relación con producto
     producto = relationship("Producto", back_populates="suministros")
+
+    # Suministros aún sin entregar por fecha estimada (tarea de entregas atrasadas)
+    __table_args__ = (
+        Index("ix_suministros_entrega_pendiente", fecha_entrega_estimada,
+              sqlite_where=fecha_entrega_real.is_(None)),
+    )
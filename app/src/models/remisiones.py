@@ -76,13 +76,15 @@ class Remision(Base):
     
     # Relaciones
     residente = relationship("Residente", backref="remisiones")
-    eventos_seguimiento = relationship("SeguimientoRemision", back_populates="remision")
+    eventos_seguimiento = relationship(
+        "SeguimientoRemision", back_populates="remision", order_by="SeguimientoRemision.fecha_hora"
+    )
 
 class TrazabilidadProfesional(Base):
     __tablename__ = "trazabilidad_profesionales"
 
     id = Column(Integer, primary_key=True, index=True)
-    remision_id = Column(Integer, ForeignKey("remisiones.id"), nullable=False)
+    remision_id = Column(Integer, ForeignKey("remisiones.id"), nullable=False, index=True)
     colaborador_id = Column(Integer, ForeignKey("colaboradores.id"), nullable=False)
     
     # Detalles de la participación
@@ -102,7 +104,7 @@ class SeguimientoRemision(Base):
     __tablename__ = "seguimiento_remisiones"
 
     id = Column(Integer, primary_key=True, index=True)
-    remision_id = Column(Integer, ForeignKey("remisiones.id"), nullable=False)
+    remision_id = Column(Integer, ForeignKey("remisiones.id"), nullable=False, index=True)
     tipo_evento = Column(Enum(TipoEvento), nullable=False)
     
     # Información del evento
@@ -123,5 +125,15 @@ class SeguimientoRemision(Base):
     # Relaciones
     remision = relationship("Remision", back_populates="eventos_seguimiento")
 
+# Contador diario para los folios REM-YYYYMMDD-NNNN. Cada remisión nueva
+# incrementa la fila de su día en la misma transacción que la inserta.
+class ContadorRemision(Base):
+    __tablename__ = "contadores_remision"
+
+    fecha = Column(String(8), primary_key=True)  # YYYYMMDD
+    ultimo = Column(Integer, nullable=False)
+
 # Actualizar el modelo de Remision para incluir la nueva relación
-Remision.trazabilidad_profesionales = relationship("TrazabilidadProfesional", back_populates="remision")
+Remision.trazabilidad_profesionales = relationship(
+    "TrazabilidadProfesional", back_populates="remision", order_by=TrazabilidadProfesional.fecha_intervencion
+)
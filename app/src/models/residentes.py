@@ -50,3 +50,6 @@ class Residente(Base):
     numero_seguro = Column(String(50))
     activo = Column(Boolean, default=True)
     notas = Column(Text)
+
+    # Relaciones
+    facturas = relationship("Factura", back_populates="residente")
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index, text
+from sqlalchemy.sql import func
+from .database import Base
+import enum
+
+class TipoAlerta(enum.Enum):
+    STOCK_BAJO = "stock_bajo"
+    ENTREGA_ATRASADA = "entrega_atrasada"
+
+# Alertas generadas por las tareas programadas. referencia_id apunta al
+# producto (stock_bajo) o al suministro (entrega_atrasada). Solo puede haber
+# una alerta abierta por tipo y referencia; se resuelve sola cuando la
+# condición deja de cumplirse.
+class Alerta(Base):
+    __tablename__ = "alertas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(30), nullable=False)
+    referencia_id = Column(Integer, nullable=False)
+    mensaje = Column(Text, nullable=False)
+    resuelta = Column(Boolean, nullable=False, default=False)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_resolucion = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_alertas_abiertas", tipo, referencia_id, unique=True, sqlite_where=text("resuelta = 0")),
+    )
+
+# Turno de ejecución de cada tarea programada, compartido por todos los
+# workers: quien obtiene el turno ejecuta la tarea y lo conserva hasta que
+# expira, así la tarea corre una sola vez por intervalo.
+class BloqueoTarea(Base):
+    __tablename__ = "bloqueos_tareas"
+
+    nombre = Column(String(50), primary_key=True)
+    propietario = Column(String(100), nullable=False)
+    expira = Column(DateTime(timezone=True), nullable=False)
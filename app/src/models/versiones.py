@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, Float, event, text
+from .database import Base
+
+# Versión de las tablas que sirven respuestas condicionales (ETag y
+# Last-Modified, ver servicios/condicional.py). Los triggers de abajo
+# incrementan la versión en cada INSERT, UPDATE o DELETE, así que cuentan
+# también las sentencias masivas y las escrituras de otros procesos o
+# workers, que un contador en memoria no vería.
+TABLAS_VERSIONADAS = ("productos", "remisiones", "seguimiento_remisiones")
+
+# Segundos desde la época con fracción; unixepoch('subsec') requiere SQLite 3.42
+_AHORA = "(julianday('now') - 2440587.5) * 86400.0"
+
+class VersionTabla(Base):
+    __tablename__ = "versiones_tablas"
+
+    tabla = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    actualizado = Column(Float, nullable=False)  # segundos desde la época
+
+def _sentencias_triggers():
+    for tabla in TABLAS_VERSIONADAS:
+        for operacion in ("INSERT", "UPDATE", "DELETE"):
+            yield (
+                f"CREATE TRIGGER IF NOT EXISTS {tabla}_version_{operacion.lower()} "
+                f"AFTER {operacion} ON {tabla} BEGIN "
+                f"UPDATE versiones_tablas SET version = version + 1, actualizado = {_AHORA} "
+                f"WHERE tabla = '{tabla}'; END"
+            )
+
+@event.listens_for(Base.metadata, "after_create")
+def crear_versiones(target, conn, **kw):
+    for tabla in TABLAS_VERSIONADAS:
+        conn.execute(
+            text(f"INSERT OR IGNORE INTO versiones_tablas (tabla, version, actualizado) VALUES (:tabla, 0, {_AHORA})"),
+            {"tabla": tabla},
+        )
+    for sentencia in _sentencias_triggers():
+        conn.execute(text(sentencia))
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+from ..models.database import get_db_async
+from ..models.tareas import Alerta, TipoAlerta
+from ..servicios.programador import programador
+from pydantic import BaseModel
+
+router = APIRouter(
+    prefix="/alertas",
+    tags=["alertas"],
+    responses={404: {"description": "No encontrado"}}
+)
+
+class AlertaResponse(BaseModel):
+    id: int
+    tipo: TipoAlerta
+    referencia_id: int
+    mensaje: str
+    resuelta: bool
+    fecha_creacion: Optional[datetime] = None
+    fecha_resolucion: Optional[datetime] = None
+
+@router.get("/", response_model=List[AlertaResponse])
+async def listar_alertas(
+    tipo: Optional[TipoAlerta] = None,
+    incluir_resueltas: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db_async)
+):
+    query = select(Alerta)
+    if tipo:
+        query = query.filter(Alerta.tipo == tipo.value)
+    if not incluir_resueltas:
+        query = query.filter(Alerta.resuelta == False)
+
+    result = await db.execute(query.order_by(Alerta.id.desc()).limit(limit))
+    return result.scalars().all()
+
+# Métricas de las tareas programadas de este worker: ejecuciones, turnos
+# omitidos porque otro worker tenía la tarea, fallos y duración
+@router.get("/tareas")
+async def metricas_tareas() -> Dict[str, Dict[str, Any]]:
+    return programador.metricas()
@@ -1,22 +1,37 @@
+import time
 import logging
 import traceback
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.src.models.database import get_db
+from pydantic import BaseModel, validator
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update
+from app.src.models.database import get_db_async, AsyncSessionLocal, AsyncSessionEscritura
 from app.src.models.colaboradores import Colaborador, RolAcceso
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
+from app.src.servicios.sesiones import (
+    UsuarioSesion,
+    almacen_sesiones,
+    crear_sesion,
+    leer_token,
+    sesion_revocada,
+    NOMBRE_COOKIE,
+    DURACION_SESION,
+)
+from app.src.servicios.contrasenas import (
+    HASH_RELLENO,
+    HashSaturado,
+    verificar_contrasena,
+    hashear_contrasena_async,
+)
+from app.src.servicios.limitador import limitador_cuentas, limitador_ips
+from app.src.servicios.plantillas import templates
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Configurar templates
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
 router = APIRouter()
 
 @router.get("/login")
@@ -27,34 +42,44 @@ async def mostrar_login(request: Request):
 async def iniciar_sesion(
     request: Request, 
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
+    cuenta = form_data.username.strip().lower()
+    ip = request.client.host if request.client else "desconocida"
+
+    # Limitar intentos por IP y por cuenta antes de gastar CPU en el hash
+    espera = limitador_ips.reintentar_en(ip) or limitador_cuentas.reintentar_en(cuenta)
+    if espera:
+        logger.warning(f"Demasiados intentos de inicio de sesión para: {form_data.username} desde {ip}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos. Intenta de nuevo más tarde",
+            headers={"Retry-After": str(espera)},
+        )
+
     try:
         logger.info(f"Intento de inicio de sesión para: {form_data.username}")
         
         # Buscar colaborador por correo
-        colaborador = db.query(Colaborador).filter(Colaborador.correo == form_data.username).first()
-        
-        if not colaborador:
-            logger.warning(f"Usuario no encontrado: {form_data.username}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Credenciales inválidas",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        result = await db.execute(select(Colaborador).filter(Colaborador.correo == form_data.username))
+        colaborador = result.scalar_one_or_none()
+        # Un colaborador sin contraseña asignada (importado) no puede entrar
+        encontrado = colaborador is not None and colaborador.activo and colaborador.tiene_contrasena()
         
-        # Verificar contraseña con manejo de errores detallado
+        # Verificar contraseña con manejo de errores detallado. Si el usuario no
+        # existe se verifica contra un hash de relleno para igualar el tiempo.
         logger.info(f"Verificando contraseña para: {form_data.username}")
         
         try:
-            # Verificación de contraseña con más información de depuración
-            if not colaborador.verificar_contrasena(form_data.password):
-                logger.warning(f"Contraseña incorrecta para: {form_data.username}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Credenciales inválidas",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
+            hash_guardado = colaborador.contrasena if encontrado else HASH_RELLENO
+            valida = await verificar_contrasena(form_data.password, hash_guardado)
+        except HashSaturado:
+            logger.warning("Pool de verificación de contraseñas saturado")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado. Intenta de nuevo en unos segundos",
+                headers={"Retry-After": "1"},
+            )
         except ValueError as ve:
             # Manejar específicamente errores de formato de contraseña
             logger.error(f"Error de formato de contraseña: {str(ve)}")
@@ -69,11 +94,40 @@ async def iniciar_sesion(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error interno al verificar credenciales: {str(e)}"
             )
+
+        if not encontrado or not valida:
+            logger.warning(f"Credenciales inválidas para: {form_data.username}")
+            # Solo los fallos cuentan: todo el personal puede entrar a la vez
+            # desde la misma IP (NAT del asilo) en el cambio de turno
+            limitador_ips.registrar(ip)
+            limitador_cuentas.registrar(cuenta)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Credenciales inválidas",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        limitador_cuentas.reiniciar(cuenta)
+
+        # Actualizar hashes con formato o iteraciones anteriores
+        if colaborador.necesita_rehash():
+            nuevo_hash = await hashear_contrasena_async(form_data.password)
+            async with AsyncSessionEscritura() as escritura:
+                await escritura.execute(
+                    update(Colaborador).where(Colaborador.id == colaborador.id).values(contrasena=nuevo_hash)
+                )
+                await escritura.commit()
         
-        # Simular la sesión
+        # Crear la sesión firmada y guardar el usuario en el almacén en memoria
+        token = crear_sesion(colaborador)
+
         response = RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
-        response.set_cookie(key="usuario_id", value=str(colaborador.id))
-        response.set_cookie(key="rol", value=colaborador.rol.value)
+        response.set_cookie(
+            key=NOMBRE_COOKIE,
+            value=token,
+            max_age=DURACION_SESION,
+            httponly=True,
+            samesite="lax",
+        )
         
         logger.info(f"Inicio de sesión exitoso para: {form_data.username}")
         return response
@@ -89,33 +143,72 @@ async def iniciar_sesion(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@router.get("/logout")
-async def cerrar_sesion():
-    response = RedirectResponse(url="/login")
-    response.delete_cookie("usuario_id")
-    response.delete_cookie("rol")
+# POST y no GET: cierra las sesiones en todos los dispositivos, y con
+# samesite="lax" un enlace o una navegación desde otro sitio envía la cookie
+@router.post("/logout")
+async def cerrar_sesion(request: Request):
+    token = request.cookies.get(NOMBRE_COOKIE)
+    datos = leer_token(token) if token else None
+    if datos is not None:
+        # Revocar en la base los tokens emitidos hasta ahora: el cierre vale
+        # en todos los workers y tras un reinicio, no solo en este almacén.
+        # Cierra las sesiones del colaborador en todos sus dispositivos.
+        usuario_id, _ = datos
+        async with AsyncSessionEscritura() as escritura:
+            await escritura.execute(
+                update(Colaborador)
+                .where(Colaborador.id == usuario_id)
+                .values(sesiones_validas_desde=int(time.time()) + 1)
+            )
+            await escritura.commit()
+        almacen_sesiones.invalidar_usuario(usuario_id)
+    elif token:
+        almacen_sesiones.eliminar(token)
+
+    response = RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
+    response.delete_cookie(NOMBRE_COOKIE)
     return response
 
-# Dependencia para verificar la autenticación
-async def obtener_usuario_actual(
-    request: Request, 
-    db: Session = Depends(get_db)
-):
-    usuario_id = request.cookies.get("usuario_id")
-    if not usuario_id:
+# Dependencia para verificar la autenticación.
+# La identidad sale del almacén de sesiones sin consultar la base de datos;
+# solo si el token no está en memoria (reinicio, otro worker o pasó el
+# intervalo de revalidación) se valida la firma y se vuelve a cargar el
+# colaborador, que además no debe haber revocado sus sesiones.
+async def obtener_usuario_actual(request: Request) -> UsuarioSesion:
+    token = request.cookies.get(NOMBRE_COOKIE)
+    if not token:
         raise HTTPException(status_code=401, detail="No autenticado")
-    
-    usuario = db.query(Colaborador).filter(Colaborador.id == int(usuario_id)).first()
-    
-    if not usuario:
+
+    usuario = almacen_sesiones.obtener(token)
+    if usuario is not None:
+        return usuario
+
+    datos = leer_token(token)
+    if datos is None:
+        raise HTTPException(status_code=401, detail="Sesión inválida o expirada")
+    usuario_id, emitido = datos
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Colaborador).filter(Colaborador.id == usuario_id, Colaborador.activo == True)
+        )
+        colaborador = result.scalar_one_or_none()
+
+    if not colaborador:
+        almacen_sesiones.eliminar(token)
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
-    
+    if sesion_revocada(emitido, colaborador):
+        almacen_sesiones.eliminar(token)
+        raise HTTPException(status_code=401, detail="Sesión cerrada")
+
+    usuario = UsuarioSesion.desde_colaborador(colaborador)
+    almacen_sesiones.guardar(token, usuario, emitido)
     return usuario
 
 # Decorador para verificar roles
 def requiere_rol(roles_permitidos=None):
     async def verificar_rol(
-        usuario: Colaborador = Depends(obtener_usuario_actual)
+        usuario: UsuarioSesion = Depends(obtener_usuario_actual)
     ):
         if roles_permitidos and usuario.rol not in roles_permitidos:
             raise HTTPException(
@@ -124,3 +217,39 @@ def requiere_rol(roles_permitidos=None):
             )
         return usuario
     return verificar_rol
+
+class AsignacionContrasena(BaseModel):
+    contrasena: str
+
+    @validator('contrasena')
+    def validar_contrasena(cls, v):
+        if len(v) < 8:
+            raise ValueError('La contraseña debe tener al menos 8 caracteres')
+        return v
+
+# Asignar la contraseña de un colaborador: los importados se crean sin una
+# utilizable. Cierra las sesiones que tuviera abiertas.
+@router.put(
+    "/colaboradores/{colaborador_id}/contrasena",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(requiere_rol([RolAcceso.ADMIN]))]
+)
+async def asignar_contrasena(colaborador_id: int, datos: AsignacionContrasena):
+    try:
+        nuevo_hash = await hashear_contrasena_async(datos.contrasena)
+    except HashSaturado:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servicio ocupado. Intenta de nuevo en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    async with AsyncSessionEscritura() as escritura:
+        result = await escritura.execute(
+            update(Colaborador)
+            .where(Colaborador.id == colaborador_id)
+            .values(contrasena=nuevo_hash, sesiones_validas_desde=int(time.time()) + 1)
+        )
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Colaborador no encontrado")
+        await escritura.commit()
+    almacen_sesiones.invalidar_usuario(colaborador_id)
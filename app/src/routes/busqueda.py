@@ -0,0 +1,75 @@
+import re
+import html
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+from ..models.database import get_db_async
+from ..models.busqueda import TABLA_BUSQUEDA
+from .auth import obtener_usuario_actual
+
+router = APIRouter(tags=["busqueda"])
+
+class ResultadoBusqueda(BaseModel):
+    tipo: str
+    id: int
+    titulo: str
+    fragmento: str
+    puntuacion: float
+
+TipoBusqueda = Literal["residente", "producto", "remision"]
+
+# snippet() marca las coincidencias con estos caracteres de uso privado; el
+# contenido (alergias, condiciones médicas) se escapa antes de cambiarlos
+# por <b></b>, así el fragmento solo trae el HTML que agrega la búsqueda
+INICIO_RESALTADO = "\ue000"
+FIN_RESALTADO = "\ue001"
+
+def resaltar(fragmento: str) -> str:
+    return (
+        html.escape(fragmento)
+        .replace(INICIO_RESALTADO, "<b>")
+        .replace(FIN_RESALTADO, "</b>")
+    )
+
+def construir_consulta_fts(texto: str) -> Optional[str]:
+    # Convierte el texto libre en una consulta FTS5 segura: cada palabra se
+    # cita (sin operadores del usuario) y se busca como prefijo
+    palabras = re.findall(r"\w+", texto)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+@router.get("/buscar", response_model=List[ResultadoBusqueda], dependencies=[Depends(obtener_usuario_actual)])
+async def buscar(
+    q: str = Query(..., min_length=1, max_length=200),
+    tipo: Optional[List[TipoBusqueda]] = Query(None),
+    limite: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db_async)
+):
+    consulta = construir_consulta_fts(q)
+    if consulta is None:
+        raise HTTPException(status_code=400, detail="La búsqueda no contiene palabras")
+
+    # bm25 ordena por relevancia (menor es mejor); el título pesa más que el contenido
+    sql = (
+        f"SELECT tipo, rowid / 4 AS id, titulo, "
+        f"snippet({TABLA_BUSQUEDA}, 2, '{INICIO_RESALTADO}', '{FIN_RESALTADO}', '…', 12) AS fragmento, "
+        f"bm25({TABLA_BUSQUEDA}, 0.0, 10.0, 1.0) AS puntuacion "
+        f"FROM {TABLA_BUSQUEDA} WHERE {TABLA_BUSQUEDA} MATCH :consulta"
+    )
+    parametros = {"consulta": consulta, "limite": limite}
+    if tipo:
+        sql += " AND tipo IN :tipos"
+        parametros["tipos"] = list(tipo)
+    sentencia = text(sql + " ORDER BY puntuacion LIMIT :limite")
+    if tipo:
+        sentencia = sentencia.bindparams(bindparam("tipos", expanding=True))
+
+    result = await db.execute(sentencia, parametros)
+    return [
+        {**fila._mapping, "fragmento": resaltar(fila.fragmento)}
+        for fila in result
+    ]
@@ -1,21 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
 from app.src.routes.auth import obtener_usuario_actual
+from app.src.servicios.indicadores import panel_indicadores
+from app.src.servicios.plantillas import templates
 
 router = APIRouter()
 
-# Configurar templates
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
 @router.get("/dashboard")
 async def mostrar_dashboard(
     request: Request, 
     usuario_actual = Depends(obtener_usuario_actual)
 ):
+    indicadores = await panel_indicadores.obtener()
     return templates.TemplateResponse("dashboard.html", {
         "request": request, 
         "usuario": usuario_actual,
+        "indicadores": indicadores,
+        # Clave del fragmento de las tarjetas: cambia con cada recálculo
+        "version_indicadores": panel_indicadores.version,
         "titulo": "Panel Principal"
     })
+
+@router.get("/dashboard/indicadores")
+async def obtener_indicadores(usuario_actual = Depends(obtener_usuario_actual)):
+    return await panel_indicadores.obtener()
@@ -0,0 +1,177 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.future import select
+from typing import List, Literal, Optional
+from datetime import datetime
+
+from ..models.inventario import MovimientoInventario, Producto
+from ..models.facturacion import Factura, DetalleFactura
+from ..models.remisiones import Remision, TipoRemision, EstadoRemision
+from ..models.residentes import Residente
+from ..servicios.exportacion import exportar_csv, exportar_xlsx
+from .auth import obtener_usuario_actual
+
+# Exportación del historial completo para auditorías e informes. Las
+# respuestas se transmiten por partes y no tienen límite de filas.
+router = APIRouter(
+    prefix="/exportar",
+    tags=["exportaciones"],
+    dependencies=[Depends(obtener_usuario_actual)]
+)
+
+Formato = Literal["csv", "xlsx"]
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def _respuesta(nombre: str, formato: str, encabezados: List[str], consulta) -> StreamingResponse:
+    if formato == "xlsx":
+        contenido = exportar_xlsx(nombre, encabezados, consulta)
+    else:
+        contenido = exportar_csv(encabezados, consulta)
+    archivo = f"{nombre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        contenido,
+        media_type=TIPOS_CONTENIDO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
+
+def _rango(query, columna, desde: Optional[datetime], hasta: Optional[datetime]):
+    if desde:
+        query = query.filter(columna >= desde)
+    if hasta:
+        query = query.filter(columna < hasta)
+    return query
+
+@router.get("/movimientos")
+async def exportar_movimientos(
+    formato: Formato = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    producto_id: Optional[int] = None,
+    tipo_movimiento: Optional[Literal["entrada", "salida"]] = None,
+    residente_id: Optional[int] = None
+):
+    query = (
+        select(
+            MovimientoInventario.id,
+            MovimientoInventario.fecha_movimiento,
+            MovimientoInventario.producto_id,
+            Producto.codigo,
+            Producto.nombre,
+            MovimientoInventario.tipo_movimiento,
+            MovimientoInventario.cantidad,
+            MovimientoInventario.responsable,
+            MovimientoInventario.motivo,
+            MovimientoInventario.documento_referencia,
+            MovimientoInventario.residente_id,
+            MovimientoInventario.notas,
+        )
+        .join(Producto, Producto.id == MovimientoInventario.producto_id)
+        .order_by(MovimientoInventario.id)
+    )
+    query = _rango(query, MovimientoInventario.fecha_movimiento, desde, hasta)
+    if producto_id:
+        query = query.filter(MovimientoInventario.producto_id == producto_id)
+    if tipo_movimiento:
+        query = query.filter(MovimientoInventario.tipo_movimiento == tipo_movimiento)
+    if residente_id:
+        query = query.filter(MovimientoInventario.residente_id == residente_id)
+
+    encabezados = [
+        "id", "fecha", "producto_id", "codigo", "producto", "tipo", "cantidad",
+        "responsable", "motivo", "documento", "residente_id", "notas",
+    ]
+    return _respuesta("movimientos", formato, encabezados, query)
+
+# Una fila por renglón de factura; las facturas sin renglones salen una vez
+@router.get("/facturas")
+async def exportar_facturas(
+    formato: Formato = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    estado: Optional[str] = None,
+    residente_id: Optional[int] = None,
+    periodo: Optional[str] = None
+):
+    query = (
+        select(
+            Factura.id,
+            Factura.fecha_emision,
+            Factura.fecha_vencimiento,
+            Factura.estado,
+            Factura.periodo,
+            Factura.residente_id,
+            Residente.numero_expediente,
+            Factura.total,
+            DetalleFactura.id,
+            DetalleFactura.suministro_id,
+            DetalleFactura.cantidad,
+            DetalleFactura.precio_unitario,
+            DetalleFactura.subtotal,
+        )
+        .join(Residente, Residente.id == Factura.residente_id)
+        .outerjoin(DetalleFactura, DetalleFactura.factura_id == Factura.id)
+        .order_by(Factura.id, DetalleFactura.id)
+    )
+    query = _rango(query, Factura.fecha_emision, desde, hasta)
+    if estado:
+        query = query.filter(Factura.estado == estado)
+    if residente_id:
+        query = query.filter(Factura.residente_id == residente_id)
+    if periodo:
+        query = query.filter(Factura.periodo == periodo)
+
+    encabezados = [
+        "factura_id", "fecha_emision", "fecha_vencimiento", "estado", "periodo", "residente_id",
+        "expediente", "total_factura", "detalle_id", "suministro_id", "cantidad",
+        "precio_unitario", "subtotal",
+    ]
+    return _respuesta("facturas", formato, encabezados, query)
+
+@router.get("/remisiones")
+async def exportar_remisiones(
+    formato: Formato = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    estado: Optional[EstadoRemision] = None,
+    tipo: Optional[TipoRemision] = None,
+    residente_id: Optional[int] = None
+):
+    query = (
+        select(
+            Remision.id,
+            Remision.numero_remision,
+            Remision.fecha_programada,
+            Remision.fecha_salida,
+            Remision.fecha_retorno,
+            Remision.tipo,
+            Remision.estado,
+            Remision.residente_id,
+            Residente.numero_expediente,
+            Remision.institucion_destino,
+            Remision.especialidad,
+            Remision.medico_remitente,
+            Remision.medico_receptor,
+            Remision.motivo,
+            Remision.costo_estimado,
+        )
+        .join(Residente, Residente.id == Remision.residente_id)
+        .order_by(Remision.id)
+    )
+    query = _rango(query, Remision.fecha_programada, desde, hasta)
+    if estado:
+        query = query.filter(Remision.estado == estado)
+    if tipo:
+        query = query.filter(Remision.tipo == tipo)
+    if residente_id:
+        query = query.filter(Remision.residente_id == residente_id)
+
+    encabezados = [
+        "id", "numero_remision", "fecha_programada", "fecha_salida", "fecha_retorno", "tipo",
+        "estado", "residente_id", "expediente", "institucion_destino", "especialidad",
+        "medico_remitente", "medico_receptor", "motivo", "costo_estimado",
+    ]
+    return _respuesta("remisiones", formato, encabezados, query)
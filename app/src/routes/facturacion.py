@@ -1,13 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, insert
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from ..models.database import get_db
-from ..models.facturacion import Factura, DetalleFactura, EstadoFactura
+from ..models.database import get_db_async, get_db_escritura
+from ..models.facturacion import Factura, DetalleFactura, EstadoFactura, CorridaFacturacion
 from ..models.residentes import Residente
 from ..models.inventario import Suministro
+from ..models.colaboradores import RolAcceso
+from ..servicios.existencias import aplicar_lote, validar_cantidad, StockInsuficiente
+from ..servicios.catalogo import residente_por_id, suministros_por_id
+from ..servicios.facturacion_mensual import iniciar_corrida, limites_periodo, PeriodoInvalido
+from .auth import requiere_rol
 
 from pydantic import BaseModel, validator
 
@@ -22,15 +29,42 @@ class DetalleFacturaBase(BaseModel):
     cantidad: Decimal
     precio_unitario: Decimal
 
+    # Con descontar_existencias los detalles van a aplicar_lote como salidas:
+    # la cantidad se valida igual que la de un movimiento de inventario
+    @validator('cantidad')
+    def validar_cantidad(cls, v):
+        return validar_cantidad(v)
+
+    @validator('precio_unitario')
+    def validar_precio(cls, v):
+        if v < 0:
+            raise ValueError('El precio unitario no puede ser negativo')
+        return v
+
 class FacturaCreate(BaseModel):
     residente_id: int
     detalles: List[DetalleFacturaBase]
     fecha_vencimiento: Optional[datetime] = None
     notas: Optional[str] = None
+    # Registrar la salida de inventario de los productos facturados
+    descontar_existencias: bool = False
+
+    @validator('detalles')
+    def validar_detalles(cls, v):
+        if not v:
+            raise ValueError('La factura debe tener al menos un detalle')
+        return v
 
     @validator('fecha_vencimiento', always=True)
     def set_default_vencimiento(cls, v):
-        return v or datetime.now() + timedelta(days=30)
+        # Los vencimientos se guardan en UTC, como los de la facturación
+        # mensual; la tarea de facturas vencidas y el panel comparan con la
+        # hora UTC. Una fecha sin zona horaria se toma como UTC.
+        if v is None:
+            return datetime.now(timezone.utc) + timedelta(days=30)
+        if v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v.astimezone(timezone.utc)
 
 class FacturaResponse(BaseModel):
     id: int
@@ -44,32 +78,76 @@ class FacturaResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class CorridaCreate(BaseModel):
+    periodo: str  # YYYY-MM
+
+    @validator('periodo')
+    def validar_periodo(cls, v):
+        try:
+            limites_periodo(v)
+        except PeriodoInvalido as e:
+            raise ValueError(str(e))
+        return v
+
+class CorridaResponse(BaseModel):
+    id: int
+    periodo: str
+    estado: str
+    total_residentes: int
+    residentes_procesados: int
+    facturas_generadas: int
+    porcentaje: float
+    error: Optional[str] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+def _respuesta_corrida(corrida: CorridaFacturacion) -> CorridaResponse:
+    avance = corrida.residentes_procesados / corrida.total_residentes if corrida.total_residentes else 1
+    return CorridaResponse(
+        id=corrida.id,
+        periodo=corrida.periodo,
+        estado=corrida.estado,
+        total_residentes=corrida.total_residentes,
+        residentes_procesados=corrida.residentes_procesados,
+        facturas_generadas=corrida.facturas_generadas,
+        porcentaje=round(min(avance, 1) * 100, 1),
+        error=corrida.error,
+        fecha_inicio=corrida.fecha_inicio,
+        fecha_fin=corrida.fecha_fin,
+    )
+
 @router.post("/", response_model=FacturaResponse, status_code=status.HTTP_201_CREATED)
-async def crear_factura(factura: FacturaCreate, db: Session = Depends(get_db)):
+async def crear_factura(factura: FacturaCreate, db: AsyncSession = Depends(get_db_escritura)):
     # Verificar que el residente existe
-    residente = db.query(Residente).filter(Residente.id == factura.residente_id).first()
+    residente = await residente_por_id(db, factura.residente_id)
     if not residente:
         raise HTTPException(status_code=404, detail="Residente no encontrado")
     
+    # Verificar todos los suministros con una sola consulta. En la sesión de
+    # escritura no se usa la caché: la verificación lee la base
+    ids_suministro = {detalle.suministro_id for detalle in factura.detalles}
+    producto_de = {
+        suministro_id: fila.producto_id
+        for suministro_id, fila in (await suministros_por_id(db, ids_suministro)).items()
+    }
+    faltantes = sorted(ids_suministro - producto_de.keys())
+    if faltantes:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Suministros no encontrados: {', '.join(map(str, faltantes))}"
+        )
+
     # Calcular total de la factura
-    total = Decimal('0')
-    detalles_factura = []
-
-    for detalle in factura.detalles:
-        # Verificar que el suministro existe
-        suministro = db.query(Suministro).filter(Suministro.id == detalle.suministro_id).first()
-        if not suministro:
-            raise HTTPException(status_code=404, detail=f"Suministro {detalle.suministro_id} no encontrado")
-        
-        subtotal = detalle.cantidad * detalle.precio_unitario
-        total += subtotal
-
-        detalles_factura.append(DetalleFactura(
-            suministro_id=detalle.suministro_id,
-            cantidad=detalle.cantidad,
-            precio_unitario=detalle.precio_unitario,
-            subtotal=subtotal
-        ))
+    detalles_factura = [
+        {
+            "suministro_id": detalle.suministro_id,
+            "cantidad": detalle.cantidad,
+            "precio_unitario": detalle.precio_unitario,
+            "subtotal": detalle.cantidad * detalle.precio_unitario,
+        }
+        for detalle in factura.detalles
+    ]
+    total = sum((detalle["subtotal"] for detalle in detalles_factura), Decimal('0'))
 
     # Crear factura
     nueva_factura = Factura(
@@ -80,21 +158,43 @@ async def crear_factura(factura: FacturaCreate, db: Session = Depends(get_db)):
         estado=EstadoFactura.PENDIENTE.value
     )
 
+    # Factura, detalles y salidas de inventario se confirman en un solo COMMIT
     try:
         db.add(nueva_factura)
-        db.flush()  # Obtener el ID de la factura
+        await db.flush()  # Obtener el ID de la factura
 
-        # Asociar detalles a la factura
-        for detalle in detalles_factura:
-            detalle.factura_id = nueva_factura.id
-            db.add(detalle)
+        await db.execute(
+            insert(DetalleFactura),
+            [dict(detalle, factura_id=nueva_factura.id) for detalle in detalles_factura]
+        )
 
-        db.commit()
-        db.refresh(nueva_factura)
+        if factura.descontar_existencias:
+            movimientos = [
+                (fila, {
+                    "producto_id": producto_de[detalle.suministro_id],
+                    "tipo_movimiento": "salida",
+                    "cantidad": detalle.cantidad,
+                    "responsable": "facturacion",
+                    "motivo": f"Factura {nueva_factura.id}",
+                    "documento_referencia": f"FAC-{nueva_factura.id}",
+                })
+                for fila, detalle in enumerate(factura.detalles, start=1)
+            ]
+            resultados = await aplicar_lote(db, movimientos, atomico=True)
+            rechazos = sorted({
+                f"producto {producto_id}: {errores[0]}"
+                for _, estado, producto_id, errores in resultados
+                if estado == "rechazado"
+            })
+            if rechazos:
+                raise StockInsuficiente("; ".join(rechazos))
+
+        await db.commit()
+        await db.refresh(nueva_factura)
         return nueva_factura
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail=f"Error al crear la factura: {str(e)}"
@@ -106,9 +206,9 @@ async def listar_facturas(
     limit: int = 100,
     residente_id: Optional[int] = None,
     estado: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
-    query = db.query(Factura)
+    query = select(Factura)
     
     if residente_id:
         query = query.filter(Factura.residente_id == residente_id)
@@ -119,11 +219,50 @@ async def listar_facturas(
             raise HTTPException(status_code=400, detail="Estado de factura inválido")
         query = query.filter(Factura.estado == estado)
     
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+# Facturación mensual: la corrida se ejecuta en segundo plano y su avance
+# se consulta con GET. Volver a solicitar un periodo reanuda una corrida
+# interrumpida y no repite una completada. Solo administradores.
+@router.post(
+    "/corridas",
+    response_model=CorridaResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(requiere_rol([RolAcceso.ADMIN]))]
+)
+async def iniciar_corrida_facturacion(datos: CorridaCreate):
+    corrida = await iniciar_corrida(datos.periodo)
+    if corrida is None:
+        # Otro worker tiene el bloqueo del periodo sin haber creado la corrida
+        raise HTTPException(status_code=409, detail="La corrida del periodo se está iniciando en otro proceso")
+    return _respuesta_corrida(corrida)
+
+@router.get(
+    "/corridas",
+    response_model=List[CorridaResponse],
+    dependencies=[Depends(requiere_rol([RolAcceso.ADMIN]))]
+)
+async def listar_corridas(db: AsyncSession = Depends(get_db_async)):
+    result = await db.execute(select(CorridaFacturacion).order_by(CorridaFacturacion.periodo.desc()))
+    return [_respuesta_corrida(corrida) for corrida in result.scalars().all()]
+
+@router.get(
+    "/corridas/{periodo}",
+    response_model=CorridaResponse,
+    dependencies=[Depends(requiere_rol([RolAcceso.ADMIN]))]
+)
+async def obtener_corrida(periodo: str, db: AsyncSession = Depends(get_db_async)):
+    result = await db.execute(select(CorridaFacturacion).filter(CorridaFacturacion.periodo == periodo))
+    corrida = result.scalar_one_or_none()
+    if corrida is None:
+        raise HTTPException(status_code=404, detail="Corrida de facturación no encontrada")
+    return _respuesta_corrida(corrida)
 
 @router.get("/{factura_id}", response_model=FacturaResponse)
-async def obtener_factura(factura_id: int, db: Session = Depends(get_db)):
-    factura = db.query(Factura).filter(Factura.id == factura_id).first()
+async def obtener_factura(factura_id: int, db: AsyncSession = Depends(get_db_async)):
+    result = await db.execute(select(Factura).filter(Factura.id == factura_id))
+    factura = result.scalar_one_or_none()
     if factura is None:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     return factura
@@ -132,9 +271,10 @@ async def obtener_factura(factura_id: int, db: Session = Depends(get_db)):
 async def actualizar_estado_factura(
     factura_id: int, 
     estado: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
-    factura = db.query(Factura).filter(Factura.id == factura_id).first()
+    result = await db.execute(select(Factura).filter(Factura.id == factura_id))
+    factura = result.scalar_one_or_none()
     if factura is None:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
@@ -144,28 +284,29 @@ async def actualizar_estado_factura(
     
     try:
         # Usar update para evitar problemas de asignación
-        db.query(Factura).filter(Factura.id == factura_id).update({"estado": estado})
-        db.commit()
-        db.refresh(factura)
+        await db.execute(update(Factura).where(Factura.id == factura_id).values(estado=estado))
+        await db.commit()
+        await db.refresh(factura)
         return factura
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail=f"Error al actualizar el estado de la factura: {str(e)}"
         )
 
 @router.delete("/{factura_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def eliminar_factura(factura_id: int, db: Session = Depends(get_db)):
-    factura = db.query(Factura).filter(Factura.id == factura_id).first()
+async def eliminar_factura(factura_id: int, db: AsyncSession = Depends(get_db_escritura)):
+    result = await db.execute(select(Factura).filter(Factura.id == factura_id))
+    factura = result.scalar_one_or_none()
     if factura is None:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
     try:
-        db.delete(factura)
-        db.commit()
+        await db.delete(factura)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail=f"Error al eliminar la factura: {str(e)}"
@@ -0,0 +1,174 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, validator
+from typing import Dict, Literal, Optional
+from datetime import date
+import tempfile
+
+from ..models.residentes import Residente, TipoSangre, EstadoResidente
+from ..models.colaboradores import Colaborador, TipoColaborador, RolAcceso, CONTRASENA_INUTILIZABLE
+from ..models.inventario import Producto
+from ..servicios.importacion import (
+    Entidad,
+    ResultadoImportacion,
+    LECTORES,
+    formato_por_nombre,
+    importar,
+)
+from .inventario import ProductoCreate
+from .auth import requiere_rol
+
+# Carga inicial de catálogos al dar de alta una casa. Solo administradores.
+router = APIRouter(
+    prefix="/importar",
+    tags=["importaciones"],
+    dependencies=[Depends(requiere_rol([RolAcceso.ADMIN]))]
+)
+
+# Los archivos subidos en el cuerpo se guardan en memoria hasta este tamaño
+# y después en un archivo temporal
+MAXIMO_EN_MEMORIA = 1024 * 1024
+
+def _longitud(campo: str, maximo: int, requerido: bool = True):
+    def validar(cls, v):
+        if v is None:
+            return v
+        v = v.strip()
+        if requerido and not v:
+            raise ValueError(f'El campo {campo} no puede estar vacío')
+        if len(v) > maximo:
+            raise ValueError(f'El campo {campo} admite como máximo {maximo} caracteres')
+        return v
+    return validator(campo, allow_reuse=True)(validar)
+
+# Esquemas Pydantic de las filas importadas
+class ResidenteImportacion(BaseModel):
+    numero_expediente: str
+    nombre: str
+    apellido_paterno: str
+    apellido_materno: Optional[str] = None
+    fecha_nacimiento: date
+    fecha_ingreso: date
+    tipo_sangre: TipoSangre
+    estado: EstadoResidente = EstadoResidente.ACTIVO
+    alergias: Optional[str] = None
+    condiciones_medicas: Optional[str] = None
+    medicamentos: Optional[str] = None
+    dieta_especial: Optional[str] = None
+    nivel_movilidad: Optional[str] = None
+    contacto_emergencia_nombre: str
+    contacto_emergencia_relacion: str
+    contacto_emergencia_telefono: str
+    contacto_emergencia_direccion: Optional[str] = None
+    seguro_medico: Optional[str] = None
+    numero_seguro: Optional[str] = None
+    activo: bool = True
+    notas: Optional[str] = None
+
+    _numero_expediente = _longitud('numero_expediente', 20)
+    _nombre = _longitud('nombre', 100)
+    _apellido_paterno = _longitud('apellido_paterno', 100)
+    _telefono = _longitud('contacto_emergencia_telefono', 15)
+
+class ColaboradorImportacionConAdmin(BaseModel):
+    numero_empleado: str
+    nombre: str
+    apellido_paterno: str
+    apellido_materno: Optional[str] = None
+    fecha_nacimiento: date
+    tipo: TipoColaborador
+    telefono: Optional[str] = None
+    correo: str
+    direccion: Optional[str] = None
+    activo: bool = True
+    fecha_ingreso: date
+    turno: str
+    rol: RolAcceso = RolAcceso.COLABORADOR
+
+    _numero_empleado = _longitud('numero_empleado', 20)
+    _nombre = _longitud('nombre', 100)
+    _apellido_paterno = _longitud('apellido_paterno', 100)
+    _correo = _longitud('correo', 100)
+    _turno = _longitud('turno', 20)
+
+    @validator('correo')
+    def validar_correo(cls, v):
+        if '@' not in v:
+            raise ValueError('Correo electrónico inválido')
+        return v.lower()
+
+# Un archivo no otorga el rol de administrador salvo que se pida
+# expresamente (permitir_admin)
+class ColaboradorImportacion(ColaboradorImportacionConAdmin):
+    @validator('rol')
+    def validar_rol(cls, v):
+        if v == RolAcceso.ADMIN:
+            raise ValueError('El rol admin solo se importa con permitir_admin')
+        return v
+
+# Entidades importables por su clave natural. Los colaboradores nuevos se
+# crean sin contraseña utilizable: el archivo no trae contraseñas en claro
+# y un administrador les asigna una antes del primer inicio de sesión
+# (PUT /auth/colaboradores/{id}/contrasena o scripts/asignar_contrasena.py).
+def _colaboradores(esquema) -> Entidad:
+    return Entidad(
+        "colaboradores", Colaborador, esquema, "numero_empleado",
+        solo_al_insertar={"contrasena": CONTRASENA_INUTILIZABLE},
+    )
+
+ENTIDADES: Dict[str, Entidad] = {
+    "residentes": Entidad("residentes", Residente, ResidenteImportacion, "numero_expediente"),
+    "colaboradores": _colaboradores(ColaboradorImportacion),
+    "productos": Entidad("productos", Producto, ProductoCreate, "codigo"),
+}
+COLABORADORES_CON_ADMIN = _colaboradores(ColaboradorImportacionConAdmin)
+
+def entidad_importacion(nombre: str, permitir_admin: bool = False) -> Entidad:
+    if nombre == "colaboradores" and permitir_admin:
+        return COLABORADORES_CON_ADMIN
+    return ENTIDADES[nombre]
+
+TIPOS_CONTENIDO = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "json",
+}
+
+@router.post("/{entidad}", response_model=ResultadoImportacion)
+async def importar_archivo(
+    entidad: Literal["residentes", "colaboradores", "productos"],
+    request: Request,
+    formato: Optional[Literal["csv", "ndjson", "json"]] = Query(
+        None, description="Si se omite, se deduce del tipo de contenido o de la extensión del archivo"
+    ),
+    permitir_admin: bool = Query(
+        False, description="Acepta colaboradores con rol admin; sin él esas filas se rechazan"
+    ),
+):
+    # Acepta el archivo en el cuerpo (text/csv, application/x-ndjson,
+    # application/json) o subido en un formulario multipart (campo "archivo")
+    tipo_contenido = request.headers.get("content-type", "").split(";")[0].strip()
+    if tipo_contenido == "multipart/form-data":
+        formulario = await request.form()
+        subido = formulario.get("archivo")
+        if subido is None or isinstance(subido, str):
+            raise HTTPException(status_code=400, detail="Falta el archivo en el campo 'archivo'")
+        formato = formato or formato_por_nombre(subido.filename) or TIPOS_CONTENIDO.get(subido.content_type)
+        archivo = subido.file
+    else:
+        formato = formato or TIPOS_CONTENIDO.get(tipo_contenido)
+        archivo = tempfile.SpooledTemporaryFile(max_size=MAXIMO_EN_MEMORIA)
+        async for trozo in request.stream():
+            archivo.write(trozo)
+    if formato is None:
+        raise HTTPException(status_code=415, detail="No se pudo determinar el formato; use el parámetro formato")
+
+    try:
+        archivo.seek(0)
+        resultado = await importar(entidad_importacion(entidad, permitir_admin), LECTORES[formato](archivo))
+    finally:
+        archivo.close()
+
+    if resultado.error_formato and not resultado.insertadas and not resultado.actualizadas:
+        raise HTTPException(status_code=400, detail=resultado.error_formato)
+    return resultado
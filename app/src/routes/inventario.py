@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import Session
 from sqlalchemy import update
 from typing import List, Optional
-from ..models.database import get_db
+from ..models.database import get_db_async, get_db_escritura
+from ..servicios.existencias import (
+    aplicar_movimiento,
+    aplicar_lote,
+    conciliar_existencias,
+    validar_cantidad,
+    ProductoNoEncontrado,
+    StockInsuficiente,
+)
+from ..servicios.catalogo import cache_catalogo, columnas, producto_por_id, suministro_por_id
+from ..servicios.condicional import condicional
 from ..models.inventario import (
     Producto, 
     MovimientoInventario, 
@@ -13,10 +23,12 @@ from ..models.inventario import (
     UnidadMedida, 
     EstadoSuministro
 )
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationError, validator
 from datetime import datetime
 from decimal import Decimal
 from typing import Literal, Optional
+import csv
+import io
 
 router = APIRouter(
     prefix="/inventario",
@@ -55,6 +67,10 @@ class ProductoBase(BaseModel):
 class ProductoCreate(ProductoBase):
     pass
 
+class ProductoResponse(ProductoBase):
+    id: int
+    stock_actual: Decimal
+
 class ProductoUpdate(BaseModel):
     codigo: Optional[str] = None
     nombre: Optional[str] = None
@@ -85,6 +101,11 @@ class MovimientoBase(BaseModel):
     motivo: str
     documento_referencia: Optional[str] = None
     notas: Optional[str] = None
+    residente_id: Optional[int] = None
+
+    @validator('cantidad')
+    def validar_cantidad(cls, v):
+        return validar_cantidad(v)
 
     @validator('responsable')
     def validar_responsable(cls, v):
@@ -100,6 +121,23 @@ class MovimientoBase(BaseModel):
 class MovimientoCreate(MovimientoBase):
     pass
 
+class ResultadoFilaLote(BaseModel):
+    fila: int
+    estado: Literal["aplicado", "invalido", "rechazado"]
+    producto_id: Optional[int] = None
+    errores: List[str] = []
+
+class ResultadoLote(BaseModel):
+    aplicados: int
+    rechazados: int
+    resultados: List[ResultadoFilaLote]
+
+class DiferenciaExistencias(BaseModel):
+    producto_id: int
+    codigo: str
+    stock_actual: Decimal
+    saldo_movimientos: Decimal
+
 # Nuevos esquemas para Suministro
 class SuministroBase(BaseModel):
     producto_id: int
@@ -141,7 +179,7 @@ class SuministroUpdate(BaseModel):
 
 # Endpoints para Productos
 @router.post("/productos/", response_model=ProductoBase, status_code=status.HTTP_201_CREATED)
-async def crear_producto(producto: ProductoCreate, db: AsyncSession = Depends(get_db)):
+async def crear_producto(producto: ProductoCreate, db: AsyncSession = Depends(get_db_escritura)):
     db_producto = Producto(**producto.dict())
     db.add(db_producto)
     try:
@@ -155,22 +193,62 @@ async def crear_producto(producto: ProductoCreate, db: AsyncSession = Depends(ge
             detail=f"Error al crear el producto: {str(e)}"
         )
 
-@router.get("/productos/", response_model=List[ProductoBase])
+@router.get("/productos/", response_model=List[ProductoResponse], dependencies=[Depends(condicional("productos"))])
 async def listar_productos(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Último id recibido en la página anterior"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Usar `cursor`; se conserva para clientes anteriores"),
+    limit: int = Query(100, ge=1, le=500),
     categoria: Optional[CategoriaProducto] = None,
-    db: AsyncSession = Depends(get_db)
+    ubicacion: Optional[str] = None,
+    bajo_minimo: bool = Query(False, description="Solo productos con stock por debajo del mínimo"),
+    db: AsyncSession = Depends(get_db_async)
 ):
-    query = await db.execute(select(Producto))
+    # Paginación por cursor sobre id: cada página es un recorrido de índice
+    # acotado, sin OFFSET ni cargar la tabla completa. La respuesta sigue
+    # siendo la lista de productos; el cursor de la página siguiente va en
+    # las cabeceras X-Siguiente-Cursor y Link (rel="next"). `skip` (OFFSET)
+    # solo se admite sin cursor, para los clientes anteriores.
+    if cursor is not None and skip:
+        raise HTTPException(status_code=400, detail="Use `cursor` o `skip`, no ambos")
+    query = columnas(Producto)
     if categoria:
-        query = await db.execute(select(Producto).filter(Producto.categoria == categoria))
-    return query.scalars().all()
+        query = query.filter(Producto.categoria == categoria)
+    if ubicacion:
+        query = query.filter(Producto.ubicacion == ubicacion)
+    if bajo_minimo:
+        query = query.filter(Producto.stock_actual < Producto.stock_minimo)
+    if cursor is not None:
+        query = query.filter(Producto.id > cursor)
+    elif skip:
+        query = query.offset(skip)
 
-@router.get("/productos/{producto_id}", response_model=ProductoBase)
-async def obtener_producto(producto_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Producto).filter(Producto.id == producto_id))
-    producto = result.scalar_one_or_none()
+    async def cargar():
+        # Se pide una fila de más para saber si existe una página siguiente
+        result = await db.execute(query.order_by(Producto.id).limit(limit + 1))
+        productos = result.all()
+
+        siguiente_cursor = None
+        if len(productos) > limit:
+            productos = productos[:limit]
+            siguiente_cursor = productos[-1].id
+
+        return productos, siguiente_cursor
+
+    # Cada combinación de filtros se guarda en caché hasta el siguiente cambio en productos
+    productos, siguiente_cursor = await cache_catalogo.obtener(
+        db, (cursor, skip, limit, categoria, ubicacion, bajo_minimo), cargar
+    )
+    if siguiente_cursor is not None:
+        siguiente = request.url.remove_query_params("skip").include_query_params(cursor=siguiente_cursor)
+        response.headers["X-Siguiente-Cursor"] = str(siguiente_cursor)
+        response.headers["Link"] = f'<{siguiente}>; rel="next"'
+    return productos
+
+@router.get("/productos/{producto_id}", response_model=ProductoBase, dependencies=[Depends(condicional("productos"))])
+async def obtener_producto(producto_id: int, db: AsyncSession = Depends(get_db_async)):
+    producto = await producto_por_id(db, producto_id)
     if producto is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return producto
@@ -179,7 +257,7 @@ async def obtener_producto(producto_id: int, db: AsyncSession = Depends(get_db))
 async def actualizar_producto(
     producto_id: int,
     producto_update: ProductoUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
     result = await db.execute(select(Producto).filter(Producto.id == producto_id))
     db_producto = result.scalar_one_or_none()
@@ -202,7 +280,7 @@ async def actualizar_producto(
         )
 
 @router.delete("/productos/{producto_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def eliminar_producto(producto_id: int, db: AsyncSession = Depends(get_db)):
+async def eliminar_producto(producto_id: int, db: AsyncSession = Depends(get_db_escritura)):
     result = await db.execute(select(Producto).filter(Producto.id == producto_id))
     producto = result.scalar_one_or_none()
     if producto is None:
@@ -220,37 +298,20 @@ async def eliminar_producto(producto_id: int, db: AsyncSession = Depends(get_db)
 
 # Endpoints para Movimientos de Inventario
 @router.post("/movimientos/", response_model=MovimientoBase, status_code=status.HTTP_201_CREATED)
-async def registrar_movimiento(movimiento: MovimientoCreate, db: AsyncSession = Depends(get_db)):
-    # Verificar que el producto existe
-    result = await db.execute(select(Producto).filter(Producto.id == movimiento.producto_id))
-    producto = result.scalar_one_or_none()
-    if not producto:
+async def registrar_movimiento(movimiento: MovimientoCreate, db: AsyncSession = Depends(get_db_escritura)):
+    # El stock se actualiza con un UPDATE condicional atómico (ver
+    # servicios/existencias.py): sin lecturas previas que puedan quedar viejas
+    try:
+        db_movimiento = await aplicar_movimiento(db, movimiento.dict())
+    except ProductoNoEncontrado:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    
-    # Crear el movimiento
-    db_movimiento = MovimientoInventario(**movimiento.dict())
-    
-    # Actualizar el stock del producto
-    stock_actual = await db.scalar(select(Producto.stock_actual).where(Producto.id == producto.id))
-    cantidad = movimiento.cantidad
-    
-    if movimiento.tipo_movimiento == "entrada":
-        nuevo_stock = Decimal(str(stock_actual)) + cantidad
-    else:  # tipo_movimiento == "salida"
-        if Decimal(str(stock_actual)) < cantidad:
-            raise HTTPException(
-                status_code=400,
-                detail="Stock insuficiente para realizar la salida"
-            )
-        nuevo_stock = Decimal(str(stock_actual)) - cantidad
-    
-    # Actualizar el stock en la base de datos
-    await db.execute(
-        update(Producto).where(Producto.id == producto.id).values(stock_actual=nuevo_stock)
-    )
+    except StockInsuficiente:
+        raise HTTPException(
+            status_code=400,
+            detail="Stock insuficiente para realizar la salida"
+        )
     
     try:
-        db.add(db_movimiento)
         await db.commit()
         await db.refresh(db_movimiento)
         return db_movimiento
@@ -261,13 +322,107 @@ async def registrar_movimiento(movimiento: MovimientoCreate, db: AsyncSession =
             detail=f"Error al registrar el movimiento: {str(e)}"
         )
 
+MAXIMO_FILAS_LOTE = 5000
+COLUMNAS_LOTE = list(MovimientoCreate.__fields__)
+
+async def _leer_filas_lote(request: Request) -> List[dict]:
+    # Acepta un arreglo JSON, un CSV en el cuerpo (text/csv) o un CSV subido
+    # como archivo en un formulario multipart (campo "archivo")
+    tipo_contenido = request.headers.get("content-type", "")
+    if tipo_contenido.startswith("application/json"):
+        filas = await request.json()
+        if not isinstance(filas, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON de movimientos")
+        return filas
+
+    if tipo_contenido.startswith("multipart/form-data"):
+        formulario = await request.form()
+        archivo = formulario.get("archivo")
+        if archivo is None or isinstance(archivo, str):
+            raise HTTPException(status_code=400, detail="Falta el archivo CSV en el campo 'archivo'")
+        contenido = await archivo.read()
+    elif tipo_contenido.startswith("text/csv"):
+        contenido = await request.body()
+    else:
+        raise HTTPException(status_code=415, detail="Use application/json, text/csv o multipart/form-data")
+
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El CSV debe estar codificado en UTF-8")
+    lector = csv.DictReader(io.StringIO(texto))
+    faltantes = {"producto_id", "tipo_movimiento", "cantidad", "responsable", "motivo"} - set(lector.fieldnames or [])
+    if faltantes:
+        raise HTTPException(status_code=400, detail=f"Faltan columnas en el CSV: {', '.join(sorted(faltantes))}")
+    # Las celdas vacías equivalen a campos no enviados
+    return [{clave: valor for clave, valor in fila.items() if clave in COLUMNAS_LOTE and valor != ""} for fila in lector]
+
+@router.post("/movimientos/lote", response_model=ResultadoLote)
+async def registrar_movimientos_lote(
+    request: Request,
+    atomico: bool = Query(False, description="Si alguna fila falla, no aplicar ninguna"),
+    db: AsyncSession = Depends(get_db_escritura)
+):
+    filas = await _leer_filas_lote(request)
+    if len(filas) > MAXIMO_FILAS_LOTE:
+        raise HTTPException(status_code=413, detail=f"El lote admite como máximo {MAXIMO_FILAS_LOTE} movimientos")
+
+    # Validar todas las filas en una sola pasada
+    resultados = {}
+    validos = []
+    for numero, fila in enumerate(filas, start=1):
+        try:
+            validos.append((numero, MovimientoCreate.parse_obj(fila).dict()))
+        except ValidationError as e:
+            resultados[numero] = ResultadoFilaLote(
+                fila=numero,
+                estado="invalido",
+                errores=[f"{'.'.join(str(p) for p in error['loc'])}: {error['msg']}" for error in e.errors()],
+            )
+
+    if atomico and resultados:
+        validos_rechazados = [
+            ResultadoFilaLote(fila=numero, estado="rechazado", producto_id=datos["producto_id"],
+                              errores=["Lote cancelado: otras filas son inválidas"])
+            for numero, datos in validos
+        ]
+        resultados.update({r.fila: r for r in validos_rechazados})
+    elif validos:
+        try:
+            aplicados = await aplicar_lote(db, validos, atomico=atomico)
+        except StockInsuficiente as e:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+        for numero, estado, producto_id, errores in aplicados:
+            resultados[numero] = ResultadoFilaLote(fila=numero, estado=estado, producto_id=producto_id, errores=errores)
+
+    try:
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error al registrar el lote de movimientos: {str(e)}"
+        )
+
+    ordenados = [resultados[numero] for numero in sorted(resultados)]
+    total_aplicados = sum(1 for r in ordenados if r.estado == "aplicado")
+    respuesta = ResultadoLote(
+        aplicados=total_aplicados,
+        rechazados=len(ordenados) - total_aplicados,
+        resultados=ordenados,
+    )
+    if atomico and total_aplicados < len(ordenados):
+        return JSONResponse(status_code=400, content=respuesta.dict())
+    return respuesta
+
 @router.get("/movimientos/", response_model=List[MovimientoBase])
 async def listar_movimientos(
     skip: int = 0,
     limit: int = 100,
     producto_id: Optional[int] = None,
     tipo_movimiento: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
     query = select(MovimientoInventario)
     if producto_id:
@@ -277,12 +432,28 @@ async def listar_movimientos(
     result = await db.execute(query.offset(skip).limit(limit))
     return result.scalars().all()
 
+# Conciliación del stock contra el saldo de movimientos
+@router.get("/conciliacion/", response_model=List[DiferenciaExistencias])
+async def revisar_conciliacion(
+    producto_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db_async)
+):
+    return await conciliar_existencias(db, producto_id)
+
+@router.post("/conciliacion/", response_model=List[DiferenciaExistencias])
+async def corregir_conciliacion(
+    producto_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db_escritura)
+):
+    diferencias = await conciliar_existencias(db, producto_id, corregir=True)
+    await db.commit()
+    return diferencias
+
 # Endpoints para Suministros
 @router.post("/suministros/", response_model=SuministroBase, status_code=status.HTTP_201_CREATED)
-async def crear_suministro(suministro: SuministroCreate, db: AsyncSession = Depends(get_db)):
+async def crear_suministro(suministro: SuministroCreate, db: AsyncSession = Depends(get_db_escritura)):
     # Verificar que el producto existe
-    result = await db.execute(select(Producto).filter(Producto.id == suministro.producto_id))
-    producto = result.scalar_one_or_none()
+    producto = await producto_por_id(db, suministro.producto_id)
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
@@ -306,7 +477,7 @@ async def listar_suministros(
     limit: int = 100,
     producto_id: Optional[int] = None,
     estado: Optional[EstadoSuministro] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
     query = select(Suministro)
     if producto_id:
@@ -317,9 +488,8 @@ async def listar_suministros(
     return result.scalars().all()
 
 @router.get("/suministros/{suministro_id}", response_model=SuministroBase)
-async def obtener_suministro(suministro_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Suministro).filter(Suministro.id == suministro_id))
-    suministro = result.scalar_one_or_none()
+async def obtener_suministro(suministro_id: int, db: AsyncSession = Depends(get_db_async)):
+    suministro = await suministro_por_id(db, suministro_id)
     if suministro is None:
         raise HTTPException(status_code=404, detail="Suministro no encontrado")
     return suministro
@@ -328,7 +498,7 @@ async def obtener_suministro(suministro_id: int, db: AsyncSession = Depends(get_
 async def actualizar_suministro(
     suministro_id: int,
     suministro_update: SuministroUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
     result = await db.execute(select(Suministro).filter(Suministro.id == suministro_id))
     db_suministro = result.scalar_one_or_none()
@@ -351,7 +521,7 @@ async def actualizar_suministro(
         )
 
 @router.delete("/suministros/{suministro_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def eliminar_suministro(suministro_id: int, db: AsyncSession = Depends(get_db)):
+async def eliminar_suministro(suministro_id: int, db: AsyncSession = Depends(get_db_escritura)):
     result = await db.execute(select(Suministro).filter(Suministro.id == suministro_id))
     suministro = result.scalar_one_or_none()
     if suministro is None:
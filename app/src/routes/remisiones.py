@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload, joinedload
 from typing import List, Optional
 from datetime import datetime
 
@@ -14,13 +16,15 @@ from ..models import (
     Residente,
     Colaborador
 )
-from ..models.database import get_db
-from sqlalchemy.orm import Session
+from ..models.database import get_db_async, get_db_escritura
+from ..servicios.folios import asignar_numero_remision
+from ..servicios.catalogo import residente_por_id
+from ..servicios.condicional import condicional
+from ..servicios.eventos import bus_remisiones, formatear_evento
 from pydantic import BaseModel, Field
 
 # Modelos de Solicitud/Respuesta
 class RemisionBase(BaseModel):
-    numero_remision: str
     residente_id: int
     tipo: TipoRemision
     estado: Optional[EstadoRemision] = EstadoRemision.PROGRAMADA
@@ -36,6 +40,11 @@ class RemisionBase(BaseModel):
 class RemisionCreate(RemisionBase):
     pass
 
+# El número de remisión lo asigna el servidor al crearla
+class RemisionResponse(RemisionBase):
+    id: int
+    numero_remision: str
+
 class RemisionUpdate(BaseModel):
     estado: Optional[EstadoRemision] = None
     fecha_salida: Optional[datetime] = None
@@ -66,23 +75,108 @@ class TrazabilidadProfesionalBase(BaseModel):
 class TrazabilidadProfesionalCreate(TrazabilidadProfesionalBase):
     pass
 
+# Expediente completo de una remisión
+class ResidenteResumen(BaseModel):
+    id: int
+    nombre: str
+    apellido_paterno: str
+    apellido_materno: Optional[str] = None
+    numero_expediente: str
+
+class ColaboradorResumen(BaseModel):
+    id: int
+    nombre: str
+    apellido_paterno: str
+    apellido_materno: Optional[str] = None
+
+class SeguimientoExpediente(SeguimientoRemisionBase):
+    id: int
+    completado: Optional[bool] = None
+
+class TrazabilidadExpediente(TrazabilidadProfesionalBase):
+    id: int
+    colaborador: ColaboradorResumen
+
+class ExpedienteRemision(RemisionResponse):
+    fecha_salida: Optional[datetime] = None
+    fecha_retorno: Optional[datetime] = None
+    notas_seguimiento: Optional[str] = None
+    residente: ResidenteResumen
+    eventos_seguimiento: List[SeguimientoExpediente]
+    trazabilidad_profesionales: List[TrazabilidadExpediente]
+
 # Router
 router = APIRouter(prefix="/remisiones", tags=["Remisiones"])
 
+# Seguimiento en vivo (Server-Sent Events). Los eventos salen del bus en
+# memoria, así que los paneles abiertos no consultan la base de datos.
+INTERVALO_LATIDO = 15    # segundos sin eventos antes de enviar un comentario
+REINTENTO_MS = 3000      # espera sugerida al navegador antes de reconectar
+
+def _publicar_seguimiento(seguimiento: SeguimientoRemision):
+    bus_remisiones.publicar("seguimiento", seguimiento.remision_id, {
+        "id": seguimiento.id,
+        "tipo_evento": seguimiento.tipo_evento.value,
+        "fecha_hora": seguimiento.fecha_hora,
+        "ubicacion": seguimiento.ubicacion,
+        "descripcion": seguimiento.descripcion,
+        "responsable": seguimiento.responsable,
+    })
+
+def _publicar_estado(remision: Remision):
+    bus_remisiones.publicar("estado", remision.id, {
+        "numero_remision": remision.numero_remision,
+        "estado": remision.estado.value,
+        "fecha_salida": remision.fecha_salida,
+        "fecha_retorno": remision.fecha_retorno,
+    })
+
+@router.get("/eventos")
+async def flujo_eventos(
+    remision_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None)
+):
+    async def flujo():
+        suscripcion, perdidos = bus_remisiones.suscribir(remision_id, last_event_id)
+        try:
+            yield f"retry: {REINTENTO_MS}\n\n"
+            if perdidos is None:
+                # El historial ya no cubre la desconexión: el cliente recarga
+                # el estado con GET y continúa desde el último id
+                yield f"id: {bus_remisiones.ultimo_id}\nevent: reinicio\ndata: {{}}\n\n"
+            for evento in perdidos or []:
+                yield formatear_evento(evento)
+
+            while not suscripcion.cerrada:
+                eventos = await suscripcion.esperar(INTERVALO_LATIDO)
+                if suscripcion.desbordada:
+                    # Cliente demasiado lento: se cierra el flujo y, al
+                    # reconectar con Last-Event-ID, se pone al día
+                    break
+                for evento in eventos:
+                    yield formatear_evento(evento)
+                if not eventos and not suscripcion.cerrada:
+                    yield ": latido\n\n"
+        finally:
+            bus_remisiones.cancelar(suscripcion)
+
+    return StreamingResponse(
+        flujo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Endpoints existentes de remisiones (sin cambios)
-@router.post("/", response_model=RemisionBase)
-async def crear_remision(remision: RemisionCreate, db: AsyncSession = Depends(get_db)):
+@router.post("/", response_model=RemisionResponse)
+async def crear_remision(remision: RemisionCreate, db: AsyncSession = Depends(get_db_escritura)):
     # Verificar que el residente exista
-    result = await db.execute(select(Residente).filter(Residente.id == remision.residente_id))
-    residente = result.scalar_one_or_none()
+    residente = await residente_por_id(db, remision.residente_id)
     if not residente:
         raise HTTPException(status_code=404, detail="Residente no encontrado")
 
-    # Generar número de remisión único
-    result = await db.execute(select(Remision))
-    total_remisiones = len(result.scalars().all())
-    nuevo_numero = f"REM-{datetime.now().strftime('%Y%m%d')}-{total_remisiones + 1:04d}"
-    
+    # Asignar el siguiente número del día en la misma transacción
+    nuevo_numero = await asignar_numero_remision(db)
+
     db_remision = Remision(
         numero_remision=nuevo_numero,
         **remision.dict()
@@ -99,7 +193,7 @@ async def crear_remision(remision: RemisionCreate, db: AsyncSession = Depends(ge
 async def agregar_trazabilidad_profesional(
     remision_id: int, 
     trazabilidad: TrazabilidadProfesionalCreate, 
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
     # Verificar que la remisión exista
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
@@ -125,7 +219,7 @@ async def agregar_trazabilidad_profesional(
     return db_trazabilidad
 
 @router.get("/{remision_id}/trazabilidad", response_model=List[TrazabilidadProfesionalBase])
-async def listar_trazabilidad_profesional(remision_id: int, db: AsyncSession = Depends(get_db)):
+async def listar_trazabilidad_profesional(remision_id: int, db: AsyncSession = Depends(get_db_async)):
     # Verificar que la remisión exista
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
     remision = result.scalar_one_or_none()
@@ -140,11 +234,11 @@ async def listar_trazabilidad_profesional(remision_id: int, db: AsyncSession = D
     return trazabilidades
 
 # Endpoints existentes (sin cambios)
-@router.get("/", response_model=List[RemisionBase])
+@router.get("/", response_model=List[RemisionResponse], dependencies=[Depends(condicional("remisiones"))])
 async def listar_remisiones(
     estado: Optional[EstadoRemision] = None, 
     tipo: Optional[TipoRemision] = None, 
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
     query = select(Remision)
     
@@ -157,8 +251,8 @@ async def listar_remisiones(
     result = await db.execute(query)
     return result.scalars().all()
 
-@router.get("/{remision_id}", response_model=RemisionBase)
-async def obtener_remision(remision_id: int, db: AsyncSession = Depends(get_db)):
+@router.get("/{remision_id}", response_model=RemisionResponse, dependencies=[Depends(condicional("remisiones"))])
+async def obtener_remision(remision_id: int, db: AsyncSession = Depends(get_db_async)):
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
     remision = result.scalar_one_or_none()
     
@@ -167,11 +261,32 @@ async def obtener_remision(remision_id: int, db: AsyncSession = Depends(get_db))
     
     return remision
 
-@router.put("/{remision_id}", response_model=RemisionBase)
+# Remisión con su residente, seguimiento y trazabilidad en tres consultas,
+# sin importar cuántos eventos o intervenciones tenga
+@router.get("/{remision_id}/expediente", response_model=ExpedienteRemision)
+async def obtener_expediente(remision_id: int, db: AsyncSession = Depends(get_db_async)):
+    result = await db.execute(
+        select(Remision)
+        .options(
+            joinedload(Remision.residente),
+            selectinload(Remision.eventos_seguimiento),
+            selectinload(Remision.trazabilidad_profesionales)
+            .joinedload(TrazabilidadProfesional.colaborador),
+        )
+        .filter(Remision.id == remision_id)
+    )
+    remision = result.unique().scalar_one_or_none()
+
+    if not remision:
+        raise HTTPException(status_code=404, detail="Remisión no encontrada")
+
+    return remision
+
+@router.put("/{remision_id}", response_model=RemisionResponse)
 async def actualizar_remision(
     remision_id: int, 
     remision_update: RemisionUpdate, 
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
     db_remision = result.scalar_one_or_none()
@@ -179,11 +294,15 @@ async def actualizar_remision(
     if not db_remision:
         raise HTTPException(status_code=404, detail="Remisión no encontrada")
     
+    estado_anterior = db_remision.estado
     for key, value in remision_update.dict(exclude_unset=True).items():
         setattr(db_remision, key, value)
     
     await db.commit()
     await db.refresh(db_remision)
+
+    if db_remision.estado != estado_anterior:
+        _publicar_estado(db_remision)
     
     return db_remision
 
@@ -191,7 +310,7 @@ async def actualizar_remision(
 async def agregar_seguimiento(
     remision_id: int, 
     seguimiento: SeguimientoRemisionCreate, 
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db_escritura)
 ):
     # Verificar que la remisión exista
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
@@ -200,17 +319,24 @@ async def agregar_seguimiento(
         raise HTTPException(status_code=404, detail="Remisión no encontrada")
 
     db_seguimiento = SeguimientoRemision(
-        **seguimiento.dict()
+        remision_id=remision_id,
+        **seguimiento.dict(exclude={'remision_id'})
     )
     
     db.add(db_seguimiento)
     await db.commit()
     await db.refresh(db_seguimiento)
+
+    _publicar_seguimiento(db_seguimiento)
     
     return db_seguimiento
 
-@router.get("/{remision_id}/seguimiento", response_model=List[SeguimientoRemisionBase])
-async def listar_seguimientos(remision_id: int, db: AsyncSession = Depends(get_db)):
+@router.get(
+    "/{remision_id}/seguimiento",
+    response_model=List[SeguimientoRemisionBase],
+    dependencies=[Depends(condicional("remisiones", "seguimiento_remisiones"))],
+)
+async def listar_seguimientos(remision_id: int, db: AsyncSession = Depends(get_db_async)):
     # Verificar que la remisión exista
     result = await db.execute(select(Remision).filter(Remision.id == remision_id))
     remision = result.scalar_one_or_none()
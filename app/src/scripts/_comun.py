@@ -0,0 +1,61 @@
+import os
+import re
+import tempfile
+from datetime import date
+
+# Piezas comunes de los scripts de verificación y benchmark. Se importa
+# después de agregar REPO_ROOT a sys.path y antes que la aplicación:
+# base_temporal() fija APS_DB_PATH, que se lee al importar
+# app.src.models.database. Los modelos se importan dentro de cada función
+# por la misma razón.
+
+# Consultas de la petición, de la cabecera Server-Timing del middleware de métricas
+SERVER_TIMING_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+def base_temporal(nombre: str) -> str:
+    # Base de datos temporal para no tocar aps.db (una APS_DB_PATH definida
+    # la reemplaza); devuelve el directorio, que el script puede usar para
+    # sus demás archivos
+    directorio = tempfile.mkdtemp(prefix=f"aps-{nombre}-")
+    os.environ.setdefault("APS_DB_PATH", os.path.join(directorio, f"{nombre}.db"))
+    return directorio
+
+def consultas(respuesta) -> int:
+    return int(SERVER_TIMING_CONSULTAS.search(respuesta.headers["server-timing"]).group(1))
+
+def nuevo_residente(numero_expediente: str, **campos):
+    from app.src.models import Residente, TipoSangre
+
+    datos = dict(
+        nombre="Residente",
+        apellido_paterno="Prueba",
+        fecha_nacimiento=date(1940, 1, 1),
+        fecha_ingreso=date(2020, 1, 1),
+        tipo_sangre=TipoSangre.O_POSITIVO,
+        contacto_emergencia_nombre="Contacto",
+        contacto_emergencia_relacion="Hijo",
+        contacto_emergencia_telefono="5550000000",
+        numero_expediente=numero_expediente,
+    )
+    datos.update(campos)
+    return Residente(**datos)
+
+def nuevo_colaborador(clave: str, **campos):
+    # El correo es <clave>@aps.local y la contraseña, la clave
+    from app.src.models import Colaborador, TipoColaborador
+    from app.src.models.colaboradores import RolAcceso
+
+    datos = dict(
+        nombre=clave.capitalize(),
+        apellido_paterno="Prueba",
+        fecha_nacimiento=date(1980, 1, 1),
+        tipo=TipoColaborador.ADMINISTRATIVO,
+        correo=f"{clave}@aps.local",
+        fecha_ingreso=date.today(),
+        numero_empleado=clave.upper(),
+        turno="Matutino",
+        rol=RolAcceso.ADMIN,
+    )
+    datos.update(campos)
+    datos.setdefault("contrasena", Colaborador.hashear_contrasena(clave))
+    return Colaborador(**datos)
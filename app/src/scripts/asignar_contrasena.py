@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import getpass
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from sqlalchemy import update
+from app.src.models.database import close_engines, AsyncSessionEscritura, DB_PATH
+from app.src.models.colaboradores import Colaborador
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Asigna la contraseña de un colaborador por su correo, p. ej. a los
+# importados, que se crean sin contraseña utilizable. Las sesiones que
+# tuviera abiertas quedan revocadas.
+#
+#   python app/src/scripts/asignar_contrasena.py enfermera@asilo.com
+
+
+async def asignar(correo: str, contrasena: str) -> bool:
+    try:
+        async with AsyncSessionEscritura() as db:
+            result = await db.execute(
+                update(Colaborador)
+                .where(Colaborador.correo == correo)
+                .values(
+                    contrasena=Colaborador.hashear_contrasena(contrasena),
+                    sesiones_validas_desde=int(time.time()) + 1,
+                )
+            )
+            await db.commit()
+            return result.rowcount > 0
+    finally:
+        await close_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asignar la contraseña de un colaborador")
+    parser.add_argument("correo")
+    args = parser.parse_args()
+
+    contrasena = getpass.getpass("Contraseña nueva: ")
+    if len(contrasena) < 8:
+        parser.error("La contraseña debe tener al menos 8 caracteres")
+    if getpass.getpass("Repite la contraseña: ") != contrasena:
+        parser.error("Las contraseñas no coinciden")
+
+    logger.info(f"Asignando contraseña en {DB_PATH}")
+    if not asyncio.run(asignar(args.correo.strip().lower(), contrasena)):
+        logger.error(f"No existe un colaborador con el correo {args.correo}")
+        sys.exit(1)
+    logger.info("Contraseña asignada")
@@ -0,0 +1,294 @@
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Benchmark de la aplicación completa (middleware, sesión, rutas, base de
+# datos) contra una base generada con scripts/generar_datos.py. Las
+# peticiones se hacen en proceso con el cliente ASGI, así que se mide el
+# servidor sin la red; la mezcla de peticiones sale de la semilla y es la
+# misma en cada corrida.
+#
+#   python app/src/scripts/generar_datos.py --db /tmp/aps-benchmark.db
+#   python app/src/scripts/benchmark.py --db /tmp/aps-benchmark.db --salida antes.json
+#   ... cambios ...
+#   python app/src/scripts/benchmark.py --db /tmp/aps-benchmark.db --comparar antes.json
+#
+# Con --escrituras se incluyen altas de movimientos, remisiones y eventos de
+# seguimiento; modifican la base, así que conviene regenerarla (o usar una
+# copia) antes de comparar dos corridas con escrituras.
+
+MUESTRAS = 200
+BUSQUEDAS = ["paracetamol", "gasa", "guantes", "garcía", "hernández", "hospital", "cardiología"]
+
+
+def percentil(valores, p: float) -> float:
+    # Percentil por rango más cercano sobre valores ordenados
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def resumir(latencias, errores: int, duracion: float) -> dict:
+    ordenadas = sorted(latencias)
+    return {
+        "peticiones": len(ordenadas),
+        "errores": errores,
+        "media_ms": round(sum(ordenadas) / len(ordenadas) * 1000, 2) if ordenadas else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 2),
+        "maximo_ms": round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0,
+        "por_segundo": round(len(ordenadas) / duracion, 1) if duracion else 0.0,
+    }
+
+
+def commit_actual() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        cambios = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{commit}-modificado" if cambios else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+async def muestras_bd():
+    # Identificadores reales para las rutas con parámetros y volúmenes de la base
+    from sqlalchemy import func
+    from sqlalchemy.future import select
+    from app.src.models import (
+        Colaborador, Residente, Producto, MovimientoInventario, Remision, Factura, AsyncSessionLocal,
+    )
+    from app.src.models.colaboradores import RolAcceso
+    from app.src.models.inventario import Suministro
+
+    async with AsyncSessionLocal() as db:
+        admin = await db.scalar(
+            select(Colaborador).where(Colaborador.rol == RolAcceso.ADMIN, Colaborador.activo.is_(True)).limit(1)
+        )
+        volumenes = {
+            modelo.__tablename__: await db.scalar(select(func.count()).select_from(modelo))
+            for modelo in (Residente, Producto, MovimientoInventario, Remision, Factura)
+        }
+
+        async def ids(consulta):
+            return list((await db.scalars(consulta.order_by(func.random()).limit(MUESTRAS))).all())
+
+        muestras = {
+            "residentes": await ids(select(Residente.id).where(Residente.activo.is_(True))),
+            "productos": await ids(select(Producto.id)),
+            "remisiones": await ids(select(Remision.id)),
+            "facturas": await ids(select(Factura.id)),
+            "suministros": await ids(select(Suministro.id).where(Suministro.costo_unitario.isnot(None))),
+        }
+    return admin, volumenes, muestras
+
+
+def escenarios(muestras: dict, escrituras: bool):
+    # (nombre, peso, función que arma (método, ruta, cuerpo) con un Random)
+    def uno(clave):
+        return lambda aleatorio: aleatorio.choice(muestras[clave])
+
+    residente, producto, remision, factura = uno("residentes"), uno("productos"), uno("remisiones"), uno("facturas")
+    lista = [
+        ("productos: página", 10, lambda a: ("GET", "/inventario/productos/?limit=50", None)),
+        ("productos: bajo mínimo", 3, lambda a: ("GET", "/inventario/productos/?bajo_minimo=true", None)),
+        ("producto", 10, lambda a: ("GET", f"/inventario/productos/{producto(a)}", None)),
+        ("movimientos de producto", 8, lambda a: ("GET", f"/inventario/movimientos/?producto_id={producto(a)}&limit=50", None)),
+        ("remisiones programadas", 4, lambda a: ("GET", "/remisiones/?estado=programada", None)),
+        ("remisión", 10, lambda a: ("GET", f"/remisiones/{remision(a)}", None)),
+        ("expediente de remisión", 8, lambda a: ("GET", f"/remisiones/{remision(a)}/expediente", None)),
+        ("seguimiento de remisión", 6, lambda a: ("GET", f"/remisiones/{remision(a)}/seguimiento", None)),
+        ("facturas de residente", 6, lambda a: ("GET", f"/facturacion/?residente_id={residente(a)}", None)),
+        ("factura", 8, lambda a: ("GET", f"/facturacion/{factura(a)}", None)),
+        ("búsqueda", 6, lambda a: ("GET", f"/buscar?q={a.choice(BUSQUEDAS)}", None)),
+        ("indicadores", 3, lambda a: ("GET", "/dashboard/indicadores", None)),
+        ("alertas", 3, lambda a: ("GET", "/alertas/", None)),
+    ]
+    if escrituras:
+        lista += [
+            ("alta de movimiento", 4, lambda a: ("POST", "/inventario/movimientos/", {
+                "producto_id": producto(a), "tipo_movimiento": "salida", "cantidad": "0.5",
+                "responsable": "Benchmark", "motivo": "Consumo de residente", "residente_id": residente(a),
+            })),
+            ("alta de remisión", 2, lambda a: ("POST", "/remisiones/", {
+                "residente_id": residente(a), "tipo": "consulta", "institucion_destino": "Hospital General",
+                "direccion_destino": "Centro", "fecha_programada": "2026-10-20T10:00:00", "motivo": "Control",
+                "diagnostico_envio": "Estable", "medico_remitente": "Dra. López",
+            })),
+            ("evento de seguimiento", 2, lambda a: (lambda r: ("POST", f"/remisiones/{r}/seguimiento", {
+                "remision_id": r, "tipo_evento": "incidencia", "fecha_hora": "2026-10-20T11:00:00",
+            }))(remision(a))),
+        ]
+    return lista
+
+
+async def ejecutar(args) -> dict:
+    import httpx
+    from app.src.main import app
+    from app.src.models.database import close_engines, DB_PATH
+    from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+    admin, volumenes, muestras = await muestras_bd()
+    if admin is None or not all(muestras.values()):
+        await close_engines()
+        logger.error(f"{DB_PATH} no tiene datos suficientes; genérelos con scripts/generar_datos.py")
+        sys.exit(1)
+    logger.info(f"Base de datos {DB_PATH}: " + ", ".join(f"{tabla} {total:,}" for tabla, total in volumenes.items()))
+
+    lista = escenarios(muestras, args.escrituras)
+    aleatorio = random.Random(args.semilla)
+    elegidos = aleatorio.choices(lista, weights=[peso for _, peso, _ in lista], k=args.calentamiento + args.peticiones)
+    plan = [(nombre, *armar(aleatorio)) for nombre, _, armar in elegidos]
+
+    latencias = {nombre: [] for nombre, _, _ in lista}
+    errores = {nombre: 0 for nombre, _, _ in lista}
+    detalle_errores = []
+
+    transporte = httpx.ASGITransport(app=app)
+    limites = httpx.Limits(max_connections=args.concurrencia)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps", limits=limites, timeout=60) as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, crear_sesion(admin))
+
+        # Calentamiento: compila consultas y llena la caché de páginas de SQLite
+        for _, metodo, ruta, cuerpo in plan[:args.calentamiento]:
+            await cliente.request(metodo, ruta, json=cuerpo)
+
+        pendientes = iter(plan[args.calentamiento:])
+
+        async def trabajador():
+            for nombre, metodo, ruta, cuerpo in pendientes:
+                inicio = time.perf_counter()
+                respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+                latencias[nombre].append(time.perf_counter() - inicio)
+                if respuesta.status_code >= 400:
+                    errores[nombre] += 1
+                    if len(detalle_errores) < 10:
+                        detalle_errores.append(f"{metodo} {ruta}: {respuesta.status_code} {respuesta.text[:200]}")
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(args.concurrencia)))
+        duracion = time.perf_counter() - inicio
+    await close_engines()
+
+    for detalle in detalle_errores:
+        logger.warning(detalle)
+
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "configuracion": {
+            "peticiones": args.peticiones,
+            "concurrencia": args.concurrencia,
+            "calentamiento": args.calentamiento,
+            "escrituras": args.escrituras,
+            "semilla": args.semilla,
+            "python": sys.version.split()[0],
+            "volumenes": volumenes,
+        },
+        "duracion_s": round(duracion, 3),
+        "total": resumir([l for valores in latencias.values() for l in valores], sum(errores.values()), duracion),
+        "escenarios": {
+            nombre: resumir(latencias[nombre], errores[nombre], duracion) for nombre, _, _ in lista if latencias[nombre]
+        },
+    }
+
+
+def mostrar(resultado: dict):
+    columnas = ("peticiones", "errores", "media_ms", "p50_ms", "p95_ms", "p99_ms", "maximo_ms")
+    ancho = max(len(nombre) for nombre in resultado["escenarios"]) + 2
+    lineas = [f"{'escenario':<{ancho}}" + "".join(f"{columna:>11}" for columna in columnas)]
+    filas = list(resultado["escenarios"].items()) + [("TOTAL", resultado["total"])]
+    for nombre, datos in filas:
+        lineas.append(f"{nombre:<{ancho}}" + "".join(f"{datos[columna]:>11}" for columna in columnas))
+    total = resultado["total"]
+    lineas.append(
+        f"{total['peticiones']} peticiones en {resultado['duracion_s']} s con concurrencia "
+        f"{resultado['configuracion']['concurrencia']}: {total['por_segundo']} peticiones/s (commit {resultado['commit']})"
+    )
+    print("\n".join(lineas))
+
+
+def comparar(anterior: dict, actual: dict):
+    if anterior["configuracion"]["volumenes"] != actual["configuracion"]["volumenes"]:
+        logger.warning("Las bases de datos de las dos corridas tienen volúmenes distintos; la comparación es orientativa")
+    for clave in ("peticiones", "concurrencia", "escrituras", "semilla"):
+        if anterior["configuracion"].get(clave) != actual["configuracion"].get(clave):
+            logger.warning(f"Configuración distinta en {clave}: "
+                           f"{anterior['configuracion'].get(clave)} → {actual['configuracion'].get(clave)}")
+
+    def cambio(antes: float, despues: float) -> str:
+        if not antes:
+            return "     n/d"
+        return f"{(despues - antes) / antes * 100:+7.1f}%"
+
+    columnas = ("p50_ms", "p95_ms", "p99_ms")
+    filas = [(nombre, anterior["escenarios"].get(nombre), datos) for nombre, datos in actual["escenarios"].items()]
+    filas.append(("TOTAL", anterior["total"], actual["total"]))
+    ancho = max(len(nombre) for nombre, _, _ in filas) + 2
+    lineas = [f"Comparación con {anterior['commit']} ({anterior['fecha']}) → {actual['commit']}",
+              f"{'escenario':<{ancho}}" + "".join(f"{columna:>26}" for columna in columnas)]
+    for nombre, antes, despues in filas:
+        if antes is None:
+            lineas.append(f"{nombre:<{ancho}}  (sin datos en la corrida anterior)")
+            continue
+        lineas.append(f"{nombre:<{ancho}}" + "".join(
+            f"{antes[c]:>8} → {despues[c]:>8} {cambio(antes[c], despues[c])}" for c in columnas
+        ))
+    lineas.append(f"Peticiones/s: {anterior['total']['por_segundo']} → {actual['total']['por_segundo']} "
+                  f"{cambio(anterior['total']['por_segundo'], actual['total']['por_segundo'])}")
+    print("\n".join(lineas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la aplicación sobre datos generados")
+    parser.add_argument("--db", help="Base de datos generada (por defecto APS_DB_PATH o aps.db)")
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    parser.add_argument("--calentamiento", type=int, default=100)
+    parser.add_argument("--escrituras", action="store_true", help="Incluir peticiones que modifican la base")
+    parser.add_argument("--semilla", type=int, default=20260101)
+    parser.add_argument("--salida", help="Guardar el resultado en este archivo JSON")
+    parser.add_argument("--comparar", help="Resultado JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    if args.db:
+        if not os.path.exists(args.db):
+            parser.error(f"No existe {args.db}; genérela con scripts/generar_datos.py")
+        os.environ["APS_DB_PATH"] = os.path.abspath(args.db)
+    os.environ.setdefault("APS_PROGRAMADOR", "0")
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+
+    resultado = asyncio.run(ejecutar(args))
+    mostrar(resultado)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+        logger.info(f"Resultado guardado en {args.salida}")
+    if anterior is not None:
+        comparar(anterior, resultado)
+    if resultado["total"]["errores"]:
+        sys.exit(1)
@@ -0,0 +1,155 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+import httpx
+from sqlalchemy import event
+from app.src.main import app
+from app.src.models.database import create_tables, close_engines, engine_async, engine_async_escritura, engine_sync
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RUTAS = ["/inventario/productos/", "/remisiones/", "/inventario/movimientos/"]
+
+# Que haya peticiones en vuelo a la vez no prueba nada: también ocurre si
+# los handlers bloquean el bucle, porque se aceptan antes de bloquearse. Lo
+# que se verifica es el retraso del bucle de eventos. Para que el trabajo de
+# la base de datos pese, se simula una base lenta: SQLite llama a
+# _base_lenta cada INSTRUCCIONES_SQLITE instrucciones de su máquina virtual,
+# en el hilo que ejecuta la consulta. Con sesiones asíncronas ese hilo es el
+# de aiosqlite y el bucle sigue libre; una consulta síncrona en un handler
+# duerme en el hilo del bucle y el retraso se dispara.
+INSTRUCCIONES_SQLITE = 100
+RETRASO_SQLITE = 0.002  # segundos por cada INSTRUCCIONES_SQLITE instrucciones
+base_lenta = False
+
+
+def _base_lenta():
+    if base_lenta:
+        time.sleep(RETRASO_SQLITE)
+    return 0
+
+
+def _instalar_base_lenta(dbapi_connection, connection_record):
+    # aiosqlite envuelve la conexión de sqlite3; el motor síncrono la usa directa
+    conexion = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    conexion = getattr(conexion, "_conn", conexion)
+    conexion.set_progress_handler(_base_lenta, INSTRUCCIONES_SQLITE)
+
+
+for _motor in (engine_async.sync_engine, engine_async_escritura.sync_engine, engine_sync):
+    event.listen(_motor, "connect", _instalar_base_lenta)
+
+
+class ContadorEnVuelo:
+    # Envoltorio ASGI que cuenta cuántas peticiones se atienden al mismo tiempo
+    def __init__(self, app):
+        self.app = app
+        self.en_vuelo = 0
+        self.maximo = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.en_vuelo += 1
+        self.maximo = max(self.maximo, self.en_vuelo)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.en_vuelo -= 1
+
+
+async def medir_latencia_bucle(detener: asyncio.Event, intervalo: float = 0.005):
+    # Mide cuánto se retrasa el bucle de eventos respecto al intervalo esperado
+    peor = 0.0
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        peor = max(peor, time.perf_counter() - inicio - intervalo)
+    return peor
+
+
+async def carga(cliente, rutas, concurrencia: int):
+    # Peticiones con a lo más `concurrencia` en vuelo; devuelve la duración y
+    # el peor retraso del bucle de eventos durante la carga
+    limite = asyncio.Semaphore(concurrencia)
+
+    async def una(ruta):
+        async with limite:
+            respuesta = await cliente.get(ruta)
+            respuesta.raise_for_status()
+
+    detener = asyncio.Event()
+    vigia = asyncio.create_task(medir_latencia_bucle(detener))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(ruta) for ruta in rutas))
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    return duracion, await vigia
+
+
+async def ejecutar(total: int, concurrencia: int, margen_ms: float):
+    global base_lenta
+    await create_tables()
+    contador = ContadorEnVuelo(app)
+    transporte = httpx.ASGITransport(app=contador)
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        rutas = [RUTAS[i % len(RUTAS)] for i in range(total)]
+
+        # Calentamiento: compila rutas y abre conexiones
+        for ruta in RUTAS:
+            await cliente.get(ruta)
+
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            respuesta = await cliente.get(ruta)
+            respuesta.raise_for_status()
+        secuencial = time.perf_counter() - inicio
+
+        # Referencia: retraso que causa solo el trabajo de CPU de las peticiones
+        contador.maximo = 0
+        concurrente, retraso_cpu = await carga(cliente, rutas, concurrencia)
+
+        # Con la base lenta el retraso no debe crecer: la espera es fuera del bucle
+        base_lenta = True
+        try:
+            lenta, retraso_lenta = await carga(cliente, rutas, concurrencia)
+        finally:
+            base_lenta = False
+
+    await close_engines()
+
+    limite_ms = retraso_cpu * 1000 * 2 + margen_ms
+    logger.info(f"Peticiones: {total}, concurrencia {concurrencia}")
+    logger.info(f"Tiempo secuencial: {secuencial * 1000:.1f} ms")
+    logger.info(f"Tiempo concurrente: {concurrente * 1000:.1f} ms")
+    logger.info(f"Máximo de peticiones en vuelo: {contador.maximo}")
+    logger.info(f"Peor retraso del bucle de eventos: {retraso_cpu * 1000:.1f} ms")
+    logger.info(f"Con la base de datos lenta: {lenta * 1000:.1f} ms, "
+                f"peor retraso {retraso_lenta * 1000:.1f} ms (límite {limite_ms:.1f} ms)")
+
+    if retraso_lenta * 1000 > limite_ms:
+        logger.error("El bucle de eventos se bloqueó mientras la base de datos trabajaba: "
+                     "algún handler consulta de forma síncrona")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprueba que las consultas no bloquean el bucle de eventos")
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    parser.add_argument("--margen-ms", type=float, default=20,
+                        help="Retraso extra tolerado sobre el doble del retraso sin base lenta")
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.peticiones, args.concurrencia, args.margen_ms))
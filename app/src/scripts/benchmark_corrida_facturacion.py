@@ -0,0 +1,224 @@
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_colaborador
+base_temporal("corrida")
+os.environ.setdefault("APS_FACTURACION_BLOQUE", "100")
+
+import httpx
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+from app.src.main import app
+from app.src.models import Residente, TipoSangre, Factura, DetalleFactura
+from app.src.models.inventario import Producto, MovimientoInventario, Suministro, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, AsyncSessionLocal
+from app.src.servicios.facturacion_mensual import detener_corridas
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Benchmark y prueba de reanudación de la facturación mensual: se siembra una
+# casa completa con consumos de dos meses. Un periodo se factura de corrido y
+# se mide; el otro se interrumpe a la mitad, se reanuda y se comprueba que no
+# hay facturas duplicadas ni importes distintos a los esperados. Solicitar de
+# nuevo un periodo completado no genera facturas.
+
+CENTAVO = Decimal("0.01")
+PERIODOS = ("2026-08", "2026-09")
+
+
+async def sembrar(residentes: int, productos: int, consumos: int):
+    aleatorio = random.Random(14)
+    costos = {i: Decimal(aleatorio.randint(100, 5000)) / 100 for i in range(1, productos + 1)}
+    async with AsyncSessionEscritura() as db:
+        await db.execute(insert(Residente), [
+            {
+                "nombre": f"Residente {i}",
+                "apellido_paterno": "Corrida",
+                "fecha_nacimiento": date(1940, 1, 1),
+                "fecha_ingreso": date(2020, 1, 1),
+                "tipo_sangre": TipoSangre.O_POSITIVO,
+                "contacto_emergencia_nombre": "Contacto",
+                "contacto_emergencia_relacion": "Familiar",
+                "contacto_emergencia_telefono": "5550000000",
+                "numero_expediente": f"EXP-C{i:05d}",
+                # Uno de cada 20 residentes está dado de baja y no se factura
+                "activo": i % 20 != 0,
+            }
+            for i in range(1, residentes + 1)
+        ])
+        await db.execute(insert(Producto), [
+            {
+                "codigo": f"COR-{i:04d}",
+                "nombre": f"Producto {i}",
+                "categoria": CategoriaProducto.MEDICAMENTO,
+                "unidad_medida": UnidadMedida.PIEZA,
+                "stock_actual": 0,
+                "stock_minimo": 1,
+            }
+            for i in range(1, productos + 1)
+        ])
+        # Dos suministros por producto: se factura al costo del más reciente
+        await db.execute(insert(Suministro), [
+            {"producto_id": i, "cantidad_solicitada": 100, "proveedor": "Proveedor",
+             "costo_unitario": float(costos[i] * (2 if vigente else 1))}
+            for vigente in (False, True)
+            for i in range(1, productos + 1)
+        ])
+
+        movimientos = []
+        for residente_id in range(1, residentes + 1):
+            for periodo in PERIODOS:
+                inicio = datetime.strptime(periodo, "%Y-%m")
+                for _ in range(consumos):
+                    movimientos.append({
+                        "producto_id": aleatorio.randint(1, productos),
+                        "tipo_movimiento": "salida",
+                        "cantidad": Decimal(aleatorio.randint(1, 4000)) / 1000,
+                        "responsable": "enfermería",
+                        "motivo": "consumo",
+                        "residente_id": residente_id,
+                        "fecha_movimiento": inicio + timedelta(days=aleatorio.randint(0, 27), minutes=aleatorio.randint(0, 1439)),
+                    })
+        await db.execute(insert(MovimientoInventario), movimientos)
+        # Las corridas solo las inicia y consulta un administrador
+        administrador = nuevo_colaborador("corrida")
+        db.add(administrador)
+        await db.commit()
+        return costos, crear_sesion(administrador)
+
+
+async def esperados(periodo: str, costos) -> dict:
+    inicio = datetime.strptime(periodo, "%Y-%m")
+    fin = (inicio + timedelta(days=32)).replace(day=1)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(MovimientoInventario.residente_id, MovimientoInventario.producto_id,
+                   func.sum(MovimientoInventario.cantidad))
+            .join(Residente, Residente.id == MovimientoInventario.residente_id)
+            .where(Residente.activo.is_(True))
+            .where(MovimientoInventario.fecha_movimiento >= inicio)
+            .where(MovimientoInventario.fecha_movimiento < fin)
+            .group_by(MovimientoInventario.residente_id, MovimientoInventario.producto_id)
+        )
+        totales = {}
+        for residente_id, producto_id, cantidad in result:
+            subtotal = (cantidad * costos[producto_id]).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+            totales[residente_id] = totales.get(residente_id, Decimal("0")) + subtotal
+    return totales
+
+
+async def facturado(periodo: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Factura.residente_id, func.count(), func.sum(Factura.total))
+            .where(Factura.periodo == periodo)
+            .group_by(Factura.residente_id)
+        )
+        return {residente_id: (cantidad, Decimal(str(total)).quantize(CENTAVO)) for residente_id, cantidad, total in result}
+
+
+async def esperar_corrida(cliente, periodo: str, hasta=lambda corrida: corrida["estado"] != "en_proceso"):
+    while True:
+        corrida = (await cliente.get(f"/facturacion/corridas/{periodo}")).json()
+        if hasta(corrida):
+            return corrida
+        await asyncio.sleep(0.01)
+
+
+def comparar(periodo: str, obtenidas: dict, esperadas: dict, errores: list):
+    duplicadas = [r for r, (cantidad, _) in obtenidas.items() if cantidad > 1]
+    if duplicadas:
+        errores.append(f"{periodo}: {len(duplicadas)} residentes con facturas duplicadas")
+    if set(obtenidas) != set(esperadas):
+        errores.append(f"{periodo}: se facturaron {len(obtenidas)} residentes, se esperaban {len(esperadas)}")
+    distintas = [r for r in esperadas if r in obtenidas and obtenidas[r][1] != esperadas[r]]
+    if distintas:
+        errores.append(f"{periodo}: {len(distintas)} facturas con importe distinto al esperado")
+
+
+async def ejecutar(residentes: int, productos: int, consumos: int):
+    await create_tables()
+    inicio_siembra = time.perf_counter()
+    costos, cookie = await sembrar(residentes, productos, consumos)
+    costos = {i: costo * 2 for i, costo in costos.items()}
+    logger.info(f"Siembra: {residentes} residentes, {residentes * consumos * len(PERIODOS)} movimientos "
+                f"en {time.perf_counter() - inicio_siembra:.1f} s")
+
+    errores = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        respuesta = await cliente.post("/facturacion/corridas", json={"periodo": PERIODOS[0]})
+        if respuesta.status_code != 401:
+            errores.append(f"Corrida iniciada sin sesión: {respuesta.status_code}")
+        cliente.cookies.set(NOMBRE_COOKIE, cookie)
+
+        # Periodo completo de corrido
+        corrido, interrumpido = PERIODOS
+        inicio = time.perf_counter()
+        respuesta = await cliente.post("/facturacion/corridas", json={"periodo": corrido})
+        if respuesta.status_code != 202:
+            errores.append(f"Respuesta inesperada al iniciar la corrida: {respuesta.status_code}")
+        corrida = await esperar_corrida(cliente, corrido)
+        duracion = time.perf_counter() - inicio
+        logger.info(f"Corrida {corrido}: {corrida['estado']}, {corrida['facturas_generadas']} facturas "
+                    f"de {corrida['total_residentes']} residentes en {duracion:.2f} s")
+        comparar(corrido, await facturado(corrido), await esperados(corrido, costos), errores)
+
+        # Periodo interrumpido a la mitad y reanudado
+        await cliente.post("/facturacion/corridas", json={"periodo": interrumpido})
+        parcial = await esperar_corrida(
+            cliente, interrumpido, lambda c: c["residentes_procesados"] >= c["total_residentes"] // 2
+        )
+        await detener_corridas()
+        parcial = (await cliente.get(f"/facturacion/corridas/{interrumpido}")).json()
+        logger.info(f"Corrida {interrumpido} interrumpida en {parcial['porcentaje']}% "
+                    f"({parcial['facturas_generadas']} facturas)")
+        if parcial["estado"] != "en_proceso":
+            errores.append(f"La corrida interrumpida quedó en estado {parcial['estado']}")
+
+        await cliente.post("/facturacion/corridas", json={"periodo": interrumpido})
+        corrida = await esperar_corrida(cliente, interrumpido)
+        logger.info(f"Corrida {interrumpido} reanudada: {corrida['estado']}, {corrida['facturas_generadas']} facturas")
+        comparar(interrumpido, await facturado(interrumpido), await esperados(interrumpido, costos), errores)
+
+        # Idempotencia: solicitar de nuevo un periodo completado no hace nada
+        antes = await facturado(corrido)
+        respuesta = await cliente.post("/facturacion/corridas", json={"periodo": corrido})
+        if respuesta.json()["estado"] != "completada" or await facturado(corrido) != antes:
+            errores.append("Repetir un periodo completado generó facturas nuevas")
+
+        async with AsyncSessionLocal() as db:
+            detalles = await db.scalar(select(func.count()).select_from(DetalleFactura))
+        logger.info(f"Detalles de factura generados: {detalles}")
+
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Facturación mensual sin duplicados e idempotente por periodo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark y reanudación de la facturación mensual")
+    parser.add_argument("--residentes", type=int, default=1000)
+    parser.add_argument("--productos", type=int, default=300)
+    parser.add_argument("--consumos", type=int, default=30, help="Salidas por residente y periodo")
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.residentes, args.productos, args.consumos))
@@ -0,0 +1,166 @@
+import sys
+import os
+import io
+import csv
+import time
+import asyncio
+import zipfile
+import argparse
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_colaborador
+base_temporal("exportacion")
+
+from sqlalchemy import insert
+from app.src.main import app
+from app.src.models.inventario import Producto, MovimientoInventario, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Benchmark de las exportaciones en streaming: la memoria máxima al exportar
+# todos los movimientos debe ser del mismo orden que al exportar una décima
+# parte, y el CSV y el XLSX deben traer todas las filas.
+
+INICIO = datetime(2026, 1, 1)
+
+
+async def descargar(ruta: str, cookie: str, guardar: bool = False):
+    # Cliente ASGI mínimo: cuenta los bytes recibidos sin acumular la
+    # respuesta (httpx.ASGITransport la guardaría completa en memoria)
+    ruta, _, consulta = ruta.partition("?")
+    recibido = {"bytes": 0, "trozos": 0, "estado": None, "cuerpo": io.BytesIO() if guardar else None}
+    pedido = False
+
+    async def recibir():
+        nonlocal pedido
+        if not pedido:
+            pedido = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def enviar(mensaje):
+        if mensaje["type"] == "http.response.start":
+            recibido["estado"] = mensaje["status"]
+        elif mensaje["type"] == "http.response.body":
+            cuerpo = mensaje.get("body", b"")
+            recibido["bytes"] += len(cuerpo)
+            recibido["trozos"] += 1
+            if guardar:
+                recibido["cuerpo"].write(cuerpo)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": ruta, "raw_path": ruta.encode(), "query_string": consulta.encode(),
+        "root_path": "", "client": ("127.0.0.1", 5000), "server": ("aps", 80),
+        "headers": [(b"host", b"aps"), (b"cookie", f"{NOMBRE_COOKIE}={cookie}".encode())],
+    }
+    await app(scope, recibir, enviar)
+    return recibido
+
+
+async def sembrar(filas: int) -> str:
+    async with AsyncSessionEscritura() as db:
+        colaborador = nuevo_colaborador("exportacion")
+        db.add(colaborador)
+        await db.execute(insert(Producto), [
+            {"codigo": f"EXP-{i:03d}", "nombre": f"Producto «{i}», con comas", "stock_minimo": 1,
+             "categoria": CategoriaProducto.MEDICAMENTO, "unidad_medida": UnidadMedida.PIEZA}
+            for i in range(1, 101)
+        ])
+        for bloque in range(0, filas, 20000):
+            await db.execute(insert(MovimientoInventario), [
+                {
+                    "producto_id": i % 100 + 1,
+                    "tipo_movimiento": "salida" if i % 3 else "entrada",
+                    "cantidad": Decimal(i % 5000 + 1) / 1000,
+                    "responsable": "almacén",
+                    "motivo": "consumo \"diario\"\ncon salto de línea",
+                    "fecha_movimiento": INICIO + timedelta(seconds=i * 60),
+                }
+                for i in range(bloque, min(bloque + 20000, filas))
+            ])
+        await db.commit()
+        return crear_sesion(colaborador)
+
+
+async def medir(ruta: str, cookie: str):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    recibido = await descargar(ruta, cookie)
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return recibido, duracion, pico
+
+
+async def ejecutar(filas: int):
+    await create_tables()
+    cookie = await sembrar(filas)
+    errores = []
+
+    # Calentamiento: compila consultas y abre conexiones
+    await descargar("/exportar/movimientos?producto_id=1", cookie)
+
+    decima = (INICIO + timedelta(seconds=filas // 10 * 60)).isoformat()
+    resultados = {}
+    for formato in ("csv", "xlsx"):
+        for etiqueta, ruta in (
+            ("décima parte", f"/exportar/movimientos?formato={formato}&hasta={decima}"),
+            ("completo", f"/exportar/movimientos?formato={formato}"),
+        ):
+            recibido, duracion, pico = await medir(ruta, cookie)
+            if recibido["estado"] != 200:
+                errores.append(f"{ruta} respondió {recibido['estado']}")
+            resultados[(formato, etiqueta)] = pico
+            logger.info(
+                f"{formato} {etiqueta}: {recibido['bytes'] / 1e6:.1f} MB en {recibido['trozos']} trozos, "
+                f"{duracion:.2f} s, memoria máxima {pico / 1e6:.1f} MB"
+            )
+        if resultados[(formato, "completo")] > 2 * resultados[(formato, "décima parte")] + 1e6:
+            errores.append(f"La memoria de la exportación {formato} crece con el número de filas")
+
+    # Contenido: todas las filas, bien escapadas, en ambos formatos
+    csv_completo = await descargar("/exportar/movimientos", cookie, guardar=True)
+    lector = csv.reader(io.StringIO(csv_completo["cuerpo"].getvalue().decode("utf-8-sig"), newline=""))
+    filas_csv = list(lector)
+    if len(filas_csv) != filas + 1 or filas_csv[1][8] != "consumo \"diario\"\ncon salto de línea":
+        errores.append(f"El CSV trae {len(filas_csv) - 1} filas o campos mal escapados")
+
+    xlsx = await descargar("/exportar/movimientos?formato=xlsx&producto_id=7", cookie, guardar=True)
+    with zipfile.ZipFile(xlsx["cuerpo"]) as libro:
+        hoja = libro.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        for parte in libro.namelist():
+            ET.fromstring(libro.read(parte))
+    if hoja.count("<row>") != filas // 100 + 1:
+        errores.append(f"El XLSX trae {hoja.count('<row>') - 1} filas en lugar de {filas // 100}")
+
+    sin_sesion = await descargar("/exportar/movimientos", "invalida")
+    if sin_sesion["estado"] != 401:
+        errores.append("La exportación no exige sesión")
+
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Exportaciones completas con memoria constante")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de exportaciones en streaming")
+    parser.add_argument("--filas", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.filas))
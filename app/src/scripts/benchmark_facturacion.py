@@ -0,0 +1,122 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_residente
+base_temporal("facturacion")
+
+import httpx
+from sqlalchemy import insert
+from app.src.main import app
+from app.src.models.inventario import Producto, Suministro, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+from app.src.servicios.cache import caches
+from app.src.servicios.perfilador import presupuesto_consultas, PresupuestoExcedido, PRESUPUESTOS_CONSULTAS
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Benchmark de creación de facturas con cientos de renglones. El número de
+# consultas por factura no debe depender del número de renglones ni pasar
+# del presupuesto de POST /facturacion/.
+PRESUPUESTO = PRESUPUESTOS_CONSULTAS[("POST", "/facturacion/")]
+
+
+async def sembrar(productos: int):
+    async with AsyncSessionEscritura() as db:
+        db.add(nuevo_residente("EXP-FACTURACION", apellido_paterno="Facturación"))
+        await db.execute(insert(Producto), [
+            {
+                "codigo": f"FAC-{i:05d}",
+                "nombre": f"Producto {i}",
+                "categoria": CategoriaProducto.MEDICAMENTO,
+                "unidad_medida": UnidadMedida.PIEZA,
+                "stock_actual": 1000000,
+                "stock_minimo": 1,
+            }
+            for i in range(1, productos + 1)
+        ])
+        await db.execute(insert(Suministro), [
+            {"producto_id": i, "cantidad_solicitada": 100, "proveedor": "Proveedor"}
+            for i in range(1, productos + 1)
+        ])
+        await db.commit()
+
+
+def _factura(renglones: int, productos: int, descontar: bool) -> dict:
+    return {
+        "residente_id": 1,
+        "descontar_existencias": descontar,
+        "detalles": [
+            {"suministro_id": i % productos + 1, "cantidad": "2", "precio_unitario": "15.50"}
+            for i in range(renglones)
+        ],
+    }
+
+
+async def ejecutar(facturas: int, renglones: int, productos: int):
+    await create_tables()
+    await sembrar(productos)
+
+    transporte = httpx.ASGITransport(app=app)
+    consultas = {}
+    errores = []
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        # Calentamiento
+        (await cliente.post("/facturacion/", json=_factura(1, productos, False))).raise_for_status()
+
+        for descontar in (False, True):
+            for lineas in (1, renglones):
+                # Con las cachés vacías, para comparar el camino que va a la base de datos
+                for cache in caches.values():
+                    cache.invalidar()
+                try:
+                    with presupuesto_consultas(PRESUPUESTO, f"Factura de {lineas} renglones (descontar={descontar})") as medicion:
+                        respuesta = await cliente.post("/facturacion/", json=_factura(lineas, productos, descontar))
+                except PresupuestoExcedido as e:
+                    errores.append(str(e))
+                    medicion = e.medicion
+                respuesta.raise_for_status()
+                consultas[(descontar, lineas)] = medicion.consultas
+
+            inicio = time.perf_counter()
+            for _ in range(facturas):
+                respuesta = await cliente.post("/facturacion/", json=_factura(renglones, productos, descontar))
+                respuesta.raise_for_status()
+            duracion = time.perf_counter() - inicio
+            modo = "con salida de inventario" if descontar else "sin salida de inventario"
+            logger.info(
+                f"{facturas} facturas de {renglones} renglones {modo}: "
+                f"{duracion * 1000 / facturas:.1f} ms por factura, "
+                f"{facturas * renglones / duracion:.0f} renglones/s"
+            )
+    await close_engines()
+
+    for descontar in (False, True):
+        pocas, muchas = consultas[(descontar, 1)], consultas[(descontar, renglones)]
+        logger.info(f"Consultas por factura (descontar={descontar}): 1 renglón {pocas}, {renglones} renglones {muchas}")
+        if pocas != muchas:
+            errores.append(f"Las consultas crecen con los renglones (descontar={descontar})")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de creación de facturas")
+    parser.add_argument("--facturas", type=int, default=20)
+    parser.add_argument("--renglones", type=int, default=500)
+    parser.add_argument("--productos", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.facturas, args.renglones, args.productos))
@@ -0,0 +1,277 @@
+import sys
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_colaborador
+# Los archivos de importación generados van junto a la base temporal
+DIRECTORIO = base_temporal("importacion")
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.future import select
+from app.src.main import app
+from app.src.models import Colaborador, TipoColaborador, Residente
+from app.src.models.colaboradores import RolAcceso
+from app.src.models.inventario import Producto
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, AsyncSessionLocal
+from app.src.routes.importaciones import entidad_importacion
+from app.src.servicios import importacion
+from app.src.servicios.importacion import LECTORES, importar
+from app.src.servicios.sesiones import crear_sesion, almacen_sesiones, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Benchmark y prueba de la importación masiva: un catálogo de productos de
+# 100k filas se importa con memoria del mismo orden que uno de 10k; las filas
+# inválidas quedan en el reporte sin detener el archivo, la reimportación
+# actualiza sin tocar las columnas ausentes y los tres formatos (CSV, NDJSON,
+# arreglo JSON) dan el mismo resultado.
+
+ENCABEZADOS_PRODUCTO = ["codigo", "nombre", "categoria", "unidad_medida", "stock_minimo", "ubicacion"]
+
+
+def escribir_productos(ruta: str, filas: int, sufijo: str = "", con_ubicacion: bool = True) -> int:
+    # Devuelve el número de filas inválidas escritas (una de cada 50)
+    invalidas = 0
+    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(ENCABEZADOS_PRODUCTO if con_ubicacion else ENCABEZADOS_PRODUCTO[:-1])
+        for i in range(1, filas + 1):
+            invalida = i % 50 == 0
+            invalidas += invalida
+            fila = [
+                f"IMP-{i:06d}",
+                f"Producto «{i}», \"importado\"{sufijo}",
+                "medicamento" if not invalida else "desconocida",
+                "pieza",
+                f"{i % 7}.5",
+            ]
+            if con_ubicacion:
+                fila.append(f"Estante {i % 30}")
+            escritor.writerow(fila)
+    return invalidas
+
+
+def residente(i: int) -> dict:
+    return {
+        "numero_expediente": f"EXP-I{i:05d}",
+        "nombre": f"Residente {i}",
+        "apellido_paterno": "Importado",
+        "fecha_nacimiento": "1940-05-17",
+        "fecha_ingreso": "2024-01-02",
+        "tipo_sangre": "O+",
+        "contacto_emergencia_nombre": "Familiar",
+        "contacto_emergencia_relacion": "Hija",
+        "contacto_emergencia_telefono": "5550001111",
+    }
+
+
+def colaborador(i: int, correo: str = None) -> dict:
+    return {
+        "numero_empleado": f"EMP-{i:05d}",
+        "nombre": f"Colaborador {i}",
+        "apellido_paterno": "Importado",
+        "fecha_nacimiento": "1985-03-01",
+        "tipo": "enfermero",
+        "correo": correo or f"colaborador{i}@aps.local",
+        "fecha_ingreso": "2024-01-02",
+        "turno": "Matutino",
+    }
+
+
+async def importar_archivo(entidad: str, formato: str, ruta: str, permitir_admin: bool = False):
+    with open(ruta, "rb") as archivo:
+        return await importar(entidad_importacion(entidad, permitir_admin), LECTORES[formato](archivo))
+
+
+async def medir(entidad: str, formato: str, ruta: str):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = await importar_archivo(entidad, formato, ruta)
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, duracion, pico
+
+
+async def contar(modelo, *condiciones) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(modelo).where(*condiciones))
+
+
+async def sembrar_administrador() -> Colaborador:
+    async with AsyncSessionEscritura() as db:
+        # Números de empleado fuera del rango EMP-00001.. de los archivos importados
+        administrador = nuevo_colaborador("admin", numero_empleado="EMP-00000")
+        colaborador_comun = nuevo_colaborador(
+            "comun", tipo=TipoColaborador.ENFERMERO, numero_empleado="EMP-99999", rol=RolAcceso.COLABORADOR,
+        )
+        db.add_all([administrador, colaborador_comun])
+        await db.commit()
+        return administrador, colaborador_comun
+
+
+async def ejecutar(filas: int):
+    await create_tables()
+    errores = []
+    administrador, colaborador_comun = await sembrar_administrador()
+
+    # Memoria: 10% del catálogo y catálogo completo
+    picos = {}
+    for etiqueta, cantidad in (("décima parte", filas // 10), ("completo", filas)):
+        ruta = os.path.join(DIRECTORIO, f"productos_{cantidad}.csv")
+        invalidas = escribir_productos(ruta, cantidad)
+        resultado, duracion, pico = await medir("productos", "csv", ruta)
+        picos[etiqueta] = pico
+        logger.info(
+            f"productos {etiqueta}: {cantidad} filas en {duracion:.2f} s ({cantidad / duracion:,.0f} filas/s), "
+            f"memoria máxima {pico / 1e6:.1f} MB, {resultado.insertadas} insertadas, "
+            f"{resultado.actualizadas} actualizadas, {resultado.con_error} con error"
+        )
+        if resultado.con_error != invalidas:
+            errores.append(f"Se reportaron {resultado.con_error} filas con error, se esperaban {invalidas}")
+    if picos["completo"] > 2 * picos["décima parte"] + 1e6:
+        errores.append("La memoria de la importación crece con el número de filas")
+    if await contar(Producto) != filas - filas // 50:
+        errores.append(f"Hay {await contar(Producto)} productos, se esperaban {filas - filas // 50}")
+
+    # Reimportación sin la columna ubicacion: actualiza el nombre y conserva la ubicación
+    ruta = os.path.join(DIRECTORIO, "productos_reimportacion.csv")
+    escribir_productos(ruta, filas // 10, sufijo=" v2", con_ubicacion=False)
+    resultado = await importar_archivo("productos", "csv", ruta)
+    if resultado.insertadas or resultado.actualizadas != filas // 10 - filas // 500:
+        errores.append(f"Reimportación: {resultado.insertadas} insertadas, {resultado.actualizadas} actualizadas")
+    async with AsyncSessionLocal() as db:
+        producto = await db.scalar(select(Producto).where(Producto.codigo == "IMP-000007"))
+    if not producto.nombre.endswith(" v2") or producto.ubicacion != "Estante 7":
+        errores.append(f"Reimportación: nombre {producto.nombre!r}, ubicación {producto.ubicacion!r}")
+
+    # Residentes en NDJSON con una línea ilegible y una fila inválida
+    ruta = os.path.join(DIRECTORIO, "residentes.ndjson")
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        for i in range(1, 1001):
+            if i == 10:
+                archivo.write("{no es json\n")
+            elif i == 20:
+                archivo.write(json.dumps(dict(residente(i), tipo_sangre="Z+")) + "\n")
+            else:
+                archivo.write(json.dumps(residente(i)) + "\n")
+    resultado = await importar_archivo("residentes", "ndjson", ruta)
+    if resultado.insertadas != 998 or [e.fila for e in resultado.errores] != [10, 20]:
+        errores.append(f"Residentes NDJSON: {resultado.insertadas} insertados, errores {resultado.errores}")
+
+    # Colaboradores en un arreglo JSON leído en trozos diminutos: un correo
+    # repetido rechaza solo su fila y el rol admin se rechaza sin permitir_admin
+    token_comun = crear_sesion(colaborador_comun)
+    ruta = os.path.join(DIRECTORIO, "colaboradores.json")
+    filas_colaboradores = [colaborador(i) for i in range(1, 301)]
+    filas_colaboradores[149] = colaborador(150, correo="colaborador1@aps.local")
+    filas_colaboradores.append(dict(colaborador(99999, correo="comun@aps.local"), rol="admin"))
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(filas_colaboradores, archivo, indent=1)
+    tamano_lectura = importacion.TAMANO_LECTURA
+    importacion.TAMANO_LECTURA = 7
+    try:
+        resultado = await importar_archivo("colaboradores", "json", ruta)
+    finally:
+        importacion.TAMANO_LECTURA = tamano_lectura
+    if (resultado.insertadas, resultado.actualizadas) != (299, 0) or sorted(e.fila for e in resultado.errores) != [150, 301]:
+        errores.append(f"Colaboradores JSON: {resultado.insertadas} insertados, {resultado.actualizadas} "
+                       f"actualizados, errores {resultado.errores}")
+
+    # Con permitir_admin el cambio de rol se aplica y cierra la sesión
+    ruta = os.path.join(DIRECTORIO, "colaboradores_admin.json")
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(filas_colaboradores[-1:], archivo)
+    resultado = await importar_archivo("colaboradores", "json", ruta, permitir_admin=True)
+    if resultado.actualizadas != 1 or resultado.errores:
+        errores.append(f"Colaborador admin con permitir_admin: {resultado.actualizadas} actualizados, "
+                       f"errores {resultado.errores}")
+    if almacen_sesiones.obtener(token_comun) is not None:
+        errores.append("El cambio de rol importado no cerró la sesión del colaborador")
+
+    # Endpoint: multipart y cuerpo crudo, solo administradores
+    cookie_admin = crear_sesion(administrador)
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, cookie_admin)
+        respuesta = await cliente.post(
+            "/importar/residentes",
+            files={"archivo": ("residentes.ndjson", open(os.path.join(DIRECTORIO, "residentes.ndjson"), "rb"))},
+        )
+        if respuesta.status_code != 200 or respuesta.json()["actualizadas"] != 998:
+            errores.append(f"Multipart: {respuesta.status_code} {respuesta.text[:200]}")
+
+        cuerpo = "codigo,nombre,categoria,unidad_medida,stock_minimo\nHTTP-1,Por HTTP,limpieza,litro,2\n"
+        respuesta = await cliente.post(
+            "/importar/productos", content=cuerpo.encode(), headers={"content-type": "text/csv"}
+        )
+        if respuesta.status_code != 200 or respuesta.json()["insertadas"] != 1:
+            errores.append(f"CSV en el cuerpo: {respuesta.status_code} {respuesta.text[:200]}")
+
+        respuesta = await cliente.post(
+            "/importar/productos", content=b"{\"codigo\": 1}", headers={"content-type": "application/json"}
+        )
+        if respuesta.status_code != 400:
+            errores.append(f"Un JSON que no es arreglo respondió {respuesta.status_code}")
+
+        # Los colaboradores importados no entran hasta que se les asigna contraseña
+        async with AsyncSessionLocal() as db:
+            importado_id = await db.scalar(
+                select(Colaborador.id).where(Colaborador.correo == "colaborador2@aps.local")
+            )
+        credenciales = {"username": "colaborador2@aps.local", "password": "asignada-123"}
+        respuesta = await cliente.post("/auth/login", data=credenciales)
+        if respuesta.status_code != 401:
+            errores.append(f"Un colaborador importado sin contraseña entró: {respuesta.status_code}")
+        respuesta = await cliente.put(
+            f"/auth/colaboradores/{importado_id}/contrasena", json={"contrasena": credenciales["password"]}
+        )
+        if respuesta.status_code != 204:
+            errores.append(f"Asignar contraseña respondió {respuesta.status_code}")
+        respuesta = await cliente.post("/auth/login", data=credenciales)
+        if respuesta.status_code != 303:
+            errores.append(f"Con la contraseña asignada el inicio de sesión respondió {respuesta.status_code}")
+
+        cliente.cookies.set(NOMBRE_COOKIE, crear_sesion(colaborador_comun))
+        respuesta = await cliente.post(
+            "/importar/productos", content=cuerpo.encode(), headers={"content-type": "text/csv"}
+        )
+        if respuesta.status_code != 403:
+            errores.append(f"Un colaborador sin rol de administrador obtuvo {respuesta.status_code}")
+        respuesta = await cliente.put(
+            f"/auth/colaboradores/{importado_id}/contrasena", json={"contrasena": "otra-contrasena"}
+        )
+        if respuesta.status_code != 403:
+            errores.append(f"Un colaborador sin rol de administrador asignó una contraseña: {respuesta.status_code}")
+
+    if await contar(Residente) != 998:
+        errores.append(f"Hay {await contar(Residente)} residentes, se esperaban 998")
+
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Importación masiva con memoria constante y reporte de errores por fila")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la importación masiva de catálogos")
+    parser.add_argument("--filas", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.filas))
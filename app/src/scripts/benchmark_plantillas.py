@@ -0,0 +1,137 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+from decimal import Decimal
+from datetime import datetime, timezone
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal
+base_temporal("plantillas")
+os.environ.setdefault("APS_PROGRAMADOR", "0")
+
+from starlette.requests import Request
+from app.src.main import app
+from app.src.models.colaboradores import RolAcceso
+from app.src.servicios.sesiones import UsuarioSesion
+from app.src.servicios.plantillas import crear_plantillas, cache_fragmentos
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tiempo de render de las plantillas:
+# - arranque en frío: compilar todas las plantillas en un entorno nuevo, sin
+#   y con la caché de bytecode en disco;
+# - render de dashboard.html y login.html con los fragmentos recién
+#   calculados (caché vacía) y desde la caché.
+# Verifica además que el HTML con fragmentos en caché sea idéntico al
+# calculado.
+
+def peticion() -> Request:
+    # Lo mínimo para que url_for funcione fuera de una petición real
+    return Request({
+        "type": "http", "method": "GET", "path": "/dashboard", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"aps")], "scheme": "http", "server": ("aps", 80), "app": app, "router": app.router,
+    })
+
+def contexto_dashboard(version: int) -> dict:
+    return {
+        "request": peticion(),
+        "usuario": UsuarioSesion(id=1, nombre="Benchmark Prueba", correo="benchmark@aps.local", rol=RolAcceso.ADMIN),
+        "indicadores": {
+            "productos_bajo_minimo": 37, "residentes_activos": 382, "residentes_hospitalizados": 11,
+            "remisiones_programadas": 24, "remisiones_en_proceso": 6,
+            "facturas_vencidas": 18, "importe_vencido": Decimal("48250.75"),
+            "actualizado": datetime.now(timezone.utc),
+        },
+        "version_indicadores": version,
+        "titulo": "Panel Principal",
+    }
+
+def medir(funcion, repeticiones: int) -> list:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def resumen(etiqueta: str, tiempos: list) -> float:
+    mediana = statistics.median(tiempos)
+    p95 = sorted(tiempos)[int(len(tiempos) * 0.95) - 1] if len(tiempos) >= 20 else max(tiempos)
+    logger.info(f"{etiqueta:<45} mediana {mediana:8.3f} ms   p95 {p95:8.3f} ms")
+    return mediana
+
+def arranque_en_frio(repeticiones: int) -> None:
+    directorio = tempfile.mkdtemp(prefix="aps-bytecode-")
+    try:
+        def compilar(directorio_bytecode: str):
+            plantillas = crear_plantillas(directorio_bytecode)
+            for nombre in plantillas.env.list_templates(extensions=["html"]):
+                plantillas.get_template(nombre)
+
+        # Primera pasada: escribe el bytecode
+        compilar(directorio)
+        sin_cache = resumen("Compilar plantillas sin bytecode", medir(lambda: compilar(""), repeticiones))
+        con_cache = resumen("Compilar plantillas con bytecode en disco", medir(lambda: compilar(directorio), repeticiones))
+        logger.info(f"Arranque en frío {sin_cache / con_cache:.1f}x más rápido con bytecode")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+def render(repeticiones: int, errores: list) -> None:
+    plantillas = crear_plantillas("")
+    dashboard = plantillas.get_template("dashboard.html")
+    login = plantillas.get_template("login.html")
+
+    cache_fragmentos.invalidar()
+    calculado = dashboard.render(contexto_dashboard(1))
+    if dashboard.render(contexto_dashboard(1)) != calculado:
+        errores.append("El dashboard con fragmentos en caché difiere del calculado")
+    # Una versión nueva de los indicadores vuelve a calcular las tarjetas
+    contexto = contexto_dashboard(2)
+    contexto["indicadores"]["residentes_activos"] = 383
+    if ">383<" not in dashboard.render(contexto):
+        errores.append("Las tarjetas no se recalcularon con una versión nueva de los indicadores")
+    # El HTML cacheado ya viene escapado y no se vuelve a escapar
+    if "&amp;lt;" in calculado or "<nav" not in calculado:
+        errores.append("El fragmento de navegación se escapó dos veces")
+
+    def sin_fragmentos(plantilla, contexto):
+        def renderizar():
+            cache_fragmentos.invalidar()
+            plantilla.render(contexto)
+        return renderizar
+
+    contexto = contexto_dashboard(1)
+    fria = resumen("dashboard.html, fragmentos calculados", medir(sin_fragmentos(dashboard, contexto), repeticiones))
+    caliente = resumen("dashboard.html, fragmentos en caché", medir(lambda: dashboard.render(contexto), repeticiones))
+    logger.info(f"Render del dashboard {fria / caliente:.1f}x más rápido con fragmentos en caché")
+
+    contexto = {"request": peticion(), "titulo": "Iniciar Sesión"}
+    resumen("login.html, fragmentos calculados", medir(sin_fragmentos(login, contexto), repeticiones))
+    resumen("login.html, fragmentos en caché", medir(lambda: login.render(contexto), repeticiones))
+
+def ejecutar():
+    parser = argparse.ArgumentParser(description="Benchmark de render de plantillas")
+    parser.add_argument("--repeticiones", type=int, default=500)
+    args = parser.parse_args()
+
+    errores = []
+    arranque_en_frio(max(args.repeticiones // 10, 10))
+    render(args.repeticiones, errores)
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    ejecutar()
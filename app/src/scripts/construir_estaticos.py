@@ -0,0 +1,133 @@
+import sys
+import os
+import re
+import gzip
+import json
+import shlex
+import shutil
+import hashlib
+import argparse
+import mimetypes
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.servicios import compresion
+from app.src.servicios.estaticos import DIRECTORIO_ESTATICOS, DIRECTORIO_DIST, MANIFIESTO
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Construcción de los archivos estáticos para producción:
+# 1. Las hojas de ENTRADAS_TAILWIND se compilan con Tailwind (solo con las
+#    clases que aparecen en templates/, ver tailwind.config.js) y se minifican.
+# 2. Cada archivo de static/ se copia a static/dist/ con el hash de su
+#    contenido en el nombre.
+# 3. Los de texto que pasan de MINIMO_BYTES se precomprimen a .br (si está el
+#    paquete brotli) y .gz con la máxima compresión: se comprimen una vez al
+#    construir y no en cada petición.
+# 4. Se escribe dist/manifest.json, al final, para que asset() nunca apunte a
+#    un archivo que aún no existe.
+#
+#   npm install
+#   python app/src/scripts/construir_estaticos.py
+#
+# Sin Node (--sin-tailwind) el CSS se minifica tal cual, sin las utilidades
+# de Tailwind.
+ENTRADAS_TAILWIND = {"css/styles.css"}
+CONFIG_TAILWIND = os.path.join(REPO_ROOT, "tailwind.config.js")
+COMANDO_TAILWIND = "npx --no-install tailwindcss"
+
+def tailwind(origen: Path, comando: str) -> bytes:
+    with tempfile.TemporaryDirectory() as temporal:
+        destino = os.path.join(temporal, origen.name)
+        subprocess.run(
+            [*shlex.split(comando), "-c", CONFIG_TAILWIND, "-i", str(origen), "-o", destino, "--minify"],
+            cwd=REPO_ROOT, check=True, capture_output=True,
+        )
+        return Path(destino).read_bytes()
+
+def minificar_css(texto: str) -> str:
+    texto = re.sub(r"/\*.*?\*/", "", texto, flags=re.S)
+    texto = re.sub(r"@tailwind\s+\w+;", "", texto)
+    texto = re.sub(r"\s+", " ", texto)
+    texto = re.sub(r"\s*([{};:,>])\s*", r"\1", texto)
+    return texto.replace(";}", "}").strip()
+
+def huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()[:8]
+
+def comprimible(ruta: str) -> bool:
+    tipo, _ = mimetypes.guess_type(ruta)
+    return bool(tipo) and tipo.startswith(compresion.TIPOS_COMPRIMIBLES)
+
+def precomprimir(destino: Path, contenido: bytes) -> dict:
+    tamanos = {}
+    variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if compresion.brotli is not None:
+        variantes[".br"] = compresion.brotli.compress(contenido, quality=11)
+    for sufijo, comprimido in variantes.items():
+        # Solo si ahorra algo: si no, se sirve el original
+        if len(comprimido) < len(contenido):
+            Path(f"{destino}{sufijo}").write_bytes(comprimido)
+            tamanos[sufijo] = len(comprimido)
+    return tamanos
+
+def construir(usar_tailwind: bool, comando: str) -> dict:
+    dist = DIRECTORIO_ESTATICOS / DIRECTORIO_DIST
+    shutil.rmtree(dist, ignore_errors=True)
+    manifiesto = {}
+    for origen in sorted(DIRECTORIO_ESTATICOS.rglob("*")):
+        relativa = origen.relative_to(DIRECTORIO_ESTATICOS).as_posix()
+        if not origen.is_file() or relativa.split("/")[0] == DIRECTORIO_DIST:
+            continue
+        if relativa in ENTRADAS_TAILWIND and usar_tailwind:
+            contenido = tailwind(origen, comando)
+        elif relativa.endswith(".css"):
+            contenido = minificar_css(origen.read_text(encoding="utf-8")).encode("utf-8")
+        else:
+            contenido = origen.read_bytes()
+
+        base, extension = os.path.splitext(relativa)
+        construida = f"{base}.{huella(contenido)}{extension}"
+        destino = dist / construida
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(contenido)
+        tamanos = {}
+        if comprimible(relativa) and len(contenido) >= compresion.MINIMO_BYTES:
+            tamanos = precomprimir(destino, contenido)
+        manifiesto[relativa] = construida
+
+        variantes = ", ".join(f"{sufijo} {tamano} B" for sufijo, tamano in tamanos.items())
+        logger.info(f"{relativa} ({origen.stat().st_size} B) -> {construida} ({len(contenido)} B{', ' + variantes if variantes else ''})")
+
+    temporal = MANIFIESTO.with_suffix(".tmp")
+    temporal.write_text(json.dumps(manifiesto, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(temporal, MANIFIESTO)
+    return manifiesto
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye static/dist con huellas, manifiesto y variantes precomprimidas")
+    parser.add_argument("--sin-tailwind", action="store_true", help="No compilar con Tailwind; solo minificar el CSS")
+    parser.add_argument("--tailwind", default=COMANDO_TAILWIND, help="Comando de la CLI de Tailwind")
+    args = parser.parse_args()
+
+    try:
+        manifiesto = construir(not args.sin_tailwind, args.tailwind)
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        salida = getattr(e, "stderr", b"") or b""
+        logger.error(f"No se pudo ejecutar Tailwind ({e}): {salida.decode(errors='replace').strip()}")
+        logger.error("Instala las dependencias con `npm install` o usa --sin-tailwind")
+        sys.exit(1)
+    if compresion.brotli is None:
+        logger.warning("Paquete brotli no instalado: solo se generaron variantes .gz")
+    logger.info(f"{len(manifiesto)} archivos en {MANIFIESTO.parent}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import sys
+import os
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_residente, nuevo_colaborador
+base_temporal("expediente")
+
+import httpx
+from app.src.main import app
+from app.src.models import (
+    Colaborador, TipoColaborador, Remision, TipoRemision, SeguimientoRemision, TipoEvento, TrazabilidadProfesional
+)
+from app.src.models.colaboradores import RolAcceso
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+from app.src.servicios.perfilador import presupuesto_consultas, PresupuestoExcedido
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Regresión N+1 del expediente de remisión: el número de consultas debe ser
+# el mismo para una remisión con un evento que para una con muchos.
+
+MAXIMO_CONSULTAS = 3
+
+
+async def sembrar(eventos: int) -> int:
+    async with AsyncSessionEscritura() as db:
+        paciente = nuevo_residente(f"EXP-N1-{eventos}", apellido_paterno=f"Expediente {eventos}")
+        # Una sola contraseña para todos: cada hash PBKDF2 cuesta
+        contrasena = Colaborador.hashear_contrasena("expediente")
+        colaboradores = [
+            nuevo_colaborador(f"n1-{eventos}-{i}", tipo=TipoColaborador.MEDICO, rol=RolAcceso.COLABORADOR, contrasena=contrasena)
+            for i in range(eventos)
+        ]
+        remision = Remision(
+            numero_remision=f"REM-N1-{eventos:04d}",
+            residente=paciente,
+            tipo=TipoRemision.CONSULTA,
+            institucion_destino="Hospital General",
+            direccion_destino="Av. Principal 100",
+            fecha_programada=datetime.now(),
+            motivo="control",
+            diagnostico_envio="control",
+            medico_remitente="Dr. Expediente",
+        )
+        inicio = datetime.now()
+        for i, profesional in enumerate(colaboradores):
+            db.add(SeguimientoRemision(
+                remision=remision,
+                tipo_evento=TipoEvento.CONSULTA,
+                fecha_hora=inicio + timedelta(minutes=i),
+            ))
+            db.add(TrazabilidadProfesional(
+                remision=remision,
+                colaborador=profesional,
+                rol="médico tratante",
+                fecha_intervencion=inicio + timedelta(minutes=i),
+            ))
+        db.add(remision)
+        await db.commit()
+        return remision.id
+
+
+async def ejecutar(eventos: int):
+    await create_tables()
+    pequena = await sembrar(1)
+    grande = await sembrar(eventos)
+
+    transporte = httpx.ASGITransport(app=app)
+    consultas = {}
+    errores = []
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        for remision_id, total in ((pequena, 1), (grande, eventos)):
+            try:
+                with presupuesto_consultas(MAXIMO_CONSULTAS, f"Expediente con {total} eventos") as medicion:
+                    respuesta = await cliente.get(f"/remisiones/{remision_id}/expediente")
+            except PresupuestoExcedido as e:
+                errores.append(str(e))
+                medicion = e.medicion
+            respuesta.raise_for_status()
+            expediente = respuesta.json()
+            if len(expediente["eventos_seguimiento"]) != total or len(expediente["trazabilidad_profesionales"]) != total:
+                errores.append(f"El expediente {remision_id} no trae todos sus eventos")
+            consultas[total] = medicion.consultas
+    await close_engines()
+
+    for total, cantidad in consultas.items():
+        logger.info(f"Expediente con {total} eventos: {cantidad} consultas")
+    if consultas[1] != consultas[eventos]:
+        errores.append("El número de consultas crece con los eventos del expediente (N+1)")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Consultas del expediente acotadas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regresión N+1 del expediente de remisión")
+    parser.add_argument("--eventos", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.eventos))
@@ -8,7 +8,7 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.insert(0, PROJECT_ROOT)
 
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import inspect
+from sqlalchemy import func, inspect
 from src.models.database import engine_sync, Base, DB_PATH
 from src.models.colaboradores import Colaborador, RolAcceso, TipoColaborador
 
@@ -25,12 +25,10 @@ def crear_usuario_admin():
     db = SessionLocal()
     
     try:
-        # Listar todos los usuarios existentes
-        usuarios_existentes = db.query(Colaborador).all()
-        logger.info(f"Usuarios existentes: {len(usuarios_existentes)}")
-        for usuario in usuarios_existentes:
-            logger.info(f"Usuario: {usuario.nombre} {usuario.apellido_paterno}, Correo: {usuario.correo}, Rol: {usuario.rol}")
-        
+        # Contar los usuarios existentes sin cargarlos (tras una importación
+        # masiva puede haber miles)
+        logger.info(f"Usuarios existentes: {db.query(func.count(Colaborador.id)).scalar()}")
+
         # Verificar si ya existe un admin
         admin_existente = db.query(Colaborador).filter(
             Colaborador.rol == RolAcceso.ADMIN
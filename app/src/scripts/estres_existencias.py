@@ -0,0 +1,147 @@
+import sys
+import os
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from decimal import Decimal
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prueba de estrés del libro de existencias: varios procesos (como varios
+# workers de uvicorn) registran entradas y salidas a la vez sobre el mismo
+# producto. Al final el stock debe coincidir exactamente con los movimientos
+# aceptados, nunca ser negativo y conciliar con MovimientoInventario.
+
+STOCK_INICIAL = Decimal("100")
+ENTRADA = Decimal("0.5")
+SALIDA = Decimal("1.25")
+
+
+def _trabajador(db_path: str, peticiones: int, semilla: int, cola):
+    os.environ["APS_DB_PATH"] = db_path
+    import httpx
+    from app.src.main import app
+    from app.src.models.database import close_engines
+
+    async def ejecutar():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+            async def mover(i):
+                tipo = "entrada" if (i + semilla) % 3 == 0 else "salida"
+                respuesta = await cliente.post("/inventario/movimientos/", json={
+                    "producto_id": 1,
+                    "tipo_movimiento": tipo,
+                    "cantidad": str(ENTRADA if tipo == "entrada" else SALIDA),
+                    "responsable": f"estres-{semilla}",
+                    "motivo": "prueba de estrés",
+                })
+                return tipo, respuesta.status_code
+
+            resultados = await asyncio.gather(*(mover(i) for i in range(peticiones)))
+        await close_engines()
+        return resultados
+
+    cola.put(asyncio.run(ejecutar()))
+
+
+async def preparar():
+    import httpx
+    from app.src.main import app
+    from app.src.models.database import create_tables, close_engines
+
+    await create_tables()
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        respuesta = await cliente.post("/inventario/productos/", json={
+            "codigo": "ESTRES-1",
+            "nombre": "Producto de estrés",
+            "categoria": "medicamento",
+            "unidad_medida": "caja",
+            "stock_minimo": "1",
+        })
+        respuesta.raise_for_status()
+        respuesta = await cliente.post("/inventario/movimientos/", json={
+            "producto_id": 1,
+            "tipo_movimiento": "entrada",
+            "cantidad": str(STOCK_INICIAL),
+            "responsable": "estres",
+            "motivo": "stock inicial",
+        })
+        respuesta.raise_for_status()
+    await close_engines()
+
+
+async def verificar():
+    import httpx
+    from app.src.main import app
+    from app.src.models.database import close_engines
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        producto = (await cliente.get("/inventario/productos/")).json()[0]
+        diferencias = (await cliente.get("/inventario/conciliacion/")).json()
+    await close_engines()
+    return Decimal(str(producto["stock_actual"])), diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de estrés del libro de existencias")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--peticiones", type=int, default=100, help="Peticiones por proceso")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="aps-estres-")
+    db_path = os.path.join(directorio, "estres.db")
+    os.environ["APS_DB_PATH"] = db_path
+    asyncio.run(preparar())
+
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(target=_trabajador, args=(db_path, args.peticiones, semilla, cola))
+        for semilla in range(args.procesos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [resultado for _ in procesos for resultado in cola.get()]
+    for proceso in procesos:
+        proceso.join()
+
+    entradas = sum(1 for tipo, codigo in resultados if tipo == "entrada" and codigo == 201)
+    salidas = sum(1 for tipo, codigo in resultados if tipo == "salida" and codigo == 201)
+    rechazadas = sum(1 for _, codigo in resultados if codigo == 400)
+    otros = [codigo for _, codigo in resultados if codigo not in (201, 400)]
+
+    esperado = STOCK_INICIAL + entradas * ENTRADA - salidas * SALIDA
+    stock, diferencias = asyncio.run(verificar())
+
+    logger.info(f"Movimientos aceptados: {entradas} entradas, {salidas} salidas; rechazados por stock: {rechazadas}")
+    logger.info(f"Stock esperado: {esperado}  Stock final: {stock}")
+
+    errores = []
+    if otros:
+        errores.append(f"Respuestas inesperadas: {sorted(set(otros))}")
+    if stock != esperado:
+        errores.append("Se perdieron actualizaciones de stock")
+    if stock < 0:
+        errores.append("El stock quedó negativo")
+    if diferencias:
+        errores.append(f"El stock no concilia con los movimientos: {diferencias}")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Sin actualizaciones perdidas ni stock negativo")
+
+
+if __name__ == "__main__":
+    main()
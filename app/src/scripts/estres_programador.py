@@ -0,0 +1,178 @@
+import sys
+import os
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prueba de las tareas programadas con varios procesos (como varios workers
+# de uvicorn) que intentan ejecutar todas las tareas al mismo tiempo: cada
+# tarea debe correr en un solo proceso, sin alertas duplicadas, y una segunda
+# vuelta debe resolver las alertas cuya condición desapareció.
+
+FACTURAS = 2000
+PRODUCTOS = 500
+SUMINISTROS = 300
+
+
+def _trabajador(db_path: str, barrera, cola):
+    os.environ["APS_DB_PATH"] = db_path
+    from app.src.main import app  # noqa: F401  (registra modelos y tareas)
+    from app.src.servicios.programador import programador
+    from app.src.models.database import close_engines
+
+    async def ejecutar():
+        corridas = await asyncio.gather(*(programador.ejecutar(nombre) for nombre in programador.tareas))
+        await close_engines()
+        return {
+            nombre: (corrio, programador.tareas[nombre].metricas())
+            for nombre, corrio in zip(programador.tareas, corridas)
+        }
+
+    barrera.wait()
+    cola.put(asyncio.run(ejecutar()))
+
+
+async def preparar():
+    from sqlalchemy import insert
+    from app.src.main import app  # noqa: F401
+    from app.src.models import Factura
+    from app.src.models.inventario import Producto, Suministro, CategoriaProducto, UnidadMedida, EstadoSuministro
+    from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+    from app.src.scripts._comun import nuevo_residente
+
+    ahora = datetime.now(timezone.utc)
+    await create_tables()
+    async with AsyncSessionEscritura() as db:
+        db.add(nuevo_residente("EXP-PROGRAMADOR", apellido_paterno="Programador"))
+        # La mitad de las facturas pendientes ya venció
+        await db.execute(insert(Factura), [
+            {"residente_id": 1, "total": 100, "estado": "pendiente",
+             "fecha_vencimiento": ahora + timedelta(days=-1 if i % 2 else 1)}
+            for i in range(FACTURAS)
+        ])
+        # Uno de cada cuatro productos está por debajo del mínimo
+        await db.execute(insert(Producto), [
+            {"codigo": f"PRG-{i:04d}", "nombre": f"Producto {i}",
+             "categoria": CategoriaProducto.MEDICAMENTO, "unidad_medida": UnidadMedida.PIEZA,
+             "stock_actual": 0 if i % 4 == 0 else 50, "stock_minimo": 10}
+            for i in range(PRODUCTOS)
+        ])
+        # Un tercio de los suministros está atrasado y sin entregar
+        await db.execute(insert(Suministro), [
+            {"producto_id": i % PRODUCTOS + 1, "cantidad_solicitada": 10, "proveedor": "Proveedor",
+             "estado": EstadoSuministro.ENVIADO,
+             "fecha_entrega_estimada": ahora + timedelta(days=-2 if i % 3 == 0 else 2)}
+            for i in range(SUMINISTROS)
+        ])
+        await db.commit()
+    await close_engines()
+
+
+async def contar():
+    from sqlalchemy import func, text
+    from sqlalchemy.future import select
+    from app.src.models import Factura, Alerta
+    from app.src.models.database import close_engines, AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        vencidas = await db.scalar(select(func.count()).select_from(Factura).where(Factura.estado == "vencida"))
+        abiertas = dict((await db.execute(
+            select(Alerta.tipo, func.count()).where(Alerta.resuelta == False).group_by(Alerta.tipo)
+        )).all())
+        duplicadas = await db.scalar(text(
+            "SELECT count(*) FROM (SELECT tipo, referencia_id FROM alertas WHERE resuelta = 0 "
+            "GROUP BY tipo, referencia_id HAVING count(*) > 1)"
+        ))
+    await close_engines()
+    return vencidas, abiertas, duplicadas
+
+
+async def segunda_vuelta():
+    # Se repone un producto, se entrega un suministro y se vencen los turnos
+    from sqlalchemy import update
+    from app.src.main import app  # noqa: F401
+    from app.src.models import BloqueoTarea
+    from app.src.models.inventario import Producto, Suministro, EstadoSuministro
+    from app.src.models.database import close_engines, AsyncSessionEscritura
+    from app.src.servicios.programador import programador
+
+    async with AsyncSessionEscritura() as db:
+        await db.execute(update(Producto).where(Producto.id == 1).values(stock_actual=100))
+        await db.execute(update(Suministro).where(Suministro.id == 1).values(
+            estado=EstadoSuministro.RECIBIDO, fecha_entrega_real=datetime.now(timezone.utc)))
+        await db.execute(update(BloqueoTarea).values(expira=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        await db.commit()
+    for nombre in programador.tareas:
+        await programador.ejecutar(nombre)
+    metricas = programador.metricas()
+    await close_engines()
+    return metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de las tareas programadas con varios procesos")
+    parser.add_argument("--procesos", type=int, default=4)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="aps-programador-")
+    db_path = os.path.join(directorio, "programador.db")
+    os.environ["APS_DB_PATH"] = db_path
+    asyncio.run(preparar())
+
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(args.procesos)
+    cola = contexto.Queue()
+    procesos = [contexto.Process(target=_trabajador, args=(db_path, barrera, cola)) for _ in range(args.procesos)]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+
+    errores = []
+    for nombre in resultados[0]:
+        ejecutores = [r[nombre] for r in resultados if r[nombre][0]]
+        if len(ejecutores) != 1:
+            errores.append(f"La tarea {nombre} corrió en {len(ejecutores)} procesos")
+            continue
+        metricas = ejecutores[0][1]
+        logger.info(f"{nombre}: {metricas['ultima_duracion_ms']} ms, resultado {metricas['ultimo_resultado']}")
+
+    vencidas, abiertas, duplicadas = asyncio.run(contar())
+    logger.info(f"Facturas vencidas: {vencidas}; alertas abiertas: {abiertas}")
+    if vencidas != FACTURAS // 2:
+        errores.append(f"Se esperaban {FACTURAS // 2} facturas vencidas")
+    if abiertas.get("stock_bajo") != PRODUCTOS // 4:
+        errores.append(f"Se esperaban {PRODUCTOS // 4} alertas de stock bajo")
+    if abiertas.get("entrega_atrasada") != SUMINISTROS // 3:
+        errores.append(f"Se esperaban {SUMINISTROS // 3} alertas de entrega atrasada")
+    if duplicadas:
+        errores.append(f"{duplicadas} alertas abiertas duplicadas")
+
+    metricas = asyncio.run(segunda_vuelta())
+    for nombre in ("stock_bajo", "entregas_atrasadas"):
+        resultado = metricas[nombre]["ultimo_resultado"]
+        logger.info(f"Segunda vuelta {nombre}: {resultado}")
+        if resultado != {"alertas_nuevas": 0, "alertas_resueltas": 1}:
+            errores.append(f"La segunda vuelta de {nombre} debía resolver una alerta sin abrir nuevas")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Cada tarea corrió una sola vez y las alertas se mantienen sin duplicados")
+
+
+if __name__ == "__main__":
+    main()
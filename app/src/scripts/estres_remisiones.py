@@ -0,0 +1,114 @@
+import sys
+import os
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prueba de concurrencia de los folios de remisión: varios procesos (como
+# varios workers de uvicorn) crean remisiones a la vez. Todas deben crearse
+# al primer intento y con números únicos y consecutivos dentro del día.
+
+
+def _remision(semilla: int, i: int) -> dict:
+    return {
+        "residente_id": 1,
+        "tipo": "consulta",
+        "institucion_destino": "Hospital General",
+        "direccion_destino": "Av. Principal 100",
+        "fecha_programada": (datetime.now() + timedelta(days=1)).isoformat(),
+        "motivo": f"estrés {semilla}-{i}",
+        "diagnostico_envio": "control",
+        "medico_remitente": "Dr. Estrés",
+    }
+
+
+def _trabajador(db_path: str, peticiones: int, semilla: int, cola):
+    os.environ["APS_DB_PATH"] = db_path
+    import httpx
+    from app.src.main import app
+    from app.src.models.database import close_engines
+
+    async def ejecutar():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+            async def crear(i):
+                respuesta = await cliente.post("/remisiones/", json=_remision(semilla, i))
+                numero = respuesta.json().get("numero_remision") if respuesta.status_code == 200 else None
+                return respuesta.status_code, numero
+
+            resultados = await asyncio.gather(*(crear(i) for i in range(peticiones)))
+        await close_engines()
+        return resultados
+
+    cola.put(asyncio.run(ejecutar()))
+
+
+async def preparar():
+    from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+    from app.src.scripts._comun import nuevo_residente
+
+    await create_tables()
+    async with AsyncSessionEscritura() as db:
+        db.add(nuevo_residente("EXP-ESTRES", apellido_paterno="Estrés"))
+        await db.commit()
+    await close_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de concurrencia de números de remisión")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--peticiones", type=int, default=100, help="Remisiones por proceso")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="aps-remisiones-")
+    db_path = os.path.join(directorio, "estres.db")
+    os.environ["APS_DB_PATH"] = db_path
+    asyncio.run(preparar())
+
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(target=_trabajador, args=(db_path, args.peticiones, semilla, cola))
+        for semilla in range(args.procesos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [resultado for _ in procesos for resultado in cola.get()]
+    for proceso in procesos:
+        proceso.join()
+
+    total = args.procesos * args.peticiones
+    fallidas = [codigo for codigo, _ in resultados if codigo != 200]
+    numeros = [numero for codigo, numero in resultados if codigo == 200]
+    consecutivos = sorted(int(numero.rsplit("-", 1)[1]) for numero in numeros)
+
+    logger.info(f"Remisiones creadas: {len(numeros)} de {total}")
+
+    errores = []
+    if fallidas:
+        errores.append(f"Respuestas fallidas: {sorted(set(fallidas))} ({len(fallidas)})")
+    if len(set(numeros)) != len(numeros):
+        errores.append(f"Números duplicados: {len(numeros) - len(set(numeros))}")
+    if consecutivos != list(range(1, len(numeros) + 1)):
+        errores.append("Los números del día no son consecutivos")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Sin números duplicados ni reintentos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import sys
+import os
+import re
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_residente
+base_temporal("eventos")
+
+import httpx
+from app.src.main import app
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+from app.src.routes import remisiones
+from app.src.servicios.eventos import BusEventos, bus_remisiones
+from app.src.servicios.perfilador import presupuesto_consultas, PresupuestoExcedido
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Comprobación del seguimiento en vivo de remisiones: muchos paneles
+# abiertos reciben cada evento sin consultar la base de datos, se envían
+# latidos, un cliente que reconecta con Last-Event-ID recibe lo perdido y
+# un suscriptor lento no frena a quien publica.
+
+
+class FlujoASGI:
+    # Cliente ASGI mínimo que acumula el cuerpo mientras se transmite
+    # (httpx.ASGITransport espera la respuesta completa)
+    def __init__(self, aplicacion, ruta: str, cabeceras=()):
+        ruta, _, consulta = ruta.partition("?")
+        self.texto = ""
+        self._pedido = False
+        self._desconectar = asyncio.Event()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+            "query_string": consulta.encode(), "root_path": "",
+            "headers": [(b"host", b"aps")] + [(k.encode(), v.encode()) for k, v in cabeceras],
+            "client": ("127.0.0.1", 5000), "server": ("aps", 80),
+        }
+        self._tarea = asyncio.create_task(aplicacion(scope, self._recibir, self._enviar))
+
+    async def _recibir(self):
+        if not self._pedido:
+            self._pedido = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._desconectar.wait()
+        return {"type": "http.disconnect"}
+
+    async def _enviar(self, mensaje):
+        if mensaje["type"] == "http.response.body":
+            self.texto += mensaje.get("body", b"").decode()
+
+    def ids(self):
+        return [int(i) for i in re.findall(r"^id: (\d+)$", self.texto, re.M)]
+
+    async def cerrar(self):
+        self._desconectar.set()
+        await self._tarea
+
+
+async def sembrar_residente():
+    async with AsyncSessionEscritura() as db:
+        db.add(nuevo_residente("EXP-EVENTOS", apellido_paterno="Eventos"))
+        await db.commit()
+
+
+async def comprobar_paneles_sin_consultas(remision_id: int, paneles: int, errores):
+    # Paneles abiertos sin escrituras: reciben latidos y no consultan la base
+    # de datos. Se abren y se cierran dentro del presupuesto, así sus
+    # peticiones (que el middleware mide hasta el último trozo) cuentan en él.
+    try:
+        with presupuesto_consultas(0, "Paneles abiertos sin escrituras"):
+            flujos = [
+                FlujoASGI(app, "/remisiones/eventos" if i % 2 else f"/remisiones/eventos?remision_id={remision_id}")
+                for i in range(paneles)
+            ]
+            await asyncio.sleep(0.5)
+            for flujo in flujos:
+                await flujo.cerrar()
+    except PresupuestoExcedido as e:
+        errores.append(str(e))
+    if not all(": latido" in flujo.texto for flujo in flujos):
+        errores.append("No todos los paneles recibieron latidos")
+
+
+def comprobar_desborde(errores):
+    # Un suscriptor que no consume se descarta al llenar su cola y la
+    # publicación sigue siendo inmediata
+    bus = BusEventos(capacidad_historial=10, capacidad_suscripcion=5)
+    lento, _ = bus.suscribir()
+    inicio = time.perf_counter()
+    for i in range(1000):
+        bus.publicar("seguimiento", 1, {"i": i})
+    duracion = time.perf_counter() - inicio
+    if not lento.desbordada or bus.suscriptores:
+        errores.append("El suscriptor lento no se descartó al desbordarse")
+    logger.info(f"1000 publicaciones con un suscriptor lento: {duracion * 1000:.1f} ms")
+
+    # Un id que ya salió del historial pide recargar el estado completo
+    _, perdidos = bus.suscribir(ultimo_id=1)
+    if perdidos is not None:
+        errores.append("Se reanudó desde un id fuera del historial")
+
+
+async def ejecutar(paneles: int):
+    remisiones.INTERVALO_LATIDO = 0.2
+    await create_tables()
+    await sembrar_residente()
+    errores = []
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        respuesta = await cliente.post("/remisiones/", json={
+            "residente_id": 1,
+            "tipo": "consulta",
+            "institucion_destino": "Hospital General",
+            "direccion_destino": "Av. Principal 100",
+            "fecha_programada": (datetime.now() + timedelta(days=1)).isoformat(),
+            "motivo": "control",
+            "diagnostico_envio": "control",
+            "medico_remitente": "Dr. Eventos",
+        })
+        respuesta.raise_for_status()
+        remision_id = respuesta.json()["id"]
+
+        await comprobar_paneles_sin_consultas(remision_id, paneles, errores)
+
+        flujos = [
+            FlujoASGI(app, "/remisiones/eventos" if i % 2 else f"/remisiones/eventos?remision_id={remision_id}")
+            for i in range(paneles)
+        ]
+        await asyncio.sleep(0.05)
+
+        ahora = datetime.now()
+        for i, tipo in enumerate(("salida", "llegada", "retorno")):
+            respuesta = await cliente.post(f"/remisiones/{remision_id}/seguimiento", json={
+                "remision_id": remision_id,
+                "tipo_evento": tipo,
+                "fecha_hora": (ahora + timedelta(hours=i)).isoformat(),
+            })
+            respuesta.raise_for_status()
+        respuesta = await cliente.put(f"/remisiones/{remision_id}", json={"estado": "completada"})
+        respuesta.raise_for_status()
+        await asyncio.sleep(0.05)
+
+        esperados = [bus_remisiones.ultimo_id - 3 + i for i in range(4)]
+        incompletos = sum(1 for flujo in flujos if flujo.ids() != esperados)
+        if incompletos:
+            errores.append(f"{incompletos} paneles no recibieron los 4 eventos en orden")
+        if "event: estado" not in flujos[0].texto:
+            errores.append("No se publicó el cambio de estado")
+
+        # Reconexión con Last-Event-ID: recibe lo publicado después
+        reanudado = FlujoASGI(app, "/remisiones/eventos", [("last-event-id", str(esperados[0]))])
+        await asyncio.sleep(0.05)
+        if reanudado.ids() != esperados[1:]:
+            errores.append(f"La reanudación entregó {reanudado.ids()} en lugar de {esperados[1:]}")
+
+        for flujo in flujos + [reanudado]:
+            await flujo.cerrar()
+        if bus_remisiones.suscriptores:
+            errores.append(f"Quedaron {bus_remisiones.suscriptores} suscripciones abiertas")
+
+    await close_engines()
+    comprobar_desborde(errores)
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info(f"{paneles} paneles recibieron los eventos sin consultar la base de datos")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprueba el flujo de eventos de remisiones")
+    parser.add_argument("--paneles", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.paneles))
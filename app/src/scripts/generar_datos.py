@@ -0,0 +1,349 @@
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Generador de datos sintéticos con volúmenes de una casa en operación:
+# cientos de residentes, miles de productos, millones de movimientos y años
+# de remisiones y facturas. Los datos se insertan por lotes a través de los
+# modelos (insert(Modelo)), las existencias se concilian con el servicio de
+# existencias y las facturas las genera la facturación mensual real.
+#
+# La misma semilla produce la misma base de datos, así que los resultados de
+# scripts/benchmark.py son comparables entre commits.
+#
+#   python app/src/scripts/generar_datos.py --db /tmp/aps-benchmark.db
+#   python app/src/scripts/generar_datos.py --db /tmp/aps-chica.db --escala 0.05
+#
+# Sin --db se usa APS_DB_PATH o aps.db; la base de datos debe estar vacía.
+
+TAMANO_LOTE = 20000
+
+# Contraseña del administrador generado (solo para bases de datos de prueba)
+CORREO_ADMIN = "benchmark@aps.local"
+CONTRASENA_ADMIN = "benchmark"
+
+NOMBRES = ["María", "José", "Guadalupe", "Juan", "Rosa", "Francisco", "Carmen", "Antonio", "Teresa",
+           "Manuel", "Josefina", "Jesús", "Leticia", "Pedro", "Socorro", "Miguel", "Margarita", "Luis"]
+APELLIDOS = ["Hernández", "García", "Martínez", "López", "González", "Pérez", "Rodríguez", "Sánchez",
+             "Ramírez", "Cruz", "Flores", "Gómez", "Morales", "Vázquez", "Reyes", "Jiménez", "Torres"]
+PRODUCTOS = ["Paracetamol", "Omeprazol", "Metformina", "Losartán", "Gasa estéril", "Guantes de látex",
+             "Pañal para adulto", "Jabón neutro", "Cloro", "Arroz", "Frijol", "Leche deslactosada",
+             "Sábana individual", "Toalla", "Jeringa 5 ml", "Alcohol 70%", "Cubrebocas", "Papel higiénico"]
+INSTITUCIONES = ["Hospital General", "IMSS Clínica 12", "Centro Médico Nacional", "Laboratorio Clínico Azteca",
+                 "Hospital Ángeles", "Clínica de Especialidades"]
+ESPECIALIDADES = ["Cardiología", "Geriatría", "Nefrología", "Oftalmología", "Traumatología", "Medicina interna"]
+PROVEEDORES = ["Farmacéutica del Centro", "Distribuidora Médica", "Abarrotes La Providencia", "Limpieza Total"]
+
+
+def nombre_completo(aleatorio: random.Random):
+    return aleatorio.choice(NOMBRES), aleatorio.choice(APELLIDOS), aleatorio.choice(APELLIDOS)
+
+
+def fecha_aleatoria(aleatorio: random.Random, inicio: datetime, fin: datetime) -> datetime:
+    return inicio + timedelta(seconds=aleatorio.randint(0, int((fin - inicio).total_seconds())))
+
+
+def periodos(inicio: datetime, fin: datetime):
+    actual = inicio.replace(day=1)
+    while actual < fin.replace(day=1):
+        yield actual.strftime("%Y-%m")
+        actual = (actual + timedelta(days=32)).replace(day=1)
+
+
+async def insertar_por_lotes(modelo, filas, etiqueta: str) -> int:
+    # filas es un generador: se insertan y confirman bloques de TAMANO_LOTE
+    from sqlalchemy import insert
+    from app.src.models.database import AsyncSessionEscritura
+
+    total = 0
+    lote = []
+    inicio = time.perf_counter()
+
+    async def volcar():
+        async with AsyncSessionEscritura() as db:
+            await db.execute(insert(modelo), lote)
+            await db.commit()
+
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            await volcar()
+            total += len(lote)
+            lote = []
+    if lote:
+        await volcar()
+        total += len(lote)
+    logger.info(f"{etiqueta}: {total:,} filas en {time.perf_counter() - inicio:.1f} s")
+    return total
+
+
+async def generar(args):
+    from sqlalchemy import func, update, text
+    from sqlalchemy.future import select
+    from app.src.models import (
+        Residente, TipoSangre, Colaborador, TipoColaborador, Remision, TipoRemision, EstadoRemision,
+        SeguimientoRemision, TipoEvento, TrazabilidadProfesional, ContadorRemision, Factura, CorridaFacturacion, EstadoFactura,
+    )
+    from app.src.models.residentes import EstadoResidente
+    from app.src.models.colaboradores import RolAcceso
+    from app.src.models.inventario import (
+        Producto, Suministro, MovimientoInventario, CategoriaProducto, UnidadMedida, EstadoSuministro,
+    )
+    from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, DB_PATH
+    from app.src.servicios.existencias import conciliar_existencias
+    from app.src.servicios.facturacion_mensual import ejecutar_corrida
+
+    escala = args.escala
+    residentes = max(10, int(args.residentes * escala))
+    productos = max(20, int(args.productos * escala))
+    movimientos = max(1000, int(args.movimientos * escala))
+    colaboradores = max(5, int(args.colaboradores * escala))
+    aleatorio = random.Random(args.semilla)
+    fin = datetime(2026, 9, 30, 23, 59)
+    inicio = datetime(fin.year - args.anios, fin.month, 1) + timedelta(days=31)
+    inicio = inicio.replace(day=1)
+
+    await create_tables()
+    async with AsyncSessionEscritura() as db:
+        if await db.scalar(select(func.count()).select_from(Residente)):
+            await close_engines()
+            logger.error(f"{DB_PATH} ya tiene datos; use una base de datos vacía (--db)")
+            sys.exit(1)
+    logger.info(f"Generando en {DB_PATH}: {residentes} residentes, {productos} productos, "
+                f"{movimientos:,} movimientos, {args.anios} años desde {inicio:%Y-%m}")
+    arranque = time.perf_counter()
+
+    # Colaboradores: un administrador conocido y el resto del personal
+    tipos = list(TipoColaborador)
+    contrasena = Colaborador.hashear_contrasena(CONTRASENA_ADMIN)
+
+    def filas_colaboradores():
+        for i in range(1, colaboradores + 1):
+            nombre, paterno, materno = nombre_completo(aleatorio)
+            yield {
+                "nombre": nombre, "apellido_paterno": paterno, "apellido_materno": materno,
+                "fecha_nacimiento": date(aleatorio.randint(1960, 2000), aleatorio.randint(1, 12), aleatorio.randint(1, 28)),
+                "tipo": TipoColaborador.ADMINISTRATIVO if i == 1 else aleatorio.choice(tipos),
+                "telefono": f"55{aleatorio.randint(10000000, 99999999)}",
+                "correo": CORREO_ADMIN if i == 1 else f"colaborador{i}@aps.local",
+                "fecha_ingreso": fecha_aleatoria(aleatorio, inicio - timedelta(days=2000), inicio).date(),
+                "numero_empleado": f"EMP-{i:05d}",
+                "turno": aleatorio.choice(["Matutino", "Vespertino", "Nocturno"]),
+                "contrasena": contrasena,
+                "rol": RolAcceso.ADMIN if i == 1 else RolAcceso.COLABORADOR,
+            }
+    await insertar_por_lotes(Colaborador, filas_colaboradores(), "Colaboradores")
+
+    # Residentes: uno de cada 20 dado de baja
+    def filas_residentes():
+        for i in range(1, residentes + 1):
+            nombre, paterno, materno = nombre_completo(aleatorio)
+            activo = i % 20 != 0
+            yield {
+                "nombre": nombre, "apellido_paterno": paterno, "apellido_materno": materno,
+                "fecha_nacimiento": date(aleatorio.randint(1925, 1955), aleatorio.randint(1, 12), aleatorio.randint(1, 28)),
+                "fecha_ingreso": fecha_aleatoria(aleatorio, inicio - timedelta(days=3000), inicio).date(),
+                "tipo_sangre": aleatorio.choice(list(TipoSangre)),
+                "estado": EstadoResidente.ACTIVO if activo else EstadoResidente.INACTIVO,
+                "alergias": aleatorio.choice([None, "Penicilina", "Sulfas", "Mariscos"]),
+                "condiciones_medicas": aleatorio.choice(["Hipertensión", "Diabetes tipo 2", "Artritis", "Demencia leve"]),
+                "nivel_movilidad": aleatorio.choice(["Independiente", "Andadera", "Silla de ruedas", "Encamado"]),
+                "contacto_emergencia_nombre": " ".join(nombre_completo(aleatorio)),
+                "contacto_emergencia_relacion": aleatorio.choice(["Hija", "Hijo", "Sobrina", "Nieto"]),
+                "contacto_emergencia_telefono": f"55{aleatorio.randint(10000000, 99999999)}",
+                "numero_expediente": f"EXP-{i:06d}",
+                "activo": activo,
+            }
+    await insertar_por_lotes(Residente, filas_residentes(), "Residentes")
+
+    # Catálogo de productos
+    categorias = list(CategoriaProducto)
+    unidades = list(UnidadMedida)
+
+    def filas_productos():
+        for i in range(1, productos + 1):
+            yield {
+                "codigo": f"PRD-{i:06d}",
+                "nombre": f"{aleatorio.choice(PRODUCTOS)} {aleatorio.choice(['', 'presentación ', 'caja '])}{i}",
+                "descripcion": "Producto generado para pruebas de carga",
+                "categoria": aleatorio.choice(categorias),
+                "unidad_medida": aleatorio.choice(unidades),
+                "stock_actual": 0,
+                "stock_minimo": aleatorio.randint(5, 50),
+                "ubicacion": f"Almacén {aleatorio.randint(1, 4)}, estante {aleatorio.randint(1, 40)}",
+            }
+    await insertar_por_lotes(Producto, filas_productos(), "Productos")
+
+    # Suministros: pedidos trimestrales por producto con costo
+    costos = {i: Decimal(aleatorio.randint(500, 50000)) / 100 for i in range(1, productos + 1)}
+
+    def filas_suministros():
+        fecha = inicio
+        while fecha < fin:
+            for producto_id in range(1, productos + 1):
+                solicitud = fecha + timedelta(days=aleatorio.randint(0, 80))
+                entregado = solicitud < fin - timedelta(days=20)
+                cantidad = aleatorio.randint(50, 500)
+                costo = float(costos[producto_id] * Decimal(aleatorio.randint(95, 110)) / 100)
+                yield {
+                    "producto_id": producto_id,
+                    "cantidad_solicitada": cantidad,
+                    "cantidad_recibida": cantidad if entregado else 0,
+                    "estado": EstadoSuministro.RECIBIDO if entregado else EstadoSuministro.ENVIADO,
+                    "proveedor": aleatorio.choice(PROVEEDORES),
+                    "fecha_solicitud": solicitud,
+                    "fecha_entrega_estimada": solicitud + timedelta(days=7),
+                    "fecha_entrega_real": solicitud + timedelta(days=aleatorio.randint(3, 12)) if entregado else None,
+                    "costo_unitario": round(costo, 2),
+                    "total": round(costo * cantidad, 2),
+                }
+            fecha += timedelta(days=91)
+    await insertar_por_lotes(Suministro, filas_suministros(), "Suministros")
+
+    # Movimientos: entradas de reabastecimiento y salidas consumidas por
+    # residentes activos a lo largo de todo el periodo
+    activos = [i for i in range(1, residentes + 1) if i % 20 != 0]
+
+    def filas_movimientos():
+        for _ in range(movimientos):
+            producto_id = aleatorio.randint(1, productos)
+            if aleatorio.random() < 0.1:
+                yield {
+                    "producto_id": producto_id, "tipo_movimiento": "entrada",
+                    "cantidad": Decimal(aleatorio.randint(50, 200)),
+                    "fecha_movimiento": fecha_aleatoria(aleatorio, inicio, fin),
+                    "responsable": "Almacén", "motivo": "Recepción de suministro",
+                    "documento_referencia": None, "residente_id": None,
+                }
+            else:
+                yield {
+                    "producto_id": producto_id, "tipo_movimiento": "salida",
+                    "cantidad": Decimal(aleatorio.randint(1, 3000)) / 1000,
+                    "fecha_movimiento": fecha_aleatoria(aleatorio, inicio, fin),
+                    "responsable": "Enfermería", "motivo": "Consumo de residente",
+                    "documento_referencia": None, "residente_id": aleatorio.choice(activos),
+                }
+    await insertar_por_lotes(MovimientoInventario, filas_movimientos(), "Movimientos")
+
+    async with AsyncSessionEscritura() as db:
+        diferencias = await conciliar_existencias(db, corregir=True)
+        await db.commit()
+    logger.info(f"Existencias conciliadas en {len(diferencias):,} productos")
+
+    # Remisiones: cerca de una por residente cada dos meses, con sus eventos
+    # de seguimiento y la trazabilidad del personal que intervino
+    tipos_remision = list(TipoRemision)
+    folios = {}
+    seguimientos = []
+    trazabilidad = []
+
+    def filas_remisiones():
+        total = len(activos) * args.anios * 6
+        for remision_id in range(1, total + 1):
+            programada = fecha_aleatoria(aleatorio, inicio, fin)
+            dia = programada.strftime("%Y%m%d")
+            folios[dia] = folios.get(dia, 0) + 1
+            completada = programada < fin - timedelta(days=7)
+            cancelada = aleatorio.random() < 0.05
+            estado = (EstadoRemision.CANCELADA if cancelada
+                      else EstadoRemision.COMPLETADA if completada else EstadoRemision.PROGRAMADA)
+            if estado == EstadoRemision.COMPLETADA:
+                for paso, tipo_evento in enumerate((TipoEvento.SALIDA, TipoEvento.LLEGADA, TipoEvento.CONSULTA, TipoEvento.RETORNO)):
+                    seguimientos.append({
+                        "remision_id": remision_id, "tipo_evento": tipo_evento,
+                        "fecha_hora": programada + timedelta(hours=paso),
+                        "ubicacion": aleatorio.choice(INSTITUCIONES), "responsable": "Enfermería",
+                        "descripcion": f"Evento {tipo_evento.value}",
+                    })
+                trazabilidad.append({
+                    "remision_id": remision_id, "colaborador_id": aleatorio.randint(2, colaboradores),
+                    "rol": aleatorio.choice(["Acompañante", "Médico tratante", "Enfermería"]),
+                    "fecha_intervencion": programada,
+                    "descripcion_intervencion": "Acompañamiento a la consulta",
+                })
+            yield {
+                "numero_remision": f"REM-{dia}-{folios[dia]:04d}",
+                "residente_id": aleatorio.choice(activos),
+                "tipo": aleatorio.choice(tipos_remision),
+                "estado": estado,
+                "institucion_destino": aleatorio.choice(INSTITUCIONES),
+                "direccion_destino": "Av. Reforma 100, Ciudad de México",
+                "especialidad": aleatorio.choice(ESPECIALIDADES),
+                "fecha_programada": programada,
+                "fecha_salida": programada if estado == EstadoRemision.COMPLETADA else None,
+                "fecha_retorno": programada + timedelta(hours=4) if estado == EstadoRemision.COMPLETADA else None,
+                "motivo": "Control periódico",
+                "diagnostico_envio": aleatorio.choice(["Estable", "Seguimiento de tratamiento", "Dolor torácico"]),
+                "medico_remitente": "Dra. " + " ".join(nombre_completo(aleatorio)[1:]),
+                "requiere_ambulancia": aleatorio.random() < 0.1,
+                "costo_estimado": round(aleatorio.uniform(200, 5000), 2),
+            }
+    await insertar_por_lotes(Remision, filas_remisiones(), "Remisiones")
+    await insertar_por_lotes(SeguimientoRemision, iter(seguimientos), "Seguimiento de remisiones")
+    await insertar_por_lotes(TrazabilidadProfesional, iter(trazabilidad), "Trazabilidad de remisiones")
+    # Los contadores de folios continúan la numeración generada
+    await insertar_por_lotes(
+        ContadorRemision, ({"fecha": dia, "ultimo": ultimo} for dia, ultimo in folios.items()), "Contadores de folios"
+    )
+
+    # Facturas: corridas de facturación mensual de todo el periodo; las de
+    # más de dos meses quedan pagadas
+    inicio_facturacion = time.perf_counter()
+    lista_periodos = list(periodos(inicio, fin))
+    total_residentes = len(activos)
+    for periodo in lista_periodos:
+        async with AsyncSessionEscritura() as db:
+            db.add(CorridaFacturacion(periodo=periodo, total_residentes=total_residentes, estado="en_proceso"))
+            await db.commit()
+        await ejecutar_corrida(periodo)
+    async with AsyncSessionEscritura() as db:
+        await db.execute(
+            update(Factura)
+            .where(Factura.periodo < lista_periodos[-2])
+            .values(estado=EstadoFactura.PAGADA.value)
+        )
+        facturas = await db.scalar(select(func.count()).select_from(Factura))
+        await db.commit()
+    logger.info(f"Facturas: {facturas:,} en {len(lista_periodos)} corridas mensuales "
+                f"en {time.perf_counter() - inicio_facturacion:.1f} s")
+
+    # Estadísticas del planificador con los volúmenes ya cargados
+    async with AsyncSessionEscritura() as db:
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+    await close_engines()
+    logger.info(f"Base de datos generada en {time.perf_counter() - arranque:.1f} s: {DB_PATH} "
+                f"(administrador {CORREO_ADMIN} / {CONTRASENA_ADMIN})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos para pruebas de carga")
+    parser.add_argument("--db", help="Ruta de la base de datos a generar (por defecto APS_DB_PATH o aps.db)")
+    parser.add_argument("--residentes", type=int, default=400)
+    parser.add_argument("--colaboradores", type=int, default=80)
+    parser.add_argument("--productos", type=int, default=3000)
+    parser.add_argument("--movimientos", type=int, default=2000000)
+    parser.add_argument("--anios", type=int, default=3, help="Años de historia")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplica todos los volúmenes")
+    parser.add_argument("--semilla", type=int, default=20260101)
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["APS_DB_PATH"] = os.path.abspath(args.db)
+    # Sin tareas programadas mientras se genera
+    os.environ.setdefault("APS_PROGRAMADOR", "0")
+    asyncio.run(generar(args))
@@ -0,0 +1,75 @@
+import sys
+import os
+import csv
+import asyncio
+import argparse
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.models.database import create_tables, close_engines, DB_PATH
+from app.src.routes.importaciones import ENTIDADES, entidad_importacion
+from app.src.servicios.importacion import FORMATOS, LECTORES, formato_por_nombre, importar
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Importa residentes, colaboradores o productos desde un archivo CSV, NDJSON
+# o JSON. Los registros existentes se actualizan por su clave natural
+# (numero_expediente, numero_empleado, codigo).
+#
+#   python app/src/scripts/importar.py productos catalogo.csv --reporte errores.csv
+
+
+async def ejecutar(entidad: str, ruta: str, formato: str, ruta_reporte: str = None, permitir_admin: bool = False) -> int:
+    await create_tables()
+    reporte = escritor = None
+    if ruta_reporte:
+        reporte = open(ruta_reporte, "w", newline="", encoding="utf-8")
+        escritor = csv.writer(reporte)
+        escritor.writerow(["fila", "clave", "errores"])
+
+    def al_error(error):
+        if escritor is not None:
+            escritor.writerow([error.fila, error.clave or "", "; ".join(error.errores)])
+
+    try:
+        with open(ruta, "rb") as archivo:
+            resultado = await importar(entidad_importacion(entidad, permitir_admin), LECTORES[formato](archivo), al_error)
+    finally:
+        if reporte is not None:
+            reporte.close()
+        await close_engines()
+
+    logger.info(
+        f"{resultado.leidas} filas leídas: {resultado.insertadas} insertadas, "
+        f"{resultado.actualizadas} actualizadas, {resultado.con_error} con error"
+    )
+    if not ruta_reporte:
+        for error in resultado.errores[:20]:
+            logger.warning(f"Fila {error.fila} ({error.clave or 'sin clave'}): {'; '.join(error.errores)}")
+        if resultado.con_error > 20:
+            logger.warning(f"... y {resultado.con_error - 20} errores más (use --reporte para obtenerlos todos)")
+    if resultado.error_formato:
+        logger.error(f"La lectura se detuvo: {resultado.error_formato}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de catálogos")
+    parser.add_argument("entidad", choices=sorted(ENTIDADES))
+    parser.add_argument("archivo")
+    parser.add_argument("--formato", choices=FORMATOS, help="Por defecto se deduce de la extensión")
+    parser.add_argument("--reporte", help="Archivo CSV donde escribir las filas con error")
+    parser.add_argument("--permitir-admin", action="store_true", help="Acepta colaboradores con rol admin")
+    args = parser.parse_args()
+
+    formato = args.formato or formato_por_nombre(args.archivo)
+    if formato is None:
+        parser.error("No se pudo deducir el formato del archivo; use --formato")
+    logger.info(f"Importando {args.entidad} en {DB_PATH}")
+    sys.exit(asyncio.run(ejecutar(args.entidad, args.archivo, formato, args.reporte, args.permitir_admin)))
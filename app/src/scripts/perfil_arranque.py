@@ -0,0 +1,189 @@
+import sys
+import os
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts.benchmark import commit_actual
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Perfil del arranque de un worker: cada repetición es un proceso nuevo que
+# importa app.src.main y llama a crear_app(), como `uvicorn --factory`, con
+# -X importtime.
+# Reporta la mediana del tiempo total de importación, de las fases de
+# crear_app() (rutas, mappers) y del tiempo propio de importación agrupado
+# por paquete (fastapi, sqlalchemy, ...) y por módulo de la aplicación.
+#
+#   python app/src/scripts/perfil_arranque.py --salida arranque.json
+#   ... cambios ...
+#   python app/src/scripts/perfil_arranque.py --comparar arranque.json
+#
+# Falla (código 1) si el arranque pasa de --presupuesto, si empeora más de
+# --tolerancia respecto a --comparar, si importar app.src.models carga los
+# modelos, si importar app.src.main ya crea la aplicación o si al terminar
+# crear_app() queda algún mapper sin configurar.
+
+SONDA = r"""
+import sys, json, time
+inicio = time.perf_counter()
+import app.src.models
+perezosos = not any(nombre.startswith("app.src.models.") for nombre in sys.modules)
+import app.src.main as main
+app_al_importar = "app" in vars(main)
+aplicacion = main.crear_app()
+importacion = time.perf_counter() - inicio
+from app.src.models import Base, MODULOS_MODELOS
+print(json.dumps({
+    "importacion_s": importacion,
+    "fases": aplicacion.state.arranque,
+    "modelos_perezosos": perezosos,
+    "app_al_importar": app_al_importar,
+    "modelos_faltantes": [m for m in MODULOS_MODELOS if f"app.src.models.{m}" not in sys.modules],
+    "mappers_sin_configurar": [m.class_.__name__ for m in Base.registry.mappers if not m.configured],
+    "rutas": len(aplicacion.routes),
+}))
+"""
+
+
+def grupo(modulo: str) -> str:
+    # app.src.routes.inventario por módulo; el resto por paquete raíz
+    partes = modulo.split(".")
+    if partes[:2] == ["app", "src"]:
+        return ".".join(partes[:4])
+    return partes[0]
+
+
+def ejecutar_sonda(entorno: dict) -> dict:
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SONDA],
+        cwd=REPO_ROOT, env=entorno, capture_output=True, text=True,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f"El arranque falló:\n{proceso.stderr[-3000:]}")
+    datos = json.loads(proceso.stdout.strip().splitlines()[-1])
+    propios = defaultdict(float)
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _, modulo = linea[len("import time:"):].split("|")
+        propios[grupo(modulo.strip())] += int(propio) / 1000
+    datos["grupos_ms"] = propios
+    return datos
+
+
+def perfilar(repeticiones: int) -> dict:
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = REPO_ROOT
+    entorno.setdefault("APS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="aps-arranque-"), "arranque.db"))
+    entorno.setdefault("APS_PROGRAMADOR", "0")
+
+    # La primera corrida escribe los .pyc y calienta la caché de disco
+    ejecutar_sonda(entorno)
+    corridas = [ejecutar_sonda(entorno) for _ in range(repeticiones)]
+
+    grupos = {}
+    for nombre in set().union(*(corrida["grupos_ms"] for corrida in corridas)):
+        grupos[nombre] = round(statistics.median(corrida["grupos_ms"].get(nombre, 0) for corrida in corridas), 1)
+    ultima = corridas[-1]
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "configuracion": {"repeticiones": repeticiones, "python": sys.version.split()[0]},
+        "total_s": round(statistics.median(corrida["importacion_s"] for corrida in corridas), 4),
+        "fases_s": {
+            fase: round(statistics.median(corrida["fases"][fase] for corrida in corridas), 4)
+            for fase in ultima["fases"]
+        },
+        "grupos_ms": dict(sorted(grupos.items(), key=lambda par: -par[1])),
+        "rutas": ultima["rutas"],
+        "modelos_perezosos": all(corrida["modelos_perezosos"] for corrida in corridas),
+        "app_al_importar": any(corrida["app_al_importar"] for corrida in corridas),
+        "modelos_faltantes": ultima["modelos_faltantes"],
+        "mappers_sin_configurar": ultima["mappers_sin_configurar"],
+    }
+
+
+def mostrar(resultado: dict, top: int):
+    lineas = [f"Arranque (mediana de {resultado['configuracion']['repeticiones']}, commit {resultado['commit']}): "
+              f"{resultado['total_s'] * 1000:.0f} ms, {resultado['rutas']} rutas"]
+    for fase, segundos in resultado["fases_s"].items():
+        lineas.append(f"  crear_app {fase:<10} {segundos * 1000:8.1f} ms")
+    lineas.append(f"Tiempo propio de importación, {top} grupos más lentos:")
+    for nombre, ms in list(resultado["grupos_ms"].items())[:top]:
+        lineas.append(f"  {nombre:<40} {ms:8.1f} ms")
+    print("\n".join(lineas))
+
+
+def comparar(anterior: dict, actual: dict):
+    def cambio(antes: float, despues: float) -> str:
+        if not antes:
+            return "     n/d"
+        return f"{(despues - antes) / antes * 100:+7.1f}%"
+
+    lineas = [f"Comparación con {anterior['commit']} ({anterior['fecha']}) → {actual['commit']}",
+              f"  arranque   {anterior['total_s'] * 1000:8.1f} → {actual['total_s'] * 1000:8.1f} ms "
+              f"{cambio(anterior['total_s'], actual['total_s'])}"]
+    for fase, segundos in actual["fases_s"].items():
+        antes = anterior["fases_s"].get(fase)
+        if antes is not None:
+            lineas.append(f"  {fase:<10} {antes * 1000:8.1f} → {segundos * 1000:8.1f} ms {cambio(antes, segundos)}")
+    print("\n".join(lineas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil del arranque de la aplicación")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15, help="Grupos de importación a mostrar")
+    parser.add_argument("--presupuesto", type=float, default=1.5, help="Máximo de segundos para el arranque")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="Empeoramiento máximo respecto a --comparar (0.25 = 25%%)")
+    parser.add_argument("--salida", help="Guardar el resultado en este archivo JSON")
+    parser.add_argument("--comparar", help="Resultado JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+
+    resultado = perfilar(args.repeticiones)
+    mostrar(resultado, args.top)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+        logger.info(f"Resultado guardado en {args.salida}")
+
+    errores = []
+    if resultado["total_s"] > args.presupuesto:
+        errores.append(f"El arranque tardó {resultado['total_s']:.3f} s, presupuesto {args.presupuesto} s")
+    if anterior is not None:
+        comparar(anterior, resultado)
+        limite = anterior["total_s"] * (1 + args.tolerancia)
+        if resultado["total_s"] > limite:
+            errores.append(f"El arranque empeoró: {anterior['total_s']:.3f} s → {resultado['total_s']:.3f} s "
+                           f"(tolerancia {args.tolerancia:.0%})")
+    if not resultado["modelos_perezosos"]:
+        errores.append("Importar app.src.models cargó módulos de modelos")
+    if resultado["app_al_importar"]:
+        errores.append("Importar app.src.main creó la aplicación; con --factory se construiría dos veces")
+    if resultado["modelos_faltantes"]:
+        errores.append(f"Modelos sin cargar tras crear_app(): {', '.join(resultado['modelos_faltantes'])}")
+    if resultado["mappers_sin_configurar"]:
+        errores.append(f"Mappers sin configurar tras crear_app(): {', '.join(resultado['mappers_sin_configurar'])}")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
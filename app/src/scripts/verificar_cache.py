@@ -0,0 +1,224 @@
+import sys
+import os
+import asyncio
+import sqlite3
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, consultas, nuevo_colaborador, nuevo_residente
+base_temporal("cache")
+os.environ.setdefault("APS_PROGRAMADOR", "0")
+
+import httpx
+from sqlalchemy import insert, update
+from app.src.main import app
+from app.src.models.inventario import Producto, Suministro, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, AsyncSessionLocal, DB_PATH
+from app.src.servicios.cache import CacheLectura, AUSENTE
+from app.src.servicios.catalogo import cache_productos, cache_catalogo, producto_por_id
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Verificación de las cachés de lectura: aciertos sin leer las filas, invalidación
+# al confirmar (por fila con el ORM y el libro de existencias, por tabla con
+# sentencias masivas), nada se invalida ni se guarda con cambios deshechos o
+# sin confirmar, LRU, TTL y estadísticas expuestas.
+
+async def sembrar() -> str:
+    async with AsyncSessionEscritura() as db:
+        colaborador = nuevo_colaborador("cache")
+        residente = nuevo_residente("EXP-CAC-1", apellido_paterno="Caché")
+        db.add_all([colaborador, residente])
+        await db.execute(insert(Producto), [
+            {"codigo": f"CAC-{i}", "nombre": f"Producto {i}", "stock_actual": 100, "stock_minimo": 1,
+             "categoria": CategoriaProducto.LIMPIEZA, "unidad_medida": UnidadMedida.PIEZA}
+            for i in range(1, 11)
+        ])
+        await db.execute(insert(Suministro), [
+            {"producto_id": i, "cantidad_solicitada": 10, "proveedor": "Proveedor", "costo_unitario": 5}
+            for i in range(1, 4)
+        ])
+        await db.commit()
+        return crear_sesion(colaborador)
+
+
+async def verificar_http(errores: list):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, await sembrar())
+
+        # Segunda lectura del mismo producto: solo la consulta de la versión
+        # de productos (peticiones condicionales)
+        await cliente.get("/inventario/productos/1")
+        await cliente.get("/inventario/productos/2")
+        respuesta = await cliente.get("/inventario/productos/1")
+        if respuesta.status_code != 200 or consultas(respuesta) != 1:
+            errores.append(f"GET producto en caché: {respuesta.status_code}, {consultas(respuesta)} consultas")
+
+        # Una salida invalida solo el producto movido; el stock se ve al instante
+        respuesta = await cliente.post("/inventario/movimientos/", json={
+            "producto_id": 1, "tipo_movimiento": "salida", "cantidad": "2.5",
+            "responsable": "enfermería", "motivo": "consumo",
+        })
+        if respuesta.status_code != 201:
+            errores.append(f"POST movimiento: {respuesta.status_code} {respuesta.text}")
+        async with AsyncSessionLocal() as db:
+            stock = (await producto_por_id(db, 1)).stock_actual
+        if stock != 97.5:
+            errores.append(f"Stock tras la salida: {stock}, se esperaba 97.5")
+        if cache_productos.buscar(2) is AUSENTE:
+            errores.append("La salida del producto 1 invalidó también el producto 2")
+        # La petición condicional sí relee el producto 2: la versión de
+        # productos cambió y el cuerpo debe corresponder al ETag nuevo
+        if consultas(await cliente.get("/inventario/productos/2")) != 2:
+            errores.append("El GET condicional usó una entrada de una versión anterior de productos")
+
+        # Actualización con el ORM
+        await cliente.put("/inventario/productos/2", json={"nombre": "Renombrado"})
+        if (await cliente.get("/inventario/productos/2")).json().get("nombre") != "Renombrado":
+            errores.append("La actualización del producto no invalidó su entrada")
+
+        # Catálogo por forma de consulta: en caché hasta el alta de un producto
+        primera = await cliente.get("/inventario/productos/?limit=100")
+        segunda = await cliente.get("/inventario/productos/?limit=100")
+        if consultas(segunda) != 1 or primera.json() != segunda.json():
+            errores.append(f"Página del catálogo en caché: {consultas(segunda)} consultas")
+        await cliente.post("/inventario/productos/", json={
+            "codigo": "CAC-NUEVO", "nombre": "Nuevo", "categoria": "limpieza", "unidad_medida": "pieza",
+            "stock_minimo": 1,
+        })
+        codigos = [p["codigo"] for p in (await cliente.get("/inventario/productos/?limit=100")).json()]
+        if "CAC-NUEVO" not in codigos:
+            errores.append("El alta de un producto no invalidó el catálogo")
+
+        # Un id inexistente queda en caché hasta que se inserta la fila
+        if (await cliente.get("/inventario/suministros/4")).status_code != 404:
+            errores.append("Se esperaba 404 para el suministro 4")
+        await cliente.post("/inventario/suministros/", json={
+            "producto_id": 1, "cantidad_solicitada": "5", "proveedor": "Proveedor", "costo_unitario": "7",
+        })
+        if (await cliente.get("/inventario/suministros/4")).status_code != 200:
+            errores.append("El alta del suministro 4 no invalidó su ausencia en caché")
+
+        # Factura: las verificaciones de la sesión de escritura no usan la caché
+        factura = {"residente_id": 1, "detalles": [
+            {"suministro_id": i, "cantidad": "1", "precio_unitario": "5"} for i in range(1, 4)
+        ]}
+        antes = consultas(await cliente.post("/facturacion/", json=factura))
+        despues = consultas(await cliente.post("/facturacion/", json=factura))
+        if despues != antes:
+            errores.append(f"POST factura: {antes} y luego {despues} consultas, se esperaban las mismas")
+        respuesta = await cliente.post("/facturacion/", json=dict(factura, residente_id=99))
+        if respuesta.status_code != 404:
+            errores.append(f"Factura de residente inexistente: {respuesta.status_code}")
+
+        # Otro proceso borra el suministro 4, que sigue en la caché: la factura
+        # lo verifica en la base y lo rechaza
+        await cliente.get("/inventario/suministros/4")
+        with sqlite3.connect(DB_PATH) as conexion:
+            conexion.execute("DELETE FROM suministros WHERE id = 4")
+        respuesta = await cliente.post("/facturacion/", json={"residente_id": 1, "detalles": [
+            {"suministro_id": 4, "cantidad": "1", "precio_unitario": "5"}
+        ]})
+        if respuesta.status_code != 404:
+            errores.append(f"Factura con un suministro borrado por otro proceso: {respuesta.status_code}")
+
+        estado = (await cliente.get("/estado/cache")).json()
+        if not estado.get("productos", {}).get("aciertos"):
+            errores.append(f"/estado/cache sin aciertos de productos: {estado}")
+        if 'aps_cache_aciertos_total{cache="productos"}' not in (await cliente.get("/metrics")).text:
+            errores.append("/metrics no expone los aciertos de la caché")
+
+
+async def verificar_sesiones(errores: list):
+    await cargar_producto(3)
+
+    # Un cambio deshecho no invalida ni contamina la caché
+    async with AsyncSessionEscritura() as db:
+        await db.execute(update(Producto).where(Producto.id == 3).values(nombre="Deshecho"))
+        if (await producto_por_id(db, 3)).nombre != "Deshecho":
+            errores.append("La sesión con cambios pendientes no leyó su propio cambio")
+        await db.rollback()
+    if cache_productos.buscar(3) is AUSENTE:
+        errores.append("Un cambio deshecho invalidó la caché")
+    async with AsyncSessionLocal() as db:
+        if (await producto_por_id(db, 3)).nombre == "Deshecho":
+            errores.append("La caché guardó un cambio deshecho")
+
+    # Una sentencia masiva sin ids vacía las cachés de su tabla al confirmar
+    async with AsyncSessionEscritura() as db:
+        await db.execute(update(Producto).values(ubicacion="Bodega"))
+        await db.commit()
+    if cache_productos._entradas or cache_catalogo._entradas:
+        errores.append("La sentencia masiva no vació las cachés de productos")
+
+    # SAVEPOINT deshecho dentro de una transacción que sí se confirma
+    await cargar_producto(3)
+    async with AsyncSessionEscritura() as db:
+        await db.execute(update(Producto).where(Producto.id == 3).values(nombre="Confirmado"))
+        anidada = await db.begin_nested()
+        await db.execute(update(Producto).where(Producto.id == 4).values(nombre="Deshecho"))
+        await anidada.rollback()
+        await db.commit()
+    async with AsyncSessionLocal() as db:
+        if (await producto_por_id(db, 3)).nombre != "Confirmado":
+            errores.append("Deshacer un SAVEPOINT perdió la invalidación de la transacción")
+
+
+async def cargar_producto(producto_id: int):
+    async with AsyncSessionLocal() as db:
+        await producto_por_id(db, producto_id)
+
+
+async def verificar_cache(errores: list):
+    cache = CacheLectura("prueba", {"prueba"}, maximo=3, ttl=60)
+
+    async def cargar(valor):
+        return valor
+
+    class Sesion:
+        info = {}
+
+    for clave in range(5):
+        await cache.obtener(Sesion, clave, lambda clave=clave: cargar(clave))
+    if list(cache._entradas) != [2, 3, 4] or cache.estadisticas()["desalojos"] != 2:
+        errores.append(f"LRU: {list(cache._entradas)}, {cache.estadisticas()}")
+
+    # Una invalidación durante la carga impide guardar el valor leído
+    async def cargar_con_cambio():
+        cache.invalidar([9])
+        return "viejo"
+    await cache.obtener(Sesion, 9, cargar_con_cambio)
+    if cache.buscar(9) is not AUSENTE:
+        errores.append("Se guardó un valor leído durante una invalidación")
+
+    cache.ttl = 0
+    await cache.obtener(Sesion, 10, lambda: cargar(10))
+    if cache.buscar(10) is not AUSENTE:
+        errores.append("Una entrada vencida se devolvió desde la caché")
+
+
+async def ejecutar():
+    await create_tables()
+    errores = []
+    await verificar_http(errores)
+    await verificar_sesiones(errores)
+    await verificar_cache(errores)
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Cachés de lectura verificadas")
+
+
+if __name__ == "__main__":
+    asyncio.run(ejecutar())
@@ -0,0 +1,210 @@
+import sys
+import os
+import gzip
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, consultas, nuevo_colaborador, nuevo_residente
+base_temporal("condicional")
+os.environ.setdefault("APS_PROGRAMADOR", "0")
+
+import httpx
+from sqlalchemy import insert
+from app.src.main import app
+from app.src.models import TipoColaborador, TipoSangre, Remision
+from app.src.models.remisiones import TipoRemision
+from app.src.models.inventario import Producto, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, DB_PATH
+from app.src.servicios.compresion import MiddlewareCompresion
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Verificación de las peticiones condicionales y la compresión: ETag y
+# Last-Modified en listados y detalles, 304 sin ejecutar el endpoint, cambio
+# de versión con escrituras del ORM, sentencias masivas y otros procesos,
+# compresión gzip de respuestas completas y en flujo, y eventos SSE sin
+# comprimir ni retener.
+
+async def sembrar() -> str:
+    async with AsyncSessionEscritura() as db:
+        colaborador = nuevo_colaborador("condicional", tipo=TipoColaborador.ENFERMERO)
+        residente = nuevo_residente("EXP-CON-1", apellido_paterno="Condicional", tipo_sangre=TipoSangre.A_POSITIVO)
+        db.add_all([colaborador, residente])
+        await db.flush()
+        await db.execute(insert(Producto), [
+            {"codigo": f"CON-{i}", "nombre": f"Guantes de nitrilo talla {i}", "stock_actual": 50, "stock_minimo": 5,
+             "categoria": CategoriaProducto.MATERIAL_CURACION, "unidad_medida": UnidadMedida.CAJA}
+            for i in range(1, 201)
+        ])
+        db.add(Remision(
+            numero_remision="REM-20260101-0001", residente_id=residente.id, tipo=TipoRemision.CONSULTA,
+            institucion_destino="Hospital", direccion_destino="Centro", fecha_programada=datetime(2026, 1, 5),
+            motivo="Control", diagnostico_envio="Estable", medico_remitente="Dra. López",
+        ))
+        await db.commit()
+        return crear_sesion(colaborador)
+
+
+async def verificar_condicional(cliente, errores: list):
+    ruta = "/inventario/productos/?limit=200"
+    respuesta = await cliente.get(ruta)
+    etag = respuesta.headers.get("etag")
+    ultima = respuesta.headers.get("last-modified")
+    if respuesta.status_code != 200 or not etag or not ultima or respuesta.headers.get("cache-control") != "no-cache":
+        errores.append(f"Encabezados de validación: {dict(respuesta.headers)}")
+        return
+
+    # Mismo ETag: 304 sin cuerpo y sin leer los productos
+    no_modificado = await cliente.get(ruta, headers={"if-none-match": etag})
+    if no_modificado.status_code != 304 or no_modificado.content or no_modificado.headers.get("etag") != etag:
+        errores.append(f"If-None-Match vigente: {no_modificado.status_code}, {len(no_modificado.content)} bytes")
+    elif consultas(no_modificado) != 1:
+        errores.append(f"El 304 hizo {consultas(no_modificado)} consultas, se esperaba 1")
+    lista = await cliente.get(ruta, headers={"if-none-match": f'"otro", {etag[2:] if etag.startswith("W/") else etag}'})
+    if lista.status_code != 304:
+        errores.append(f"ETag fuerte dentro de una lista: {lista.status_code}")
+
+    # If-Modified-Since solo cuando no hay If-None-Match
+    if (await cliente.get(ruta, headers={"if-modified-since": ultima})).status_code != 304:
+        errores.append("If-Modified-Since con Last-Modified no respondió 304")
+    anterior = format_datetime(datetime.now(timezone.utc) - timedelta(days=1), usegmt=True)
+    if (await cliente.get(ruta, headers={"if-modified-since": anterior})).status_code != 200:
+        errores.append("If-Modified-Since anterior al cambio no respondió 200")
+    if (await cliente.get(ruta, headers={"if-none-match": '"otro"', "if-modified-since": ultima})).status_code != 200:
+        errores.append("If-None-Match distinto debe prevalecer sobre If-Modified-Since")
+
+    # Un movimiento (UPDATE condicional del libro de existencias) cambia la versión
+    await cliente.post("/inventario/movimientos/", json={
+        "producto_id": 1, "tipo_movimiento": "salida", "cantidad": "1", "responsable": "enfermería", "motivo": "uso",
+    })
+    tras_movimiento = await cliente.get(ruta, headers={"if-none-match": etag})
+    if tras_movimiento.status_code != 200 or tras_movimiento.headers["etag"] == etag:
+        errores.append(f"Tras un movimiento: {tras_movimiento.status_code}, ETag {tras_movimiento.headers.get('etag')}")
+    etag = tras_movimiento.headers["etag"]
+
+    # Escritura de otro proceso, fuera de SQLAlchemy: la ve el trigger, y el
+    # cuerpo con el ETag nuevo no sale de la caché del proceso
+    await cliente.get("/inventario/productos/2")
+    conexion = sqlite3.connect(DB_PATH)
+    conexion.execute("UPDATE productos SET ubicacion = 'Bodega 2' WHERE id = 2")
+    conexion.commit()
+    conexion.close()
+    respuesta = await cliente.get(ruta, headers={"if-none-match": etag})
+    if respuesta.status_code != 200:
+        errores.append("Una escritura de otro proceso no cambió la versión de productos")
+    elif next(p["ubicacion"] for p in respuesta.json() if p["id"] == 2) != "Bodega 2":
+        errores.append("El listado con el ETag nuevo salió de la caché anterior a la escritura")
+    if (await cliente.get("/inventario/productos/2")).json()["ubicacion"] != "Bodega 2":
+        errores.append("El producto con el ETag nuevo salió de la caché anterior a la escritura")
+
+    # Seguimiento: depende de la remisión y de sus eventos
+    ruta = "/remisiones/1/seguimiento"
+    etag = (await cliente.get(ruta)).headers["etag"]
+    if (await cliente.get(ruta, headers={"if-none-match": etag})).status_code != 304:
+        errores.append("El seguimiento sin cambios no respondió 304")
+    await cliente.post(ruta, json={"remision_id": 1, "tipo_evento": "salida", "fecha_hora": "2026-01-05T08:00:00"})
+    if (await cliente.get(ruta, headers={"if-none-match": etag})).status_code != 200:
+        errores.append("Un evento de seguimiento nuevo no cambió el ETag")
+    if (await cliente.get("/remisiones/99/seguimiento", headers={"if-none-match": "*"})).status_code != 404:
+        errores.append("If-None-Match: * respondió 304 para una remisión inexistente")
+    if (await cliente.get("/remisiones/", headers={"if-none-match": (await cliente.get("/remisiones/")).headers["etag"]})).status_code != 304:
+        errores.append("El listado de remisiones sin cambios no respondió 304")
+
+
+async def verificar_compresion(cliente, errores: list):
+    ruta = "/inventario/productos/?limit=200"
+    plano = await cliente.get(ruta, headers={"accept-encoding": "identity"})
+    comprimido = await cliente.get(ruta, headers={"accept-encoding": "gzip"})
+    if plano.headers.get("content-encoding") or comprimido.headers.get("content-encoding") != "gzip":
+        errores.append(f"Content-Encoding: {plano.headers.get('content-encoding')}, {comprimido.headers.get('content-encoding')}")
+    elif comprimido.json() != plano.json():
+        errores.append("La respuesta comprimida no coincide con la original")
+    elif int(comprimido.headers["content-length"]) >= len(plano.content) / 3:
+        errores.append(f"Compresión pobre: {comprimido.headers['content-length']} de {len(plano.content)} bytes")
+    if "Accept-Encoding" not in plano.headers.get("vary", ""):
+        errores.append("Falta Vary: Accept-Encoding")
+    if "server-timing" not in comprimido.headers:
+        errores.append("La compresión perdió la cabecera Server-Timing")
+    logger.info(f"{ruta}: {len(plano.content)} bytes, {comprimido.headers['content-length']} con gzip")
+
+    pequena = await cliente.get("/estado", headers={"accept-encoding": "gzip"})
+    if pequena.headers.get("content-encoding"):
+        errores.append("Se comprimió una respuesta pequeña")
+
+    # Exportación en flujo
+    plano = await cliente.get("/exportar/movimientos?formato=csv", headers={"accept-encoding": "identity"})
+    comprimido = await cliente.get("/exportar/movimientos?formato=csv", headers={"accept-encoding": "gzip"})
+    if comprimido.headers.get("content-encoding") != "gzip" or comprimido.content != plano.content:
+        errores.append("La exportación en flujo no se comprimió correctamente")
+
+
+async def verificar_sse(errores: list):
+    # Los eventos pasan sin comprimir y en cuanto se envían
+    recibidos = []
+
+    async def flujo(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": f"data: {i}\n\n".encode(), "more_body": True})
+            if len(recibidos) != i + 2:
+                errores.append(f"El evento {i} quedó retenido en el middleware")
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def recibir():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def enviar(mensaje):
+        recibidos.append(mensaje)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip, br")]}
+    await MiddlewareCompresion(flujo)(scope, recibir, enviar)
+    cuerpo = b"".join(m.get("body", b"") for m in recibidos[1:])
+    if any(n == b"content-encoding" for n, _ in recibidos[0]["headers"]) or cuerpo != b"data: 0\n\ndata: 1\n\ndata: 2\n\n":
+        errores.append(f"Se alteró el flujo SSE: {recibidos}")
+
+    # Respuesta ya comprimida (archivo precomprimido): se deja igual
+    recibidos.clear()
+    contenido = gzip.compress(b"x" * 5000)
+
+    async def precomprimido(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/css"), (b"content-encoding", b"gzip")]})
+        await send({"type": "http.response.body", "body": contenido})
+
+    await MiddlewareCompresion(precomprimido)(scope, recibir, enviar)
+    if recibidos[1]["body"] != contenido:
+        errores.append("Se volvió a comprimir una respuesta con Content-Encoding")
+
+
+async def ejecutar():
+    await create_tables()
+    errores = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, await sembrar())
+        await verificar_condicional(cliente, errores)
+        await verificar_compresion(cliente, errores)
+    await verificar_sse(errores)
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info("Peticiones condicionales y compresión verificadas")
+
+
+if __name__ == "__main__":
+    asyncio.run(ejecutar())
@@ -0,0 +1,124 @@
+import sys
+import os
+import re
+import time
+import asyncio
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, nuevo_colaborador
+base_temporal("metricas")
+
+import httpx
+from sqlalchemy import insert
+from app.src.main import app
+from app.src.models.inventario import Producto, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Verificación de la instrumentación sin colector externo: se hacen
+# peticiones con el cliente ASGI, se lee /metrics y se comprueba que el texto
+# es formato Prometheus válido y que los conteos coinciden con lo solicitado.
+
+LINEA_MUESTRA = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? [-+0-9.eInf]+$')
+SERVER_TIMING = re.compile(r'^bd;dur=[0-9.]+;desc="(\d+) consultas", app;dur=[0-9.]+$')
+
+
+@app.get("/_prueba_falla", include_in_schema=False)
+async def _prueba_falla():
+    raise RuntimeError("falla de prueba")
+
+
+def muestras(texto: str) -> dict:
+    valores = {}
+    for linea in texto.splitlines():
+        if linea.startswith("#") or not linea:
+            continue
+        nombre, _, valor = linea.rpartition(" ")
+        valores[nombre] = float(valor)
+    return valores
+
+
+async def sembrar() -> str:
+    async with AsyncSessionEscritura() as db:
+        colaborador = nuevo_colaborador("metricas")
+        db.add(colaborador)
+        await db.execute(insert(Producto), [
+            {"codigo": f"MET-{i}", "nombre": f"Producto {i}", "stock_minimo": 1,
+             "categoria": CategoriaProducto.LIMPIEZA, "unidad_medida": UnidadMedida.PIEZA}
+            for i in range(1, 21)
+        ])
+        await db.commit()
+        return crear_sesion(colaborador)
+
+
+async def ejecutar():
+    await create_tables()
+    cookie = await sembrar()
+    errores = []
+
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, cookie)
+        for producto_id in range(1, 11):
+            respuesta = await cliente.get(f"/inventario/productos/{producto_id}")
+            timing = SERVER_TIMING.match(respuesta.headers.get("server-timing", ""))
+            if not timing or int(timing.group(1)) < 1:
+                errores.append(f"Server-Timing inesperado: {respuesta.headers.get('server-timing')!r}")
+        for _ in range(5):
+            await cliente.get("/estado")
+        await cliente.get("/no-existe/123")
+        await cliente.get("/_prueba_falla")
+
+        # Costo de la instrumentación en una ruta sin base de datos
+        inicio = time.perf_counter()
+        for _ in range(500):
+            await cliente.get("/estado")
+        logger.info(f"/estado: {(time.perf_counter() - inicio) / 500 * 1000:.2f} ms por petición instrumentada")
+
+        respuesta = await cliente.get("/metrics")
+    await close_engines()
+
+    texto = respuesta.text
+    if not respuesta.headers["content-type"].startswith("text/plain; version=0.0.4"):
+        errores.append(f"Tipo de contenido de /metrics: {respuesta.headers['content-type']}")
+    invalidas = [linea for linea in texto.splitlines() if linea and not linea.startswith("#") and not LINEA_MUESTRA.match(linea)]
+    if invalidas:
+        errores.append(f"Líneas que no son formato Prometheus: {invalidas[:3]}")
+
+    valores = muestras(texto)
+    esperados = {
+        'aps_http_peticiones_total{metodo="GET",ruta="/inventario/productos/{producto_id}",estado="200"}': 10,
+        'aps_http_peticiones_total{metodo="GET",ruta="/estado",estado="200"}': 505,
+        'aps_http_peticiones_total{metodo="GET",ruta="(sin ruta)",estado="404"}': 1,
+        'aps_http_errores_total{metodo="GET",ruta="/_prueba_falla"}': 1,
+        'aps_http_duracion_segundos_count{metodo="GET",ruta="/inventario/productos/{producto_id}"}': 10,
+        'aps_http_duracion_segundos_bucket{metodo="GET",ruta="/estado",le="+Inf"}': 505,
+        'aps_bd_consultas_por_peticion_bucket{metodo="GET",ruta="/estado",le="0"}': 505,
+        'aps_http_en_curso{metodo="GET"}': 1,  # la propia petición a /metrics
+    }
+    for serie, esperado in esperados.items():
+        if valores.get(serie) != esperado:
+            errores.append(f"{serie} = {valores.get(serie)}, se esperaba {esperado}")
+    if not valores.get('aps_bd_consultas_total{ruta="/inventario/productos/{producto_id}"}', 0) >= 10:
+        errores.append("No se contaron las consultas de /inventario/productos/{producto_id}")
+    if not valores.get('aps_bd_consultas_total{ruta="(fondo)"}', 0) > 0:
+        errores.append("No se contaron las consultas fuera de peticiones")
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info(f"/metrics válido: {len(valores)} series")
+
+
+if __name__ == "__main__":
+    asyncio.run(ejecutar())
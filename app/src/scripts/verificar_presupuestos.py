@@ -0,0 +1,169 @@
+import sys
+import os
+import asyncio
+import argparse
+from datetime import datetime
+
+# Obtener la ruta absoluta del directorio raíz del repositorio
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.src.scripts._comun import base_temporal, consultas, nuevo_colaborador, nuevo_residente
+base_temporal("presupuestos")
+os.environ.setdefault("APS_PROGRAMADOR", "0")
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.future import select
+from app.src.main import app
+from app.src.models import TipoColaborador, TipoSangre, Remision, SeguimientoRemision
+from app.src.models.remisiones import TipoRemision, TipoEvento
+from app.src.models.inventario import Producto, Suministro, CategoriaProducto, UnidadMedida
+from app.src.models.database import create_tables, close_engines, AsyncSessionEscritura, AsyncSessionLocal
+from app.src.servicios import perfilador
+from app.src.servicios.perfilador import PRESUPUESTOS_CONSULTAS, PresupuestoExcedido, presupuesto_consultas
+from app.src.servicios.sesiones import crear_sesion, NOMBRE_COOKIE
+
+# Configurar logging
+import logging
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Verificación de los presupuestos de consultas por endpoint: con datos de
+# varias filas por relación (para que un N+1 se note), cada endpoint de
+# PRESUPUESTOS_CONSULTAS se llama y su número de consultas, leído de la
+# cabecera Server-Timing, no debe superar el presupuesto. Además se
+# comprueba que presupuesto_consultas detecta un N+1 y que las consultas
+# lentas se registran con su plan.
+
+FILAS = 20
+
+
+async def sembrar():
+    async with AsyncSessionEscritura() as db:
+        colaborador = nuevo_colaborador("presupuestos", tipo=TipoColaborador.MEDICO)
+        residente = nuevo_residente("EXP-PRE-1", apellido_paterno="Presupuesto", tipo_sangre=TipoSangre.A_POSITIVO)
+        db.add_all([colaborador, residente])
+        await db.flush()
+        await db.execute(insert(Producto), [
+            {"codigo": f"PRE-{i}", "nombre": f"Gasa estéril {i}", "stock_actual": 100, "stock_minimo": 1,
+             "categoria": CategoriaProducto.MATERIAL_CURACION, "unidad_medida": UnidadMedida.PIEZA}
+            for i in range(1, FILAS + 1)
+        ])
+        await db.execute(insert(Suministro), [
+            {"producto_id": i, "cantidad_solicitada": 10, "proveedor": "Proveedor", "costo_unitario": 12.5}
+            for i in range(1, FILAS + 1)
+        ])
+        remision = Remision(
+            numero_remision="REM-20260101-0001", residente_id=residente.id, tipo=TipoRemision.CONSULTA,
+            institucion_destino="Hospital", direccion_destino="Centro", fecha_programada=datetime(2026, 1, 5),
+            motivo="Control", diagnostico_envio="Estable", medico_remitente="Dra. López",
+        )
+        db.add(remision)
+        await db.flush()
+        await db.execute(insert(SeguimientoRemision), [
+            {"remision_id": remision.id, "tipo_evento": TipoEvento.CONSULTA, "fecha_hora": datetime(2026, 1, 5, 9, i)}
+            for i in range(FILAS)
+        ])
+        await db.commit()
+        return colaborador, residente.id, remision.id
+
+
+def peticiones(residente_id: int, remision_id: int, colaborador_id: int):
+    # (método, plantilla, ruta concreta, cuerpo JSON)
+    remision = {
+        "residente_id": residente_id, "tipo": "consulta", "institucion_destino": "Hospital",
+        "direccion_destino": "Centro", "fecha_programada": "2026-02-01T10:00:00", "motivo": "Control",
+        "diagnostico_envio": "Estable", "medico_remitente": "Dra. López",
+    }
+    return [
+        ("GET", "/remisiones/{remision_id}", f"/remisiones/{remision_id}", None),
+        ("GET", "/remisiones/{remision_id}/seguimiento", f"/remisiones/{remision_id}/seguimiento", None),
+        ("GET", "/remisiones/{remision_id}/trazabilidad", f"/remisiones/{remision_id}/trazabilidad", None),
+        ("GET", "/remisiones/{remision_id}/expediente", f"/remisiones/{remision_id}/expediente", None),
+        ("POST", "/remisiones/", "/remisiones/", remision),
+        ("POST", "/remisiones/{remision_id}/seguimiento", f"/remisiones/{remision_id}/seguimiento",
+         {"remision_id": remision_id, "tipo_evento": "llegada", "fecha_hora": "2026-01-05T11:00:00"}),
+        ("GET", "/inventario/productos/", "/inventario/productos/?limit=20", None),
+        ("GET", "/inventario/productos/{producto_id}", "/inventario/productos/1", None),
+        ("POST", "/inventario/movimientos/", "/inventario/movimientos/",
+         {"producto_id": 1, "tipo_movimiento": "salida", "cantidad": "1.5", "responsable": "enfermería",
+          "motivo": "curación", "residente_id": residente_id}),
+        ("POST", "/facturacion/", "/facturacion/", {
+            "residente_id": residente_id, "descontar_existencias": True,
+            "detalles": [{"suministro_id": i, "cantidad": "1", "precio_unitario": "12.50"} for i in range(1, FILAS + 1)],
+        }),
+        ("GET", "/facturacion/{factura_id}", "/facturacion/1", None),
+        ("GET", "/dashboard/indicadores", "/dashboard/indicadores", None),
+        ("GET", "/buscar", "/buscar?q=gasa", None),
+        ("GET", "/alertas/", "/alertas/", None),
+    ]
+
+
+async def ejecutar(mostrar: bool):
+    await create_tables()
+    colaborador, residente_id, remision_id = await sembrar()
+    errores = []
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://aps") as cliente:
+        cliente.cookies.set(NOMBRE_COOKIE, crear_sesion(colaborador))
+        cubiertos = set()
+        for metodo, plantilla, ruta, cuerpo in peticiones(residente_id, remision_id, colaborador.id):
+            respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+            if respuesta.status_code >= 400:
+                errores.append(f"{metodo} {ruta} respondió {respuesta.status_code}: {respuesta.text[:200]}")
+                continue
+            cantidad = consultas(respuesta)
+            maximo = PRESUPUESTOS_CONSULTAS[(metodo, plantilla)]
+            cubiertos.add((metodo, plantilla))
+            if mostrar or cantidad > maximo:
+                logger.info(f"{metodo} {plantilla}: {cantidad} consultas (presupuesto {maximo})")
+            if cantidad > maximo:
+                errores.append(f"{metodo} {plantilla} hizo {cantidad} consultas, presupuesto {maximo}")
+        for metodo, plantilla in sorted(set(PRESUPUESTOS_CONSULTAS) - cubiertos):
+            errores.append(f"El presupuesto de {metodo} {plantilla} no se verificó")
+
+    # presupuesto_consultas detecta un N+1 dentro de un bloque
+    try:
+        with presupuesto_consultas(2, "seguimientos uno por uno"):
+            async with AsyncSessionLocal() as db:
+                for evento_id in range(1, 6):
+                    await db.get(SeguimientoRemision, evento_id)
+        errores.append("presupuesto_consultas no detectó el N+1")
+    except PresupuestoExcedido as e:
+        if e.medicion.consultas != 5:
+            errores.append(f"presupuesto_consultas contó {e.medicion.consultas} consultas en lugar de 5")
+
+    # Con umbral cero, toda consulta se registra como lenta con su plan
+    registros = []
+    manejador = logging.Handler()
+    manejador.emit = registros.append
+    logging.getLogger(perfilador.__name__).addHandler(manejador)
+    umbral = perfilador.UMBRAL_CONSULTA_LENTA
+    perfilador.UMBRAL_CONSULTA_LENTA = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(select(Remision).where(Remision.numero_remision == "REM-20260101-0001"))
+    finally:
+        perfilador.UMBRAL_CONSULTA_LENTA = umbral
+        logging.getLogger(perfilador.__name__).removeHandler(manejador)
+    mensajes = [registro.getMessage() for registro in registros]
+    if not any("Consulta lenta" in m and "USING INDEX" in m for m in mensajes):
+        errores.append(f"La consulta lenta no se registró con su plan: {mensajes}")
+
+    await close_engines()
+
+    for error in errores:
+        logger.error(error)
+    if errores:
+        sys.exit(1)
+    logger.info(f"{len(cubiertos)} endpoints dentro de su presupuesto de consultas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verificación de presupuestos de consultas por endpoint")
+    parser.add_argument("--mostrar", action="store_true", help="Mostrar las consultas de cada endpoint")
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args.mostrar))
@@ -0,0 +1,207 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .metricas import registro, Contador, Indicador
+
+# Cachés de lectura en memoria (LRU con TTL) para datos que se leen mucho y
+# cambian poco: filas de productos, suministros y residentes por id, y
+# páginas del catálogo por forma de consulta. Cada worker tiene las suyas.
+#
+# Invalidación, siempre al confirmar la transacción (antes de confirmar, otra
+# petición podría volver a guardar el valor viejo):
+# - Los eventos after_insert/after_update/after_delete del ORM anotan la fila
+#   modificada; las cachés por entidad descartan solo esa clave.
+# - Los INSERT/UPDATE/DELETE ejecutados con session.execute no pasan por
+#   esos eventos. Si la sentencia declara las filas que toca con
+#   .execution_options(entidades_modificadas=[...]) se descartan esas; si no,
+#   se vacían las cachés de la tabla.
+# - Las cachés por forma de consulta se vacían ante cualquier cambio en sus
+#   tablas.
+# Las escrituras hechas fuera de una Session (otro proceso, scripts con SQL
+# directo) solo se ven al vencer el TTL, salvo en las peticiones
+# condicionales: condicional() deja en la sesión la versión de las tablas
+# (versiones_tablas, que mantienen triggers) y cada entrada guarda la
+# versión con la que se leyó; una entrada de otra versión no se usa, así el
+# cuerpo corresponde al ETag. Las sesiones de escritura no usan la caché:
+# las verificaciones previas a una escritura (que exista el residente, el
+# producto o los suministros) leen la base bajo el bloqueo de BEGIN IMMEDIATE.
+TTL_CACHE = float(os.getenv("APS_CACHE_TTL", 300))
+MAXIMO_CACHE = int(os.getenv("APS_CACHE_MAXIMO", 2000))
+
+aciertos = registro.registrar(Contador(
+    "aps_cache_aciertos_total", "Lecturas atendidas desde la caché", ("cache",)))
+fallos = registro.registrar(Contador(
+    "aps_cache_fallos_total", "Lecturas que tuvieron que ir a la base de datos", ("cache",)))
+desalojos = registro.registrar(Contador(
+    "aps_cache_desalojos_total", "Entradas descartadas por tamaño (LRU)", ("cache",)))
+invalidaciones = registro.registrar(Contador(
+    "aps_cache_invalidaciones_total", "Entradas descartadas por cambios confirmados", ("cache",)))
+entradas = registro.registrar(Indicador(
+    "aps_cache_entradas", "Entradas guardadas en la caché", ("cache",)))
+
+AUSENTE = object()
+
+class CacheLectura:
+    def __init__(self, nombre: str, tablas: Set[str], por_entidad: bool = False,
+                 maximo: int = MAXIMO_CACHE, ttl: float = TTL_CACHE):
+        self.nombre = nombre
+        self.tablas = set(tablas)
+        # Por entidad: la clave es el id de la fila de la única tabla
+        self.por_entidad = por_entidad
+        self.maximo = maximo
+        self.ttl = ttl
+        # clave -> (valor, vence, versión de las tablas o None)
+        self._entradas: "OrderedDict[Hashable, Tuple[Any, float, Optional[tuple]]]" = OrderedDict()
+        # Se incrementa en cada invalidación: un valor leído mientras tanto
+        # puede estar viejo y no se guarda
+        self.generacion = 0
+
+    def buscar(self, clave: Hashable, version: Optional[tuple] = None) -> Any:
+        # Devuelve el valor guardado o AUSENTE; cuenta el acierto o el fallo.
+        # Con versión, una entrada leída con otra versión se descarta
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada[1] > time.monotonic() and version in (None, entrada[2]):
+            self._entradas.move_to_end(clave)
+            aciertos.incrementar(cache=self.nombre)
+            return entrada[0]
+        if entrada is not None:
+            del self._entradas[clave]
+            entradas.sumar(-1, cache=self.nombre)
+        fallos.incrementar(cache=self.nombre)
+        return AUSENTE
+
+    def guardar(self, clave: Hashable, valor: Any, generacion: int, version: Optional[tuple] = None) -> None:
+        if generacion != self.generacion:
+            return
+        if clave not in self._entradas:
+            entradas.sumar(1, cache=self.nombre)
+        self._entradas[clave] = (valor, time.monotonic() + self.ttl, version)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.maximo:
+            self._entradas.popitem(last=False)
+            entradas.sumar(-1, cache=self.nombre)
+            desalojos.incrementar(cache=self.nombre)
+
+    async def obtener(self, db, clave: Hashable, cargar: Callable[[], Awaitable[Any]]) -> Any:
+        # Lectura a través de la caché. Una sesión de escritura, o con cambios
+        # sin confirmar en las tablas de la caché, lee directo: vería datos que
+        # la caché no tiene y no debe guardar datos que podrían deshacerse.
+        if not self.aplica(db):
+            return await cargar()
+        version = self.version(db)
+        valor = self.buscar(clave, version)
+        if valor is AUSENTE:
+            generacion = self.generacion
+            valor = await cargar()
+            self.guardar(clave, valor, generacion, version)
+        return valor
+
+    def version(self, db) -> Optional[tuple]:
+        # Versión de las tablas de la caché que condicional() leyó en esta
+        # sesión; None si la petición no es condicional
+        sesion = getattr(db, "sync_session", db)
+        versiones = sesion.info.get("versiones_tablas", {})
+        if not self.tablas <= versiones.keys():
+            return None
+        return tuple(versiones[tabla] for tabla in sorted(self.tablas))
+
+    def aplica(self, db) -> bool:
+        sesion = getattr(db, "sync_session", db)
+        if sesion.info.get("escritura"):
+            return False
+        pendientes = sesion.info.get("cache_entidades", {}).keys() | sesion.info.get("cache_tablas", set())
+        return not (pendientes & self.tablas)
+
+    def invalidar(self, claves: Optional[Iterable[Hashable]] = None) -> None:
+        self.generacion += 1
+        if claves is None:
+            descartadas = len(self._entradas)
+            self._entradas.clear()
+        else:
+            descartadas = sum(1 for clave in claves if self._entradas.pop(clave, None) is not None)
+        if descartadas:
+            entradas.sumar(-descartadas, cache=self.nombre)
+            invalidaciones.incrementar(descartadas, cache=self.nombre)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total_aciertos = aciertos.valor(cache=self.nombre)
+        total_fallos = fallos.valor(cache=self.nombre)
+        lecturas = total_aciertos + total_fallos
+        return {
+            "entradas": len(self._entradas),
+            "maximo": self.maximo,
+            "ttl": self.ttl,
+            "aciertos": int(total_aciertos),
+            "fallos": int(total_fallos),
+            "tasa_aciertos": round(total_aciertos / lecturas, 3) if lecturas else None,
+            "desalojos": int(desalojos.valor(cache=self.nombre)),
+            "invalidaciones": int(invalidaciones.valor(cache=self.nombre)),
+        }
+
+caches: Dict[str, CacheLectura] = {}
+
+def registrar_cache(cache: CacheLectura) -> CacheLectura:
+    caches[cache.nombre] = cache
+    return cache
+
+def estadisticas() -> Dict[str, Dict[str, Any]]:
+    return {nombre: cache.estadisticas() for nombre, cache in caches.items()}
+
+def _tablas_en_cache() -> Set[str]:
+    return set().union(*(cache.tablas for cache in caches.values())) if caches else set()
+
+# Cambios pendientes por sesión: {tabla: ids} y tablas modificadas sin ids
+def _entidades_pendientes(session: Session) -> Dict[str, Set[Any]]:
+    return session.info.setdefault("cache_entidades", {})
+
+def _anotar_entidad(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _entidades_pendientes(session).setdefault(mapper.local_table.name, set()).add(target.id)
+
+def invalidar_al_modificar(modelo) -> None:
+    # Las filas del modelo que cambie el ORM se descartan de las cachés al confirmar
+    for evento in ("after_insert", "after_update", "after_delete"):
+        event.listen(modelo, evento, _anotar_entidad)
+
+@event.listens_for(Session, "do_orm_execute")
+def _anotar_sentencia(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    nombre = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+    if nombre not in _tablas_en_cache():
+        return
+    ids = orm_execute_state.execution_options.get("entidades_modificadas")
+    if ids is not None:
+        _entidades_pendientes(orm_execute_state.session).setdefault(nombre, set()).update(ids)
+    else:
+        orm_execute_state.session.info.setdefault("cache_tablas", set()).add(nombre)
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_confirmados(session):
+    entidades = session.info.pop("cache_entidades", {})
+    tablas = session.info.pop("cache_tablas", set())
+    if not entidades and not tablas:
+        return
+    for cache in caches.values():
+        if cache.tablas & tablas:
+            cache.invalidar()
+        elif cache.por_entidad:
+            ids = set().union(*(entidades.get(tabla, set()) for tabla in cache.tablas))
+            if ids:
+                cache.invalidar(ids)
+        elif cache.tablas & entidades.keys():
+            cache.invalidar()
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    # Al deshacer un SAVEPOINT la transacción sigue y lo anotado antes se conserva
+    if session.in_nested_transaction():
+        return
+    session.info.pop("cache_entidades", None)
+    session.info.pop("cache_tablas", None)
@@ -0,0 +1,52 @@
+from typing import Callable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Notificación de cambios confirmados por tabla. Los servicios que guardan
+# datos derivados en memoria (indicadores, cachés) se suscriben aquí y
+# reciben, tras cada COMMIT, los nombres de las tablas modificadas.
+#
+# Se detectan tanto los cambios de la unidad de trabajo del ORM (add,
+# asignaciones, delete) como los INSERT/UPDATE/DELETE ejecutados con
+# session.execute (por ejemplo el UPDATE condicional del libro de
+# existencias). Las escrituras hechas fuera de una Session no se ven.
+
+_suscriptores: List[Callable[[Set[str]], None]] = []
+
+def al_confirmar(funcion: Callable[[Set[str]], None]) -> Callable[[Set[str]], None]:
+    _suscriptores.append(funcion)
+    return funcion
+
+def notificar(tablas: Set[str]) -> None:
+    for funcion in _suscriptores:
+        funcion(tablas)
+
+def _pendientes(session: Session) -> Set[str]:
+    return session.info.setdefault("tablas_modificadas", set())
+
+@event.listens_for(Session, "after_flush")
+def _registrar_flush(session, flush_context):
+    tablas = _pendientes(session)
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        tabla = getattr(objeto, "__tablename__", None)
+        if tabla:
+            tablas.add(tabla)
+
+@event.listens_for(Session, "do_orm_execute")
+def _registrar_sentencia(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tabla = getattr(orm_execute_state.statement, "table", None)
+        nombre = getattr(tabla, "name", None)
+        if nombre:
+            _pendientes(orm_execute_state.session).add(nombre)
+
+@event.listens_for(Session, "after_commit")
+def _confirmar(session):
+    tablas = session.info.pop("tablas_modificadas", None)
+    if tablas:
+        notificar(tablas)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop("tablas_modificadas", None)
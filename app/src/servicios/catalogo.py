@@ -0,0 +1,64 @@
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Row
+from sqlalchemy.future import select
+
+from ..models.inventario import Producto, Suministro
+from ..models.residentes import Residente
+from .cache import CacheLectura, AUSENTE, registrar_cache, invalidar_al_modificar
+
+# Lecturas por id de productos, suministros y residentes a través de la
+# caché (ver servicios/cache.py). Se guardan filas (Row) inmutables con las
+# columnas de la tabla, no objetos del ORM ligados a una sesión; un id
+# inexistente también se guarda (None) hasta que se inserte esa fila.
+cache_productos = registrar_cache(CacheLectura("productos", {"productos"}, por_entidad=True))
+cache_suministros = registrar_cache(CacheLectura("suministros", {"suministros"}, por_entidad=True))
+cache_residentes = registrar_cache(CacheLectura("residentes", {"residentes"}, por_entidad=True))
+# Páginas de GET /inventario/productos/ por combinación de filtros
+cache_catalogo = registrar_cache(CacheLectura("catalogo", {"productos"}, maximo=200))
+
+for _modelo in (Producto, Suministro, Residente):
+    invalidar_al_modificar(_modelo)
+
+def columnas(modelo):
+    return select(*modelo.__table__.c)
+
+async def _por_id(db, cache: CacheLectura, modelo, id: int) -> Optional[Row]:
+    async def cargar():
+        return (await db.execute(columnas(modelo).where(modelo.id == id))).one_or_none()
+    return await cache.obtener(db, id, cargar)
+
+async def producto_por_id(db, producto_id: int) -> Optional[Row]:
+    return await _por_id(db, cache_productos, Producto, producto_id)
+
+async def suministro_por_id(db, suministro_id: int) -> Optional[Row]:
+    return await _por_id(db, cache_suministros, Suministro, suministro_id)
+
+async def residente_por_id(db, residente_id: int) -> Optional[Row]:
+    return await _por_id(db, cache_residentes, Residente, residente_id)
+
+async def suministros_por_id(db, ids: Iterable[int]) -> Dict[int, Row]:
+    # Varios suministros: los que no están en caché se leen en una sola consulta.
+    # Los ids inexistentes no aparecen en el resultado.
+    ids = set(ids)
+    if not cache_suministros.aplica(db):
+        result = await db.execute(columnas(Suministro).where(Suministro.id.in_(ids)))
+        return {fila.id: fila for fila in result}
+
+    encontrados = {}
+    faltantes = set()
+    version = cache_suministros.version(db)
+    for suministro_id in ids:
+        valor = cache_suministros.buscar(suministro_id, version)
+        if valor is AUSENTE:
+            faltantes.add(suministro_id)
+        elif valor is not None:
+            encontrados[suministro_id] = valor
+    if faltantes:
+        generacion = cache_suministros.generacion
+        result = await db.execute(columnas(Suministro).where(Suministro.id.in_(faltantes)))
+        leidos = {fila.id: fila for fila in result}
+        for suministro_id in faltantes:
+            cache_suministros.guardar(suministro_id, leidos.get(suministro_id), generacion, version)
+        encontrados.update(leidos)
+    return encontrados
@@ -0,0 +1,138 @@
+import zlib
+from typing import Dict
+
+try:
+    import brotli
+except ImportError:  # br es opcional: sin el paquete brotli solo se usa gzip
+    brotli = None
+
+# Compresión gzip/br de las respuestas como middleware ASGI puro: comprime
+# trozo por trozo, así que las exportaciones en flujo no se cargan en
+# memoria. No se comprimen:
+# - los eventos del servidor (text/event-stream): el compresor retendría
+#   los eventos hasta juntar un bloque y dejarían de llegar en vivo;
+# - las respuestas que ya traen Content-Encoding (archivos precomprimidos);
+# - los formatos ya comprimidos (XLSX, imágenes) y las respuestas pequeñas.
+MINIMO_BYTES = 1024
+NIVEL_GZIP = 6
+# Calidad de br para contenido dinámico: las altas son demasiado lentas
+CALIDAD_BROTLI = 4
+
+TIPOS_COMPRIMIBLES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+TIPOS_EXCLUIDOS = ("text/event-stream",)
+
+def codificaciones_aceptadas(aceptadas: str) -> Dict[str, float]:
+    # Accept-Encoding -> {codificación: calidad}
+    codificaciones = {}
+    for parte in aceptadas.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        codificaciones[nombre.strip()] = calidad
+    return codificaciones
+
+def _elegir_codificacion(aceptadas: str):
+    codificaciones = codificaciones_aceptadas(aceptadas)
+    if brotli is not None and codificaciones.get("br", 0) > 0:
+        return "br"
+    if codificaciones.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class _Gzip:
+    def __init__(self):
+        self._compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.compress(datos)
+
+    def terminar(self) -> bytes:
+        return self._compresor.flush()
+
+class _Brotli:
+    def __init__(self):
+        self._compresor = brotli.Compressor(quality=CALIDAD_BROTLI)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.process(datos)
+
+    def terminar(self) -> bytes:
+        return self._compresor.finish()
+
+COMPRESORES = {"gzip": _Gzip, "br": _Brotli}
+
+class MiddlewareCompresion:
+    def __init__(self, app, minimo: int = MINIMO_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        aceptadas = b", ".join(valor for nombre, valor in scope["headers"] if nombre == b"accept-encoding")
+        codificacion = _elegir_codificacion(aceptadas.decode("latin-1"))
+
+        inicio = None
+        compresor = None
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor
+            if mensaje["type"] == "http.response.start":
+                # Se retiene hasta ver el primer trozo del cuerpo
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+            if inicio is None:
+                # Trozos siguientes: los encabezados ya se enviaron
+                if compresor is not None:
+                    cuerpo = compresor.comprimir(cuerpo) + (b"" if mas else compresor.terminar())
+                await send({"type": "http.response.body", "body": cuerpo, "more_body": mas})
+                return
+
+            encabezados = list(inicio.get("headers", []))
+            comprimible = self._comprimible(inicio["status"], encabezados)
+            if comprimible:
+                encabezados = [(n, v) for n, v in encabezados if n != b"vary"] + [(b"vary", self._vary(encabezados))]
+            if comprimible and codificacion and (mas or len(cuerpo) >= self.minimo):
+                compresor = COMPRESORES[codificacion]()
+                encabezados = [(n, v) for n, v in encabezados if n != b"content-length"]
+                encabezados.append((b"content-encoding", codificacion.encode("latin-1")))
+                cuerpo = compresor.comprimir(cuerpo) + (b"" if mas else compresor.terminar())
+                if not mas:
+                    encabezados.append((b"content-length", str(len(cuerpo)).encode("latin-1")))
+            await send({"type": "http.response.start", "status": inicio["status"], "headers": encabezados})
+            inicio = None
+            await send({"type": "http.response.body", "body": cuerpo, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
+
+    @staticmethod
+    def _comprimible(estado: int, encabezados) -> bool:
+        if estado < 200 or estado in (204, 304):
+            return False
+        tipo = b""
+        for nombre, valor in encabezados:
+            if nombre == b"content-encoding":
+                return False
+            if nombre == b"content-type":
+                tipo = valor
+        tipo = tipo.decode("latin-1").lower()
+        return tipo.startswith(TIPOS_COMPRIMIBLES) and not tipo.startswith(TIPOS_EXCLUIDOS)
+
+    @staticmethod
+    def _vary(encabezados) -> bytes:
+        valores = [v.decode("latin-1") for n, v in encabezados if n == b"vary"]
+        campos = [campo.strip() for valor in valores for campo in valor.split(",") if campo.strip()]
+        if not any(campo.lower() == "accept-encoding" for campo in campos):
+            campos.append("Accept-Encoding")
+        return ", ".join(campos).encode("latin-1")
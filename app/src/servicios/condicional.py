@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models.database import get_db_async
+from ..models.versiones import VersionTabla, TABLAS_VERSIONADAS
+
+# Peticiones condicionales (If-None-Match / If-Modified-Since) para los
+# listados y detalles que las tabletas de las estaciones consultan una y
+# otra vez. Los validadores salen de versiones_tablas (una consulta por
+# clave primaria): el ETag es la versión de las tablas de las que depende la
+# respuesta y Last-Modified su último cambio. Si el cliente ya tiene esa
+# versión se responde 304 antes de ejecutar el endpoint, sin leer ni
+# serializar los datos.
+#
+# La versión se lee en la misma sesión (y transacción de lectura) que usa el
+# endpoint, así que el ETag corresponde a los datos devueltos. Queda además
+# en db.info["versiones_tablas"]: las cachés de lectura no sirven entradas
+# leídas con otra versión (servicios/cache.py). El ETag es débil: la
+# respuesta es la misma con o sin compresión.
+#
+#   @router.get("/productos/", dependencies=[Depends(condicional("productos"))])
+
+class NoModificado(Exception):
+    def __init__(self, encabezados: Dict[str, str]):
+        self.encabezados = encabezados
+
+async def responder_no_modificado(request: Request, exc: NoModificado):
+    return Response(status_code=304, headers=exc.encabezados)
+
+def _sin_debil(etiqueta: str) -> str:
+    # If-None-Match usa la comparación débil: W/"x" coincide con "x"
+    # (sin str.removeprefix, que no existe en Python 3.8)
+    return etiqueta[2:] if etiqueta.startswith("W/") else etiqueta
+
+def _etiquetas(valor: str) -> List[str]:
+    return [_sin_debil(etiqueta.strip()) for etiqueta in valor.split(",") if etiqueta.strip()]
+
+def _no_modificado(request: Request, etag: str, modificado: datetime) -> bool:
+    # If-None-Match tiene precedencia; If-Modified-Since solo se evalúa sin él
+    si_no_coincide = request.headers.get("if-none-match")
+    if si_no_coincide is not None:
+        # "*" no se atiende: antes del endpoint no se sabe si el recurso existe
+        return _sin_debil(etag) in _etiquetas(si_no_coincide)
+    si_modificado = request.headers.get("if-modified-since")
+    if si_modificado:
+        try:
+            fecha = parsedate_to_datetime(si_modificado)
+        except (TypeError, ValueError):
+            return False
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        # Last-Modified tiene resolución de segundos: dos cambios en el mismo
+        # segundo solo los distingue el ETag, que los navegadores prefieren
+        return modificado.replace(microsecond=0) <= fecha
+    return False
+
+def condicional(*tablas: str):
+    desconocidas = set(tablas) - set(TABLAS_VERSIONADAS)
+    if desconocidas:
+        raise ValueError(f"Tablas sin versión: {', '.join(sorted(desconocidas))}")
+
+    async def validar(request: Request, response: Response, db: AsyncSession = Depends(get_db_async)):
+        result = await db.execute(
+            select(VersionTabla.tabla, VersionTabla.version, VersionTabla.actualizado)
+            .where(VersionTabla.tabla.in_(tablas))
+        )
+        versiones = {fila.tabla: fila for fila in result}
+        db.info.setdefault("versiones_tablas", {}).update(
+            (tabla, fila.version) for tabla, fila in versiones.items()
+        )
+        etag = 'W/"' + "-".join(f"{versiones[tabla].version}" for tabla in tablas) + '"'
+        modificado = datetime.fromtimestamp(max(fila.actualizado for fila in versiones.values()), timezone.utc)
+        encabezados = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(modificado.replace(microsecond=0), usegmt=True),
+            # El cliente puede guardar la respuesta pero debe revalidarla siempre
+            "Cache-Control": "no-cache",
+        }
+        if request.method in ("GET", "HEAD") and _no_modificado(request, etag, modificado):
+            raise NoModificado(encabezados)
+        response.headers.update(encabezados)
+
+    return validar
@@ -0,0 +1,55 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from ..models.colaboradores import (
+    hashear_contrasena,
+    verificar_hash,
+    ALGORITMO_HASH,
+    ITERACIONES_PBKDF2,
+)
+
+logger = logging.getLogger(__name__)
+
+# PBKDF2 tarda decenas de milisegundos de CPU; hashlib libera el GIL durante
+# el cálculo, así que un pool de hilos pequeño lo saca del bucle de eventos.
+HILOS_HASH = int(os.getenv("APS_HILOS_HASH", 2))
+# Máximo de verificaciones aceptadas a la vez (en ejecución + en espera).
+# Por encima de este número se rechaza el intento en lugar de encolarlo.
+MAXIMO_HASH_PENDIENTES = int(os.getenv("APS_MAXIMO_HASH_PENDIENTES", 16))
+
+# Hash de relleno: se verifica contra él cuando el usuario no existe para
+# que la respuesta tarde lo mismo y no revele qué correos están registrados
+HASH_RELLENO = f"{ALGORITMO_HASH}${ITERACIONES_PBKDF2}${'0' * 32}${'0' * 64}"
+
+class HashSaturado(Exception):
+    pass
+
+class _PoolHash:
+    def __init__(self, hilos: int, maximo_pendientes: int):
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="pbkdf2")
+        self._maximo = maximo_pendientes
+        self._pendientes = 0
+
+    async def ejecutar(self, funcion, *args):
+        if self._pendientes >= self._maximo:
+            raise HashSaturado("Demasiadas verificaciones de contraseña en curso")
+        self._pendientes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._ejecutor, funcion, *args)
+        finally:
+            self._pendientes -= 1
+
+    @property
+    def pendientes(self) -> int:
+        return self._pendientes
+
+pool_hash = _PoolHash(HILOS_HASH, MAXIMO_HASH_PENDIENTES)
+
+async def verificar_contrasena(contrasena: str, hash_guardado: str) -> bool:
+    return await pool_hash.ejecutar(verificar_hash, contrasena, hash_guardado)
+
+async def hashear_contrasena_async(contrasena: str) -> str:
+    return await pool_hash.ejecutar(hashear_contrasena, contrasena)
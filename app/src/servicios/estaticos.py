@@ -0,0 +1,87 @@
+import os
+import json
+import mimetypes
+from pathlib import Path
+from typing import Dict, Optional
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+
+from .compresion import codificaciones_aceptadas
+
+# Archivos estáticos con huella de contenido. scripts/construir_estaticos.py
+# compila el CSS con Tailwind, copia cada archivo a static/dist/ con el hash
+# de su contenido en el nombre (css/styles.3f9a0c1e.css), deja al lado las
+# variantes precomprimidas .br y .gz y escribe dist/manifest.json con
+# {ruta original: ruta con hash}.
+#
+# Como el nombre cambia con el contenido, los archivos de dist/ se sirven con
+# Cache-Control: immutable y el navegador no los vuelve a pedir ni a
+# revalidar hasta el siguiente despliegue. En las plantillas:
+#
+#   <link href="{{ asset('css/styles.css') }}" rel="stylesheet">
+#
+# Sin construir (desarrollo) asset() devuelve la ruta original, que se sirve
+# con Cache-Control: no-cache.
+DIRECTORIO_ESTATICOS = Path(__file__).resolve().parent.parent / "static"
+DIRECTORIO_DIST = "dist"
+MANIFIESTO = DIRECTORIO_ESTATICOS / DIRECTORIO_DIST / "manifest.json"
+PREFIJO_URL = "/static"
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+# Variantes precomprimidas en orden de preferencia: codificación -> sufijo
+VARIANTES = {"br": ".br", "gzip": ".gz"}
+
+_manifiesto: Dict[str, str] = {}
+_manifiesto_mtime: Optional[float] = None
+
+def cargar_manifiesto() -> Dict[str, str]:
+    # Se vuelve a leer solo si el archivo cambió (una nueva construcción)
+    global _manifiesto, _manifiesto_mtime
+    try:
+        mtime = MANIFIESTO.stat().st_mtime
+    except FileNotFoundError:
+        _manifiesto, _manifiesto_mtime = {}, None
+        return _manifiesto
+    if mtime != _manifiesto_mtime:
+        _manifiesto = json.loads(MANIFIESTO.read_text(encoding="utf-8"))
+        _manifiesto_mtime = mtime
+    return _manifiesto
+
+def asset(ruta: str) -> str:
+    construido = cargar_manifiesto().get(ruta)
+    if construido is None:
+        return f"{PREFIJO_URL}/{ruta}"
+    return f"{PREFIJO_URL}/{DIRECTORIO_DIST}/{construido}"
+
+class EstaticosInmutables(StaticFiles):
+    async def get_response(self, path: str, scope):
+        if not path.startswith(DIRECTORIO_DIST + "/"):
+            respuesta = await super().get_response(path, scope)
+            respuesta.headers["Cache-Control"] = CACHE_REVALIDAR
+            return respuesta
+
+        aceptadas = b", ".join(valor for nombre, valor in scope["headers"] if nombre == b"accept-encoding")
+        calidades = codificaciones_aceptadas(aceptadas.decode("latin-1"))
+        codificacion = None
+        for nombre, sufijo in VARIANTES.items():
+            if calidades.get(nombre, 0) > 0:
+                _, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + sufijo)
+                if stat_result is not None:
+                    codificacion = nombre
+                    break
+
+        if codificacion is None:
+            respuesta = await super().get_response(path, scope)
+        else:
+            respuesta = await super().get_response(path + VARIANTES[codificacion], scope)
+            if respuesta.status_code == 200:
+                tipo, _ = mimetypes.guess_type(path)
+                if tipo:
+                    respuesta.headers["Content-Type"] = tipo + ("; charset=utf-8" if tipo.startswith("text/") else "")
+                respuesta.headers["Content-Encoding"] = codificacion
+        respuesta.headers["Cache-Control"] = CACHE_INMUTABLE
+        respuesta.headers["Vary"] = "Accept-Encoding"
+        return respuesta
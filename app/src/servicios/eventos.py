@@ -0,0 +1,121 @@
+import os
+import json
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# Bus de eventos en memoria para el seguimiento de remisiones en vivo.
+# Los endpoints de escritura publican después del COMMIT; las conexiones
+# SSE de las estaciones de enfermería se suscriben y reciben los eventos
+# sin consultar la base de datos.
+#
+# - Cada evento lleva un id creciente y se guarda en un historial circular,
+#   de modo que un cliente que se reconecta con Last-Event-ID recibe lo que
+#   se perdió mientras estuvo desconectado.
+# - Publicar nunca espera a los suscriptores: cada uno tiene una cola
+#   acotada y, si se llena (cliente lento), la suscripción se marca como
+#   desbordada y se cierra. El navegador se reconecta y se pone al día
+#   desde el historial.
+# - El bus es por proceso: con varios workers cada uno tiene el suyo.
+CAPACIDAD_HISTORIAL = int(os.getenv("APS_EVENTOS_HISTORIAL", 1000))
+CAPACIDAD_SUSCRIPCION = int(os.getenv("APS_EVENTOS_PENDIENTES", 100))
+
+Evento = Tuple[int, str, int, Dict[str, Any]]  # (id, tipo, remision_id, datos)
+
+class Suscripcion:
+    def __init__(self, remision_id: Optional[int], capacidad: int):
+        self.remision_id = remision_id
+        self.capacidad = capacidad
+        self.desbordada = False
+        self.cerrada = False
+        self._pendientes: Deque[Evento] = deque()
+        self._aviso = asyncio.Event()
+
+    def acepta(self, evento: Evento) -> bool:
+        return self.remision_id is None or self.remision_id == evento[2]
+
+    def entregar(self, evento: Evento) -> None:
+        if self.desbordada or self.cerrada:
+            return
+        if len(self._pendientes) >= self.capacidad:
+            self.desbordada = True
+            self._pendientes.clear()
+        else:
+            self._pendientes.append(evento)
+        self._aviso.set()
+
+    def cerrar(self) -> None:
+        self.cerrada = True
+        self._aviso.set()
+
+    async def esperar(self, timeout: float) -> List[Evento]:
+        # Devuelve los eventos pendientes, o una lista vacía si vence el
+        # timeout (momento de enviar un latido)
+        if not self._pendientes and not self.desbordada and not self.cerrada:
+            try:
+                await asyncio.wait_for(self._aviso.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._aviso.clear()
+        eventos = list(self._pendientes)
+        self._pendientes.clear()
+        return eventos
+
+class BusEventos:
+    def __init__(self, capacidad_historial: int = CAPACIDAD_HISTORIAL,
+                 capacidad_suscripcion: int = CAPACIDAD_SUSCRIPCION):
+        self.capacidad_suscripcion = capacidad_suscripcion
+        self._ultimo_id = 0
+        self._historial: Deque[Evento] = deque(maxlen=capacidad_historial)
+        self._suscripciones: Set[Suscripcion] = set()
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    @property
+    def suscriptores(self) -> int:
+        return len(self._suscripciones)
+
+    def publicar(self, tipo: str, remision_id: int, datos: Dict[str, Any]) -> Evento:
+        self._ultimo_id += 1
+        evento = (self._ultimo_id, tipo, remision_id, datos)
+        self._historial.append(evento)
+        for suscripcion in list(self._suscripciones):
+            if suscripcion.acepta(evento):
+                suscripcion.entregar(evento)
+                if suscripcion.desbordada:
+                    self._suscripciones.discard(suscripcion)
+        return evento
+
+    def suscribir(self, remision_id: Optional[int] = None,
+                  ultimo_id: Optional[int] = None) -> Tuple[Suscripcion, Optional[List[Evento]]]:
+        # Devuelve la suscripción y los eventos posteriores a ultimo_id.
+        # Si ultimo_id ya salió del historial (o es de otro proceso), los
+        # eventos son None: el cliente debe recargar el estado completo.
+        suscripcion = Suscripcion(remision_id, self.capacidad_suscripcion)
+        self._suscripciones.add(suscripcion)
+
+        if ultimo_id is None:
+            return suscripcion, []
+        primero = self._historial[0][0] if self._historial else self._ultimo_id + 1
+        if ultimo_id > self._ultimo_id or ultimo_id < primero - 1:
+            return suscripcion, None
+        perdidos = [e for e in self._historial if e[0] > ultimo_id and suscripcion.acepta(e)]
+        return suscripcion, perdidos
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        self._suscripciones.discard(suscripcion)
+
+    def cerrar(self) -> None:
+        # Al apagar la aplicación se terminan los flujos abiertos
+        for suscripcion in list(self._suscripciones):
+            suscripcion.cerrar()
+        self._suscripciones.clear()
+
+def formatear_evento(evento: Evento) -> str:
+    identificador, tipo, remision_id, datos = evento
+    cuerpo = json.dumps({"remision_id": remision_id, **datos}, default=str, ensure_ascii=False)
+    return f"id: {identificador}\nevent: {tipo}\ndata: {cuerpo}\n\n"
+
+bus_remisiones = BusEventos()
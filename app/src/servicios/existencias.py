@@ -0,0 +1,187 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update, insert, case, func, bindparam
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.inventario import Producto, MovimientoInventario, CantidadExacta
+
+# Libro de existencias: cada movimiento se aplica al stock con un único
+# UPDATE condicional, de modo que dos salidas simultáneas no pueden leer el
+# mismo stock y sobrescribirse, ni dejarlo en negativo.
+
+class ErrorExistencias(Exception):
+    pass
+
+class ProductoNoEncontrado(ErrorExistencias):
+    pass
+
+class StockInsuficiente(ErrorExistencias):
+    pass
+
+def validar_cantidad(cantidad: Decimal) -> Decimal:
+    # Toda cantidad que llega al libro: positiva y con la precisión de
+    # CantidadExacta (milésimas)
+    if cantidad <= 0:
+        raise ValueError('La cantidad debe ser mayor que cero')
+    if cantidad.as_tuple().exponent < -3:
+        raise ValueError('La cantidad admite como máximo tres decimales')
+    return cantidad
+
+def delta_movimiento(tipo_movimiento: str, cantidad: Decimal) -> Decimal:
+    return cantidad if tipo_movimiento == "entrada" else -cantidad
+
+async def aplicar_delta(db: AsyncSession, producto_id: int, delta: Decimal) -> Decimal:
+    # Suma `delta` al stock si el resultado no queda negativo y devuelve el
+    # nuevo stock. La condición y la escritura ocurren en la misma sentencia.
+    sentencia = (
+        update(Producto)
+        .where(Producto.id == producto_id)
+        .values(stock_actual=Producto.stock_actual + delta)
+        .returning(Producto.stock_actual)
+        .execution_options(synchronize_session=False, entidades_modificadas=[producto_id])
+    )
+    if delta < 0:
+        sentencia = sentencia.where(Producto.stock_actual + delta >= 0)
+
+    nuevo_stock = (await db.execute(sentencia)).scalar_one_or_none()
+    if nuevo_stock is None:
+        existe = await db.scalar(select(Producto.id).where(Producto.id == producto_id))
+        if existe is None:
+            raise ProductoNoEncontrado(f"Producto {producto_id} no encontrado")
+        raise StockInsuficiente(f"Stock insuficiente para el producto {producto_id}")
+    return nuevo_stock
+
+async def aplicar_movimiento(db: AsyncSession, datos: dict) -> MovimientoInventario:
+    # Aplica el movimiento y lo registra en la misma transacción; el commit
+    # queda a cargo de quien llama
+    await aplicar_delta(db, datos["producto_id"], delta_movimiento(datos["tipo_movimiento"], datos["cantidad"]))
+    movimiento = MovimientoInventario(**datos)
+    db.add(movimiento)
+    await db.flush()
+    return movimiento
+
+# Resultado de una fila del lote: (fila, estado, producto_id, errores)
+ResultadoFila = Tuple[int, str, Optional[int], List[str]]
+
+async def aplicar_lote(
+    db: AsyncSession,
+    movimientos: List[Tuple[int, dict]],
+    atomico: bool = False
+) -> List[ResultadoFila]:
+    # Aplica un lote de movimientos ya validados ((fila, datos) por elemento)
+    # con un número fijo de sentencias: una lectura de stock, un UPDATE en
+    # executemany y un INSERT en executemany. El lote se evalúa por saldo
+    # neto de cada producto; si un producto quedaría en negativo se rechazan
+    # todas sus filas. Con atomico=True cualquier rechazo cancela el lote.
+    # Debe ejecutarse en la sesión de escritura: BEGIN IMMEDIATE impide que
+    # otro proceso cambie el stock entre la lectura y la escritura.
+    deltas: Dict[int, Decimal] = defaultdict(Decimal)
+    for _, datos in movimientos:
+        deltas[datos["producto_id"]] += delta_movimiento(datos["tipo_movimiento"], datos["cantidad"])
+
+    result = await db.execute(
+        select(Producto.id, Producto.stock_actual).where(Producto.id.in_(list(deltas)))
+    )
+    stock = {fila.id: fila.stock_actual for fila in result}
+
+    errores_producto: Dict[int, str] = {}
+    for producto_id, delta in deltas.items():
+        if producto_id not in stock:
+            errores_producto[producto_id] = "Producto no encontrado"
+        elif stock[producto_id] + delta < 0:
+            errores_producto[producto_id] = (
+                f"Stock insuficiente: stock {stock[producto_id]}, saldo neto del lote {delta}"
+            )
+
+    if atomico and errores_producto:
+        return [
+            (fila, "rechazado", datos["producto_id"],
+             [errores_producto.get(datos["producto_id"], "Lote cancelado: otras filas fueron rechazadas")])
+            for fila, datos in movimientos
+        ]
+
+    aplicables = [(fila, datos) for fila, datos in movimientos if datos["producto_id"] not in errores_producto]
+    cambios = [
+        {"b_id": producto_id, "b_delta": delta}
+        for producto_id, delta in deltas.items()
+        if producto_id not in errores_producto and delta != 0
+    ]
+
+    if cambios:
+        sentencia = (
+            update(Producto.__table__)
+            .where(Producto.id == bindparam("b_id"))
+            .where(Producto.stock_actual + bindparam("b_delta", type_=CantidadExacta()) >= 0)
+            .values(stock_actual=Producto.stock_actual + bindparam("b_delta", type_=CantidadExacta()))
+            .execution_options(entidades_modificadas=[cambio["b_id"] for cambio in cambios])
+        )
+        actualizados = (await db.execute(sentencia, cambios)).rowcount
+        if actualizados != len(cambios):
+            # No debería ocurrir bajo BEGIN IMMEDIATE; se deshace todo el lote
+            raise StockInsuficiente("El stock cambió durante la aplicación del lote")
+    if aplicables:
+        await db.execute(insert(MovimientoInventario), [datos for _, datos in aplicables])
+
+    return [
+        (fila, "rechazado", datos["producto_id"], [errores_producto[datos["producto_id"]]])
+        if datos["producto_id"] in errores_producto
+        else (fila, "aplicado", datos["producto_id"], [])
+        for fila, datos in movimientos
+    ]
+
+def _saldo_por_producto():
+    # Suma firmada de los movimientos de cada producto
+    return (
+        select(
+            MovimientoInventario.producto_id.label("producto_id"),
+            func.sum(
+                case(
+                    (MovimientoInventario.tipo_movimiento == "entrada", MovimientoInventario.cantidad),
+                    else_=-MovimientoInventario.cantidad,
+                )
+            ).label("saldo"),
+        )
+        .group_by(MovimientoInventario.producto_id)
+        .subquery()
+    )
+
+async def conciliar_existencias(
+    db: AsyncSession,
+    producto_id: Optional[int] = None,
+    corregir: bool = False
+) -> List[dict]:
+    # Compara stock_actual con el saldo de movimientos y devuelve las
+    # diferencias. Con corregir=True ajusta stock_actual al saldo.
+    saldos = _saldo_por_producto()
+    saldo = func.coalesce(saldos.c.saldo, 0, type_=CantidadExacta())
+    query = (
+        select(Producto.id, Producto.codigo, Producto.stock_actual, saldo.label("saldo"))
+        .outerjoin(saldos, saldos.c.producto_id == Producto.id)
+        .where(Producto.stock_actual != saldo)
+        .order_by(Producto.id)
+    )
+    if producto_id is not None:
+        query = query.where(Producto.id == producto_id)
+
+    diferencias = [
+        {
+            "producto_id": fila.id,
+            "codigo": fila.codigo,
+            "stock_actual": fila.stock_actual,
+            "saldo_movimientos": fila.saldo,
+        }
+        for fila in await db.execute(query)
+    ]
+
+    if corregir:
+        for diferencia in diferencias:
+            await db.execute(
+                update(Producto)
+                .where(Producto.id == diferencia["producto_id"])
+                .values(stock_actual=diferencia["saldo_movimientos"])
+                .execution_options(synchronize_session=False)
+            )
+    return diferencias
@@ -0,0 +1,146 @@
+import io
+import re
+import csv
+import enum
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, List, Sequence
+from xml.sax.saxutils import escape
+
+from sqlalchemy.sql import Select
+
+from ..models.database import AsyncSessionLocal
+
+# Exportaciones en streaming. Las filas se leen con un cursor del lado del
+# servidor en particiones de TAMANO_PARTICION y cada partición se convierte
+# en un trozo de la respuesta, de modo que la memoria no depende del número
+# de filas exportadas.
+#
+# El XLSX se arma con zipfile sobre un búfer que se vacía después de cada
+# partición: zipfile admite escribir en un flujo no posicionable y agrega
+# los descriptores de datos al cerrar cada entrada.
+TAMANO_PARTICION = 1000
+
+def _celda(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, enum.Enum):
+        return str(valor.value)
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ", timespec="seconds")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+async def particiones(consulta: Select) -> AsyncIterator[Sequence]:
+    # La sesión vive dentro del generador: la respuesta se sigue enviando
+    # después de que termina el endpoint
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(consulta.execution_options(yield_per=TAMANO_PARTICION))
+        async for particion in result.partitions():
+            yield particion
+
+async def exportar_csv(encabezados: List[str], consulta: Select) -> AsyncIterator[bytes]:
+    # BOM para que Excel abra el archivo como UTF-8
+    yield "\ufeff".encode("utf-8")
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(encabezados)
+    async for particion in particiones(consulta):
+        escritor.writerows([_celda(valor) for valor in fila] for fila in particion)
+        yield salida.getvalue().encode("utf-8")
+        salida.seek(0)
+        salida.truncate()
+    if salida.tell():
+        yield salida.getvalue().encode("utf-8")
+
+class _BuferFlujo(io.RawIOBase):
+    # Destino no posicionable de zipfile; lo escrito se retira con vaciar()
+    def __init__(self):
+        self._datos = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._datos.extend(datos)
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        datos = bytes(self._datos)
+        self._datos.clear()
+        return datos
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def _workbook(hoja: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+# Caracteres de control que XML no admite
+_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _fila_xlsx(valores) -> str:
+    celdas = []
+    for valor in valores:
+        if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+            celdas.append(f"<c><v>{valor}</v></c>")
+        else:
+            texto = escape(_INVALIDOS_XML.sub("", _celda(valor)))
+            celdas.append(f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>')
+    return f"<row>{''.join(celdas)}</row>"
+
+async def exportar_xlsx(hoja: str, encabezados: List[str], consulta: Select) -> AsyncIterator[bytes]:
+    bufer = _BuferFlujo()
+    with zipfile.ZipFile(bufer, "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archivo.writestr("_rels/.rels", _RELS)
+        archivo.writestr("xl/workbook.xml", _workbook(hoja))
+        archivo.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+
+        with archivo.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja_xml:
+            hoja_xml.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                .encode("utf-8")
+            )
+            hoja_xml.write(_fila_xlsx(encabezados).encode("utf-8"))
+            async for particion in particiones(consulta):
+                hoja_xml.write("".join(_fila_xlsx(fila) for fila in particion).encode("utf-8"))
+                datos = bufer.vaciar()
+                if datos:
+                    yield datos
+            hoja_xml.write(b"</sheetData></worksheet>")
+    yield bufer.vaciar()
@@ -0,0 +1,248 @@
+import os
+import uuid
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.database import AsyncSessionEscritura
+from ..models.residentes import Residente
+from ..models.inventario import MovimientoInventario, Suministro
+from ..models.facturacion import Factura, DetalleFactura, EstadoFactura, CorridaFacturacion, EstadoCorrida
+from .programador import programador, tomar_bloqueo, liberar_bloqueo
+
+logger = logging.getLogger(__name__)
+
+# Facturación mensual: para un periodo YYYY-MM genera una factura por cada
+# residente activo con las salidas de inventario que consumió, valuadas al
+# costo del suministro más reciente de cada producto.
+#
+# La corrida avanza por bloques de residentes; cada bloque (facturas,
+# detalles y punto de control) se confirma en su propia transacción. Si el
+# proceso se cae, la corrida se reanuda desde el último bloque confirmado, y
+# el índice único (residente_id, periodo) impide facturar dos veces.
+#
+# Con varios workers, solo uno ejecuta la corrida de un periodo: la reclama
+# con un bloqueo en bloqueos_tareas (como las tareas programadas) que renueva
+# en la transacción de cada bloque. Si el worker muere, otro puede reanudar
+# la corrida cuando el bloqueo vence.
+TAMANO_BLOQUE = int(os.getenv("APS_FACTURACION_BLOQUE", 200))
+DURACION_BLOQUEO = float(os.getenv("APS_FACTURACION_BLOQUEO", 60))
+DIAS_VENCIMIENTO = 30
+CENTAVO = Decimal("0.01")
+
+# Corridas en ejecución en este proceso, por periodo
+_en_ejecucion: Dict[str, asyncio.Task] = {}
+
+class PeriodoInvalido(ValueError):
+    pass
+
+def limites_periodo(periodo: str) -> Tuple[datetime, datetime]:
+    try:
+        inicio = datetime.strptime(periodo, "%Y-%m")
+    except ValueError:
+        raise PeriodoInvalido(f"Periodo inválido: {periodo} (se espera YYYY-MM)")
+    fin = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, fin
+
+def _residentes_facturables():
+    return select(Residente.id).where(Residente.activo.is_(True))
+
+async def _costos_vigentes(db: AsyncSession, productos) -> Dict[int, Tuple[int, Decimal]]:
+    # Suministro más reciente con costo de cada producto: {producto: (suministro, costo)}
+    recientes = (
+        select(func.max(Suministro.id))
+        .where(Suministro.producto_id.in_(productos))
+        .where(Suministro.costo_unitario.isnot(None))
+        .group_by(Suministro.producto_id)
+    )
+    result = await db.execute(
+        select(Suministro.producto_id, Suministro.id, Suministro.costo_unitario)
+        .where(Suministro.id.in_(recientes))
+    )
+    return {fila.producto_id: (fila.id, Decimal(str(fila.costo_unitario))) for fila in result}
+
+async def _procesar_bloque(db: AsyncSession, corrida: CorridaFacturacion, inicio: datetime, fin: datetime) -> bool:
+    # Factura el siguiente bloque de residentes; devuelve False al terminar
+    result = await db.execute(
+        _residentes_facturables()
+        .where(Residente.id > corrida.ultimo_residente_id)
+        .order_by(Residente.id)
+        .limit(TAMANO_BLOQUE)
+    )
+    residentes = result.scalars().all()
+    if not residentes:
+        return False
+
+    # Consumo del periodo por residente y producto
+    result = await db.execute(
+        select(
+            MovimientoInventario.residente_id,
+            MovimientoInventario.producto_id,
+            func.sum(MovimientoInventario.cantidad).label("cantidad"),
+        )
+        .where(MovimientoInventario.residente_id.in_(residentes))
+        .where(MovimientoInventario.tipo_movimiento == "salida")
+        .where(MovimientoInventario.fecha_movimiento >= inicio)
+        .where(MovimientoInventario.fecha_movimiento < fin)
+        .group_by(MovimientoInventario.residente_id, MovimientoInventario.producto_id)
+    )
+    consumo: Dict[int, List[Tuple[int, Decimal]]] = defaultdict(list)
+    for fila in result:
+        consumo[fila.residente_id].append((fila.producto_id, fila.cantidad))
+
+    # Residentes ya facturados en este periodo (corrida reanudada)
+    result = await db.execute(
+        select(Factura.residente_id)
+        .where(Factura.residente_id.in_(list(consumo)))
+        .where(Factura.periodo == corrida.periodo)
+    )
+    for residente_id in result.scalars():
+        consumo.pop(residente_id, None)
+
+    costos = await _costos_vigentes(db, {producto for lineas in consumo.values() for producto, _ in lineas})
+
+    detalles_por_residente: Dict[int, List[dict]] = {}
+    for residente_id, lineas in consumo.items():
+        detalles = []
+        for producto_id, cantidad in lineas:
+            if producto_id not in costos:
+                logger.warning(f"Producto {producto_id} sin costo de suministro: no se factura en {corrida.periodo}")
+                continue
+            suministro_id, costo = costos[producto_id]
+            detalles.append({
+                "suministro_id": suministro_id,
+                "cantidad": cantidad.quantize(CENTAVO, rounding=ROUND_HALF_UP),
+                "precio_unitario": costo,
+                "subtotal": (cantidad * costo).quantize(CENTAVO, rounding=ROUND_HALF_UP),
+            })
+        if detalles:
+            detalles_por_residente[residente_id] = detalles
+
+    generadas = 0
+    if detalles_por_residente:
+        vencimiento = datetime.now(timezone.utc) + timedelta(days=DIAS_VENCIMIENTO)
+        result = await db.execute(
+            sqlite_insert(Factura)
+            .on_conflict_do_nothing()
+            .returning(Factura.id, Factura.residente_id),
+            [
+                {
+                    "residente_id": residente_id,
+                    "periodo": corrida.periodo,
+                    "fecha_vencimiento": vencimiento,
+                    "total": sum((d["subtotal"] for d in detalles), Decimal("0")),
+                    "estado": EstadoFactura.PENDIENTE.value,
+                    "notas": f"Facturación mensual {corrida.periodo}",
+                }
+                for residente_id, detalles in detalles_por_residente.items()
+            ],
+        )
+        facturas = {fila.residente_id: fila.id for fila in result}
+        filas_detalle = [
+            dict(detalle, factura_id=factura_id)
+            for residente_id, factura_id in facturas.items()
+            for detalle in detalles_por_residente[residente_id]
+        ]
+        if filas_detalle:
+            await db.execute(insert(DetalleFactura), filas_detalle)
+        generadas = len(facturas)
+
+    await db.execute(
+        update(CorridaFacturacion)
+        .where(CorridaFacturacion.id == corrida.id)
+        .values(
+            ultimo_residente_id=residentes[-1],
+            residentes_procesados=CorridaFacturacion.residentes_procesados + len(residentes),
+            facturas_generadas=CorridaFacturacion.facturas_generadas + generadas,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+def _bloqueo(periodo: str) -> str:
+    return f"facturacion:{periodo}"
+
+async def ejecutar_corrida(periodo: str, propietario: str = programador.propietario) -> None:
+    inicio, fin = limites_periodo(periodo)
+    try:
+        while True:
+            async with AsyncSessionEscritura() as db:
+                # Ningún bloque se confirma sin el bloqueo: si venció y lo
+                # tomó otro worker, la corrida sigue allá
+                if not await tomar_bloqueo(db, _bloqueo(periodo), propietario, DURACION_BLOQUEO):
+                    logger.warning(f"La corrida de facturación {periodo} continúa en otro proceso")
+                    return
+                corrida = await db.scalar(select(CorridaFacturacion).where(CorridaFacturacion.periodo == periodo))
+                continua = await _procesar_bloque(db, corrida, inicio, fin)
+                if not continua:
+                    corrida.estado = EstadoCorrida.COMPLETADA.value
+                    corrida.fecha_fin = datetime.now(timezone.utc)
+                await db.commit()
+            if not continua:
+                break
+            # Ceder el escritor entre bloques a las peticiones en curso
+            await asyncio.sleep(0)
+    except Exception as e:
+        logger.exception(f"Falló la corrida de facturación {periodo}")
+        async with AsyncSessionEscritura() as db:
+            await db.execute(
+                update(CorridaFacturacion)
+                .where(CorridaFacturacion.periodo == periodo)
+                .values(estado=EstadoCorrida.FALLIDA.value, error=str(e))
+            )
+            await db.commit()
+    finally:
+        # Al terminar, fallar o cancelarse, la corrida se puede reanudar de inmediato
+        async with AsyncSessionEscritura() as db:
+            await liberar_bloqueo(db, _bloqueo(periodo), propietario)
+            await db.commit()
+
+async def iniciar_corrida(periodo: str) -> CorridaFacturacion:
+    # Crea la corrida del periodo o reanuda la existente. Una corrida
+    # completada, o en ejecución en este o en otro proceso, no se vuelve a
+    # ejecutar.
+    limites_periodo(periodo)
+    async with AsyncSessionEscritura() as db:
+        corrida = await db.scalar(select(CorridaFacturacion).where(CorridaFacturacion.periodo == periodo))
+        if corrida is not None and (corrida.estado == EstadoCorrida.COMPLETADA.value or periodo in _en_ejecucion):
+            return corrida
+        # El escritor serializa esta transacción con las de los demás
+        # workers: solo uno obtiene el bloqueo y crea o reanuda la corrida.
+        # El propietario es de esta corrida y no del proceso, así que dos
+        # solicitudes simultáneas al mismo worker tampoco la duplican.
+        propietario = f"{programador.propietario}:{uuid.uuid4().hex[:8]}"
+        if not await tomar_bloqueo(db, _bloqueo(periodo), propietario, DURACION_BLOQUEO):
+            return corrida
+        if corrida is None:
+            corrida = CorridaFacturacion(
+                periodo=periodo,
+                total_residentes=await db.scalar(
+                    select(func.count()).select_from(_residentes_facturables().subquery())
+                ),
+            )
+            db.add(corrida)
+
+        corrida.estado = EstadoCorrida.EN_PROCESO.value
+        corrida.error = None
+        await db.commit()
+        await db.refresh(corrida)
+
+    tarea = asyncio.create_task(ejecutar_corrida(periodo, propietario))
+    _en_ejecucion[periodo] = tarea
+    tarea.add_done_callback(lambda _: _en_ejecucion.pop(periodo, None))
+    return corrida
+
+async def detener_corridas() -> None:
+    # Al apagar, las corridas se cancelan; el bloque en curso se deshace
+    # y se reanudan con iniciar_corrida
+    for tarea in list(_en_ejecucion.values()):
+        tarea.cancel()
+    await asyncio.gather(*_en_ejecucion.values(), return_exceptions=True)
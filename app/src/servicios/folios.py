@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update, func, cast, literal, Integer
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.remisiones import Remision, ContadorRemision
+
+# Asignación de folios de remisión REM-YYYYMMDD-NNNN con un contador por día.
+# Debe llamarse dentro de la transacción que inserta la remisión (sesión de
+# escritura): el contador y la remisión se confirman o se deshacen juntos, y
+# BEGIN IMMEDIATE serializa a los procesos que asignan folios a la vez.
+
+def prefijo_remision(dia: str) -> str:
+    return f"REM-{dia}-"
+
+async def asignar_numero_remision(db: AsyncSession, fecha: Optional[datetime] = None) -> str:
+    dia = (fecha or datetime.now()).strftime('%Y%m%d')
+
+    # Caso común: el contador del día ya existe y se incrementa en una sentencia
+    result = await db.execute(
+        update(ContadorRemision)
+        .where(ContadorRemision.fecha == dia)
+        .values(ultimo=ContadorRemision.ultimo + 1)
+        .returning(ContadorRemision.ultimo)
+        .execution_options(synchronize_session=False)
+    )
+    numero = result.scalar_one_or_none()
+
+    if numero is None:
+        # Primer folio del día: se parte del mayor número ya usado ese día
+        # (remisiones creadas antes de existir el contador)
+        prefijo = prefijo_remision(dia)
+        semilla = (
+            select(
+                literal(dia),
+                func.coalesce(
+                    func.max(cast(func.substr(Remision.numero_remision, len(prefijo) + 1), Integer)), 0
+                ) + 1,
+            )
+            .where(Remision.numero_remision >= prefijo)
+            .where(Remision.numero_remision < prefijo[:-1] + ".")
+        )
+        sentencia = (
+            insert(ContadorRemision)
+            .from_select(["fecha", "ultimo"], semilla)
+            .on_conflict_do_update(
+                index_elements=[ContadorRemision.fecha],
+                set_={"ultimo": ContadorRemision.ultimo + 1},
+            )
+            .returning(ContadorRemision.ultimo)
+        )
+        numero = (await db.execute(sentencia)).scalar_one()
+
+    return f"{prefijo_remision(dia)}{numero:04d}"
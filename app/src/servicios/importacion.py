@@ -0,0 +1,304 @@
+import io
+import os
+import csv
+import json
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from typing import IO, Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from ..models.database import AsyncSessionEscritura
+from ..models.colaboradores import Colaborador
+from .sesiones import almacen_sesiones
+
+logger = logging.getLogger(__name__)
+
+# Importación masiva de catálogos (residentes, colaboradores, productos)
+# desde CSV, NDJSON o un arreglo JSON.
+#
+# El archivo se lee de forma incremental y se procesa en lotes de
+# TAMANO_LOTE filas: cada lote se valida con el esquema Pydantic de una sola
+# vez y se inserta o actualiza (UPSERT sobre la clave natural de la entidad)
+# en su propia transacción. La memoria depende del tamaño del lote y no del
+# archivo, y una fila inválida solo se anota en el reporte de errores.
+#
+# Las columnas ausentes o vacías de una fila no se sobrescriben al
+# actualizar un registro existente.
+TAMANO_LOTE = int(os.getenv("APS_IMPORTACION_LOTE", 500))
+TAMANO_LECTURA = 64 * 1024
+# Un elemento de un arreglo JSON más grande que esto se considera inválido
+# (evita cargar el resto del archivo buscando su cierre)
+MAXIMO_ELEMENTO_JSON = 1024 * 1024
+# Errores que se devuelven en la respuesta; los demás solo se cuentan
+MAXIMO_ERRORES_REPORTE = 1000
+
+FORMATOS = ("csv", "ndjson", "json")
+
+# Columnas de colaboradores que invalidan las sesiones abiertas al cambiar
+COLUMNAS_SESION = {"activo", "rol"}
+
+# (número de fila, datos, error de lectura)
+FilaLeida = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+class FormatoInvalido(ValueError):
+    pass
+
+class ErrorImportacion(BaseModel):
+    fila: int
+    clave: Optional[str] = None
+    errores: List[str]
+
+class ResultadoImportacion(BaseModel):
+    entidad: str
+    leidas: int = 0
+    insertadas: int = 0
+    actualizadas: int = 0
+    con_error: int = 0
+    # Error que detuvo la lectura del archivo; las filas anteriores se importaron
+    error_formato: Optional[str] = None
+    errores: List[ErrorImportacion] = []
+    errores_omitidos: int = 0
+
+class Entidad:
+    def __init__(
+        self,
+        nombre: str,
+        modelo,
+        esquema: Type[BaseModel],
+        clave: str,
+        solo_al_insertar: Optional[Dict[str, Any]] = None,
+    ):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.esquema = esquema
+        self.clave = clave
+        # Valores que solo se asignan a los registros nuevos
+        self.solo_al_insertar = solo_al_insertar or {}
+        # Modelo con la lista de filas de un lote: se valida todo el lote en
+        # una llamada (create_model existe en Pydantic 1 y 2)
+        self.lote = create_model(f"Lote{esquema.__name__}", filas=(List[esquema], ...))
+
+    @lru_cache(maxsize=32)
+    def sentencia(self, actualizables: FrozenSet[str]):
+        sentencia = insert(self.modelo)
+        columnas = {columna: sentencia.excluded[columna] for columna in actualizables}
+        # ON CONFLICT DO UPDATE no aplica los onupdate de las columnas
+        for columna in self.modelo.__table__.columns:
+            if columna.onupdate is not None and columna.onupdate.is_clause_element and columna.name not in columnas:
+                columnas[columna.name] = columna.onupdate.arg
+        return sentencia.on_conflict_do_update(index_elements=[self.clave], set_=columnas)
+
+# Lectores: generan (fila, datos, error) sin cargar el archivo completo
+
+def _texto(archivo: IO[bytes]) -> io.TextIOWrapper:
+    return io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+
+def leer_csv(archivo: IO[bytes]) -> Iterator[FilaLeida]:
+    lector = csv.DictReader(_texto(archivo))
+    for numero, fila in enumerate(lector, start=1):
+        if None in fila:
+            yield numero, None, "La fila tiene más columnas que el encabezado"
+            continue
+        # Las celdas vacías equivalen a campos no enviados
+        yield numero, {clave.strip(): valor for clave, valor in fila.items() if valor not in ("", None)}, None
+
+def leer_ndjson(archivo: IO[bytes]) -> Iterator[FilaLeida]:
+    for numero, linea in enumerate(_texto(archivo), start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(datos, dict):
+            yield numero, None, "Se esperaba un objeto JSON"
+            continue
+        yield numero, datos, None
+
+def leer_json(archivo: IO[bytes]) -> Iterator[FilaLeida]:
+    # Arreglo JSON leído por partes: cada elemento se decodifica con
+    # raw_decode en cuanto está completo en el búfer
+    texto = _texto(archivo)
+    decodificador = json.JSONDecoder()
+    bufer, pos, agotado = "", 0, False
+    estado = "inicio"
+    numero = 0
+
+    while True:
+        while pos < len(bufer) and bufer[pos].isspace():
+            pos += 1
+        if pos == len(bufer):
+            if agotado:
+                raise FormatoInvalido("El arreglo JSON está incompleto" if estado != "inicio" else "El archivo está vacío")
+            leido = texto.read(TAMANO_LECTURA)
+            bufer, pos, agotado = leido, 0, not leido
+            continue
+
+        caracter = bufer[pos]
+        if estado == "inicio":
+            if caracter != "[":
+                raise FormatoInvalido("Se esperaba un arreglo JSON")
+            pos += 1
+            estado = "primero"
+            continue
+        if caracter == "]" and estado in ("primero", "separador"):
+            return
+        if estado == "separador":
+            if caracter != ",":
+                raise FormatoInvalido(f"JSON inválido después del elemento {numero}")
+            pos += 1
+            estado = "elemento"
+            continue
+
+        try:
+            valor, fin = decodificador.raw_decode(bufer, pos)
+            # Un número al final del búfer puede seguir en la siguiente lectura
+            completo = agotado or fin < len(bufer)
+        except json.JSONDecodeError as e:
+            if agotado or len(bufer) - pos > MAXIMO_ELEMENTO_JSON:
+                raise FormatoInvalido(f"JSON inválido en el elemento {numero + 1}: {e.msg}")
+            completo = False
+        if not completo:
+            leido = texto.read(TAMANO_LECTURA)
+            bufer, pos, agotado = bufer[pos:] + leido, 0, not leido
+            continue
+
+        numero += 1
+        pos = fin
+        estado = "separador"
+        if isinstance(valor, dict):
+            yield numero, valor, None
+        else:
+            yield numero, None, "Se esperaba un objeto JSON"
+
+LECTORES: Dict[str, Callable[[IO[bytes]], Iterator[FilaLeida]]] = {
+    "csv": leer_csv,
+    "ndjson": leer_ndjson,
+    "json": leer_json,
+}
+
+def formato_por_nombre(nombre: Optional[str]) -> Optional[str]:
+    extension = (nombre or "").rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson", "json": "json"}.get(extension)
+
+# Importación por lotes
+
+class _Reporte:
+    def __init__(self, resultado: ResultadoImportacion, al_error: Optional[Callable[[ErrorImportacion], None]]):
+        self.resultado = resultado
+        self.al_error = al_error
+
+    def __call__(self, fila: int, clave, errores: List[str]):
+        error = ErrorImportacion(fila=fila, clave=None if clave is None else str(clave), errores=errores)
+        self.resultado.con_error += 1
+        if len(self.resultado.errores) < MAXIMO_ERRORES_REPORTE:
+            self.resultado.errores.append(error)
+        else:
+            self.resultado.errores_omitidos += 1
+        if self.al_error is not None:
+            self.al_error(error)
+
+def _validar(entidad: Entidad, lote: List[Tuple[int, dict]], reportar: _Reporte) -> List[Tuple[int, BaseModel]]:
+    # Valida el lote completo en una llamada; si hay errores se reportan
+    # las filas inválidas y se vuelve a validar el resto
+    try:
+        modelos = entidad.lote(filas=[datos for _, datos in lote]).filas
+    except ValidationError as e:
+        por_fila = defaultdict(list)
+        for error in e.errors():
+            _, indice, *ruta = error["loc"]
+            campo = ".".join(str(parte) for parte in ruta)
+            por_fila[indice].append(f"{campo}: {error['msg']}" if campo else error["msg"])
+        for indice, errores in sorted(por_fila.items()):
+            numero, datos = lote[indice]
+            reportar(numero, datos.get(entidad.clave), errores)
+        restantes = [fila for indice, fila in enumerate(lote) if indice not in por_fila]
+        return _validar(entidad, restantes, reportar) if restantes else []
+    return [(numero, modelo) for (numero, _), modelo in zip(lote, modelos)]
+
+async def _importar_lote(entidad: Entidad, lote: List[Tuple[int, dict]], resultado: ResultadoImportacion, reportar: _Reporte):
+    validos = []
+    for numero, modelo in _validar(entidad, lote, reportar):
+        valores = dict(modelo.dict(), **entidad.solo_al_insertar)
+        actualizables = frozenset(modelo.dict(exclude_unset=True)) - {entidad.clave}
+        validos.append((numero, valores, actualizables))
+    if not validos:
+        return
+
+    columna_clave = getattr(entidad.modelo, entidad.clave)
+    async with AsyncSessionEscritura() as db:
+        result = await db.execute(
+            select(columna_clave, entidad.modelo.id)
+            .where(columna_clave.in_({valores[entidad.clave] for _, valores, _ in validos}))
+        )
+        existentes = dict(result.all())
+
+        try:
+            async with db.begin_nested():
+                grupos = defaultdict(list)
+                for _, valores, actualizables in validos:
+                    grupos[actualizables].append(valores)
+                for actualizables, filas in grupos.items():
+                    await db.execute(entidad.sentencia(actualizables), filas)
+            aplicados = validos
+        except IntegrityError:
+            # Alguna fila choca con otra restricción única (p. ej. el correo
+            # de un colaborador): se repite el lote fila por fila
+            aplicados = []
+            for fila in validos:
+                numero, valores, actualizables = fila
+                try:
+                    async with db.begin_nested():
+                        await db.execute(entidad.sentencia(actualizables), [valores])
+                    aplicados.append(fila)
+                except IntegrityError as e:
+                    reportar(numero, valores[entidad.clave], [f"Restricción de la base de datos: {e.orig}"])
+        await db.commit()
+
+    vistas = set(existentes)
+    for _, valores, actualizables in aplicados:
+        clave = valores[entidad.clave]
+        if clave in vistas:
+            resultado.actualizadas += 1
+            if entidad.modelo is Colaborador and clave in existentes and actualizables & COLUMNAS_SESION:
+                # El UPSERT no dispara los eventos del ORM que cierran las sesiones
+                almacen_sesiones.invalidar_usuario(existentes[clave])
+        else:
+            resultado.insertadas += 1
+            vistas.add(clave)
+
+async def importar(
+    entidad: Entidad,
+    filas: Iterator[FilaLeida],
+    al_error: Optional[Callable[[ErrorImportacion], None]] = None,
+) -> ResultadoImportacion:
+    resultado = ResultadoImportacion(entidad=entidad.nombre)
+    reportar = _Reporte(resultado, al_error)
+    lote: List[Tuple[int, dict]] = []
+    try:
+        for numero, datos, error in filas:
+            resultado.leidas += 1
+            if error is not None:
+                reportar(numero, None, [error])
+                continue
+            lote.append((numero, datos))
+            if len(lote) >= TAMANO_LOTE:
+                await _importar_lote(entidad, lote, resultado, reportar)
+                lote = []
+    except (FormatoInvalido, csv.Error, UnicodeDecodeError) as e:
+        resultado.error_formato = str(e)
+        logger.warning(f"Importación de {entidad.nombre} detenida: {e}")
+    if lote:
+        await _importar_lote(entidad, lote, resultado, reportar)
+
+    logger.info(
+        f"Importación de {entidad.nombre}: {resultado.leidas} filas, {resultado.insertadas} insertadas, "
+        f"{resultado.actualizadas} actualizadas, {resultado.con_error} con error"
+    )
+    return resultado
@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Set
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.future import select
+
+from ..models.database import AsyncSessionLocal
+from ..models.inventario import Producto
+from ..models.residentes import Residente, EstadoResidente
+from ..models.remisiones import Remision, EstadoRemision
+from ..models.facturacion import Factura, EstadoFactura
+from .cambios import al_confirmar
+
+# Indicadores del panel principal. Cada grupo de contadores se calcula con
+# una consulta agregada y queda en memoria; solo se recalcula cuando se
+# confirma un cambio en sus tablas de origen o cuando vence su TTL (las
+# facturas pasan a vencidas con el paso del tiempo, sin escritura alguna).
+TTL_INDICADORES = float(os.getenv("APS_TTL_INDICADORES", 60))
+
+async def _inventario(db) -> Dict[str, Any]:
+    bajo_minimo = await db.scalar(
+        select(func.count()).select_from(Producto).where(Producto.stock_actual < Producto.stock_minimo)
+    )
+    return {"productos_bajo_minimo": bajo_minimo}
+
+async def _residentes(db) -> Dict[str, Any]:
+    result = await db.execute(
+        select(Residente.estado, func.count()).group_by(Residente.estado)
+    )
+    por_estado = {estado: total for estado, total in result}
+    return {
+        "residentes_activos": por_estado.get(EstadoResidente.ACTIVO, 0),
+        "residentes_hospitalizados": por_estado.get(EstadoResidente.HOSPITALIZADO, 0),
+    }
+
+async def _remisiones(db) -> Dict[str, Any]:
+    result = await db.execute(
+        select(Remision.estado, func.count())
+        .where(Remision.estado.in_([EstadoRemision.PROGRAMADA, EstadoRemision.EN_PROCESO]))
+        .group_by(Remision.estado)
+    )
+    por_estado = {estado: total for estado, total in result}
+    return {
+        "remisiones_programadas": por_estado.get(EstadoRemision.PROGRAMADA, 0),
+        "remisiones_en_proceso": por_estado.get(EstadoRemision.EN_PROCESO, 0),
+    }
+
+async def _facturas(db) -> Dict[str, Any]:
+    vencida = or_(
+        Factura.estado == EstadoFactura.VENCIDA.value,
+        and_(
+            Factura.estado == EstadoFactura.PENDIENTE.value,
+            Factura.fecha_vencimiento < datetime.now(timezone.utc),
+        ),
+    )
+    total, importe = (await db.execute(
+        select(func.count(), func.coalesce(func.sum(Factura.total), 0)).where(vencida)
+    )).one()
+    return {"facturas_vencidas": total, "importe_vencido": Decimal(str(importe))}
+
+# grupo -> (tablas de origen, función que lo calcula)
+GRUPOS: Dict[str, tuple] = {
+    "inventario": ({"productos"}, _inventario),
+    "residentes": ({"residentes"}, _residentes),
+    "remisiones": ({"remisiones"}, _remisiones),
+    "facturas": ({"facturas"}, _facturas),
+}
+
+class PanelIndicadores:
+    def __init__(self, grupos: Dict[str, tuple], ttl: float = TTL_INDICADORES):
+        self.grupos = grupos
+        self.ttl = ttl
+        self._valores: Dict[str, Dict[str, Any]] = {}
+        self._expira: Dict[str, float] = {}
+        # Se incrementa en cada invalidación: si cambia mientras se recalcula
+        # un grupo, el valor recién leído puede estar viejo y no se da por vigente
+        self._generacion: Dict[str, int] = {grupo: 0 for grupo in grupos}
+        self._lock = asyncio.Lock()
+        self.actualizado = None
+        # Cambia cada vez que se recalcula algún grupo (clave de los fragmentos del panel)
+        self.version = 0
+
+    def invalidar_tablas(self, tablas: Set[str]) -> None:
+        for grupo, (origen, _) in self.grupos.items():
+            if origen & tablas:
+                self._generacion[grupo] += 1
+                self._expira.pop(grupo, None)
+
+    def invalidar(self) -> None:
+        self.invalidar_tablas(set().union(*(origen for origen, _ in self.grupos.values())))
+
+    def _vencidos(self, ahora: float):
+        return [grupo for grupo in self.grupos if self._expira.get(grupo, 0) <= ahora]
+
+    async def obtener(self) -> Dict[str, Any]:
+        if self._vencidos(time.monotonic()):
+            # Un solo recálculo a la vez; las demás peticiones esperan el resultado
+            async with self._lock:
+                ahora = time.monotonic()
+                vencidos = self._vencidos(ahora)
+                if vencidos:
+                    async with AsyncSessionLocal() as db:
+                        for grupo in vencidos:
+                            generacion = self._generacion[grupo]
+                            self._valores[grupo] = await self.grupos[grupo][1](db)
+                            if generacion == self._generacion[grupo]:
+                                self._expira[grupo] = ahora + self.ttl
+                    self.actualizado = datetime.now(timezone.utc)
+                    self.version += 1
+
+        indicadores: Dict[str, Any] = {}
+        for valores in self._valores.values():
+            indicadores.update(valores)
+        indicadores["actualizado"] = self.actualizado
+        return indicadores
+
+panel_indicadores = PanelIndicadores(GRUPOS)
+al_confirmar(panel_indicadores.invalidar_tablas)
@@ -0,0 +1,56 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+# Límites de intentos de inicio de sesión (ventana deslizante en memoria)
+INTENTOS_POR_CUENTA = int(os.getenv("APS_INTENTOS_POR_CUENTA", 5))
+VENTANA_CUENTA = int(os.getenv("APS_VENTANA_CUENTA", 15 * 60))   # segundos
+INTENTOS_POR_IP = int(os.getenv("APS_INTENTOS_POR_IP", 30))
+VENTANA_IP = int(os.getenv("APS_VENTANA_IP", 60))                # segundos
+
+# Ventana deslizante por clave. Guarda como máximo `maximo_claves` claves y
+# descarta las menos recientes, así una inundación con IPs o correos
+# aleatorios no hace crecer la memoria sin límite.
+class LimitadorIntentos:
+    def __init__(self, limite: int, ventana: int, maximo_claves: int = 10000):
+        self.limite = limite
+        self.ventana = ventana
+        self.maximo_claves = maximo_claves
+        self._intentos: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _vigentes(self, clave: str, ahora: float) -> Deque[float]:
+        marcas = self._intentos.get(clave)
+        if marcas is None:
+            marcas = deque()
+            self._intentos[clave] = marcas
+            while len(self._intentos) > self.maximo_claves:
+                self._intentos.popitem(last=False)
+        else:
+            self._intentos.move_to_end(clave)
+        while marcas and ahora - marcas[0] >= self.ventana:
+            marcas.popleft()
+        return marcas
+
+    def reintentar_en(self, clave: str) -> Optional[int]:
+        # Segundos que faltan para poder intentar de nuevo, o None si se permite
+        with self._lock:
+            ahora = time.monotonic()
+            marcas = self._vigentes(clave, ahora)
+            if len(marcas) < self.limite:
+                return None
+            return max(1, int(self.ventana - (ahora - marcas[0])) + 1)
+
+    def registrar(self, clave: str) -> None:
+        with self._lock:
+            self._vigentes(clave, time.monotonic()).append(time.monotonic())
+
+    def reiniciar(self, clave: str) -> None:
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+# Por cuenta se cuentan solo los fallos; por IP, todos los intentos
+limitador_cuentas = LimitadorIntentos(INTENTOS_POR_CUENTA, VENTANA_CUENTA)
+limitador_ips = LimitadorIntentos(INTENTOS_POR_IP, VENTANA_IP)
@@ -0,0 +1,240 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .perfilador import Medicion, medir, al_consultar_fuera, excede_presupuesto
+
+# Métricas de rendimiento en memoria, expuestas en formato de texto de
+# Prometheus por GET /metrics. No requieren un colector externo: basta con
+# leer el endpoint. Cada worker de uvicorn lleva sus propias métricas.
+#
+# MiddlewareMetricas mide cada petición HTTP (latencia por ruta, peticiones
+# en curso, errores) y abre la medición del perfilador, que cuenta las
+# consultas de la petición y el tiempo que pasó en la base de datos.
+
+# Cubetas por defecto de los clientes de Prometheus, en segundos
+CUBETAS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_CONSULTAS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+# Etiqueta de las consultas hechas fuera de una petición (tareas programadas,
+# corridas de facturación, scripts)
+RUTA_FONDO = "(fondo)"
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _formatear_etiquetas(etiquetas: Etiquetas, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(str(valor))}"' for nombre, valor in pares) + "}"
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, valores: Dict[str, str]) -> Etiquetas:
+        return tuple((nombre, valores[nombre]) for nombre in self.etiquetas)
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"] + self._muestras()
+
+    def _muestras(self) -> List[str]:
+        raise NotImplementedError
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Etiquetas, float] = {}
+
+    def incrementar(self, cantidad: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(self._clave(etiquetas), 0)
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_formatear_etiquetas(clave)} {_numero(valor)}" for clave, valor in valores]
+
+class Indicador(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Etiquetas, float] = {}
+
+    def sumar(self, cantidad: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def fijar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(self._clave(etiquetas), 0)
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_formatear_etiquetas(clave)} {_numero(valor)}" for clave, valor in valores]
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (), cubetas=CUBETAS_DURACION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(sorted(cubetas))
+        # Por etiquetas: [conteo por cubeta (+Inf al final), suma, total]
+        self._series: Dict[Etiquetas, list] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect_left(self.cubetas, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.cubetas) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def total(self, **etiquetas) -> int:
+        serie = self._series.get(self._clave(etiquetas))
+        return serie[2] if serie else 0
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            series = sorted((clave, [list(serie[0]), serie[1], serie[2]]) for clave, serie in self._series.items())
+        lineas = []
+        for clave, (conteos, suma, total) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + (float("inf"),), conteos):
+                acumulado += conteo
+                lineas.append(f"{self.nombre}_bucket{_formatear_etiquetas(clave, ('le', _numero(limite)))} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_formatear_etiquetas(clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_formatear_etiquetas(clave)} {total}")
+        return lineas
+
+class Registro:
+    def __init__(self):
+        self.metricas: List[_Metrica] = []
+
+    def registrar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in self.metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+registro = Registro()
+
+peticiones = registro.registrar(Contador(
+    "aps_http_peticiones_total", "Peticiones HTTP atendidas", ("metodo", "ruta", "estado")))
+duracion_peticiones = registro.registrar(Histograma(
+    "aps_http_duracion_segundos", "Latencia de las peticiones HTTP hasta enviar la respuesta completa", ("metodo", "ruta")))
+en_curso = registro.registrar(Indicador(
+    "aps_http_en_curso", "Peticiones HTTP en curso", ("metodo",)))
+errores = registro.registrar(Contador(
+    "aps_http_errores_total", "Peticiones que terminaron en una excepción o con estado 5xx", ("metodo", "ruta")))
+consultas_peticion = registro.registrar(Histograma(
+    "aps_bd_consultas_por_peticion", "Consultas SQL ejecutadas por petición", ("metodo", "ruta"), CUBETAS_CONSULTAS))
+consultas = registro.registrar(Contador(
+    "aps_bd_consultas_total", "Consultas SQL ejecutadas", ("ruta",)))
+tiempo_bd = registro.registrar(Contador(
+    "aps_bd_duracion_segundos_total", "Tiempo acumulado en la base de datos", ("ruta",)))
+presupuestos_excedidos = registro.registrar(Contador(
+    "aps_bd_presupuesto_excedido_total", "Peticiones que superaron su presupuesto de consultas", ("metodo", "ruta")))
+
+@al_consultar_fuera
+def _consulta_de_fondo(duracion: float):
+    consultas.incrementar(ruta=RUTA_FONDO)
+    tiempo_bd.incrementar(duracion, ruta=RUTA_FONDO)
+
+def _plantilla_ruta(scope) -> str:
+    # Se etiqueta con la plantilla de la ruta (/inventario/productos/{producto_id})
+    # y no con la ruta concreta, para no crear una serie por identificador
+    ruta = scope.get("route")
+    if ruta is not None and getattr(ruta, "path", None):
+        return ruta.path
+    if scope.get("root_path"):
+        return scope["root_path"]
+    return "(sin ruta)"
+
+def _server_timing(medicion: Medicion, total: float) -> bytes:
+    return (
+        f'bd;dur={medicion.tiempo_bd * 1000:.1f};desc="{medicion.consultas} consultas", '
+        f"app;dur={total * 1000:.1f}"
+    ).encode("latin-1")
+
+class MiddlewareMetricas:
+    # Middleware ASGI puro: no envuelve la respuesta en memoria, así que
+    # también mide los flujos (SSE, exportaciones) hasta su último trozo
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        inicio = time.perf_counter()
+        estado = 500
+        en_curso.sumar(1, metodo=metodo)
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                encabezados = list(mensaje.get("headers", []))
+                encabezados.append((b"server-timing", _server_timing(medicion, time.perf_counter() - inicio)))
+                mensaje = dict(mensaje, headers=encabezados)
+            await send(mensaje)
+
+        fallo = False
+        try:
+            # La medición se cierra con el último trozo de la respuesta
+            with medir() as medicion:
+                await self.app(scope, receive, enviar)
+        except BaseException:
+            fallo = True
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            ruta = _plantilla_ruta(scope)
+            en_curso.sumar(-1, metodo=metodo)
+            peticiones.incrementar(metodo=metodo, ruta=ruta, estado=str(estado))
+            duracion_peticiones.observar(duracion, metodo=metodo, ruta=ruta)
+            consultas_peticion.observar(medicion.consultas, metodo=metodo, ruta=ruta)
+            if medicion.consultas:
+                consultas.incrementar(medicion.consultas, ruta=ruta)
+                tiempo_bd.incrementar(medicion.tiempo_bd, ruta=ruta)
+            if fallo or estado >= 500:
+                errores.incrementar(metodo=metodo, ruta=ruta)
+            if excede_presupuesto(metodo, ruta, medicion):
+                presupuestos_excedidos.incrementar(metodo=metodo, ruta=ruta)
@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from ..models.database import engine_async, engine_async_escritura, engine_sync
+
+logger = logging.getLogger(__name__)
+
+# Perfilador de consultas SQL sobre los eventos de cursor de SQLAlchemy.
+#
+# - Cada consulta se atribuye a la medición en curso (un ContextVar que abre
+#   el middleware de métricas por petición, o presupuesto_consultas en un
+#   bloque de código). SQLAlchemy propaga el contexto hasta los eventos del
+#   driver aiosqlite.
+# - Las consultas que tardan más de APS_CONSULTA_LENTA_MS se registran con
+#   su EXPLAIN QUERY PLAN.
+# - PRESUPUESTOS_CONSULTAS declara el máximo de consultas por endpoint; el
+#   middleware avisa cuando una petición lo excede y
+#   scripts/verificar_presupuestos.py falla si algún endpoint lo supera.
+UMBRAL_CONSULTA_LENTA = float(os.getenv("APS_CONSULTA_LENTA_MS", 100)) / 1000
+# Sentencias que se guardan por medición para explicar un exceso
+MAXIMO_SENTENCIAS = 50
+
+# Consultas máximas por petición, por (método, plantilla de la ruta). En las
+# escrituras cuentan el BEGIN IMMEDIATE del escritor y, tras el commit, el
+# BEGIN y el SELECT del refresh; en las lecturas condicionales, la consulta
+# de versiones_tablas. Los presupuestos no dependen del número de filas
+# (detalles de factura, eventos de seguimiento): un N+1 los rebasa.
+PRESUPUESTOS_CONSULTAS: Dict[Tuple[str, str], int] = {
+    ("GET", "/remisiones/{remision_id}"): 2,
+    ("GET", "/remisiones/{remision_id}/seguimiento"): 3,
+    ("GET", "/remisiones/{remision_id}/trazabilidad"): 2,
+    ("GET", "/remisiones/{remision_id}/expediente"): 3,
+    ("POST", "/remisiones/"): 7,
+    ("POST", "/remisiones/{remision_id}/seguimiento"): 5,
+    ("GET", "/inventario/productos/"): 2,
+    ("GET", "/inventario/productos/{producto_id}"): 2,
+    ("POST", "/inventario/movimientos/"): 5,
+    ("POST", "/facturacion/"): 10,
+    ("GET", "/facturacion/{factura_id}"): 1,
+    ("GET", "/dashboard/indicadores"): 4,
+    ("GET", "/buscar"): 1,
+    ("GET", "/alertas/"): 1,
+}
+
+class Medicion:
+    __slots__ = ("consultas", "tiempo_bd", "sentencias", "cerrada")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.sentencias: List[str] = []
+        # Las tareas creadas durante la petición heredan la medición; lo que
+        # consulten después de la respuesta cuenta como trabajo de fondo
+        self.cerrada = False
+
+    def registrar(self, sentencia: str, duracion: float):
+        self.consultas += 1
+        self.tiempo_bd += duracion
+        if len(self.sentencias) < MAXIMO_SENTENCIAS:
+            self.sentencias.append(sentencia)
+
+medicion_actual: ContextVar[Optional[Medicion]] = ContextVar("medicion_actual", default=None)
+
+# Consultas hechas fuera de una medición (tareas programadas, corridas de
+# facturación, scripts): se notifican a los suscriptores con su duración
+_suscriptores_fondo: List[Callable[[float], None]] = []
+
+def al_consultar_fuera(funcion: Callable[[float], None]) -> Callable[[float], None]:
+    _suscriptores_fondo.append(funcion)
+    return funcion
+
+class PresupuestoExcedido(AssertionError):
+    def __init__(self, descripcion: str, maximo: int, medicion: Medicion):
+        self.descripcion = descripcion
+        self.maximo = maximo
+        self.medicion = medicion
+        sentencias = "\n".join(f"  {i}. {' '.join(s.split())[:200]}" for i, s in enumerate(medicion.sentencias, 1))
+        super().__init__(f"{descripcion}: {medicion.consultas} consultas, presupuesto {maximo}\n{sentencias}")
+
+@contextmanager
+def medir() -> Iterator[Medicion]:
+    # Atribuye a una medición nueva las consultas del bloque (y de las tareas
+    # que se creen dentro de él). Al cerrarse se suman a la medición
+    # exterior, si la hay: un script que envuelve una petición en
+    # presupuesto_consultas ve las consultas que midió el middleware.
+    exterior = medicion_actual.get()
+    medicion = Medicion()
+    token = medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        medicion_actual.reset(token)
+        medicion.cerrada = True
+        if exterior is not None and not exterior.cerrada:
+            exterior.consultas += medicion.consultas
+            exterior.tiempo_bd += medicion.tiempo_bd
+
+@contextmanager
+def presupuesto_consultas(maximo: int, descripcion: str = "bloque") -> Iterator[Medicion]:
+    # Falla con PresupuestoExcedido si el bloque ejecuta más de `maximo`
+    # consultas. Las consultas también se suman a la medición exterior.
+    with medir() as medicion:
+        yield medicion
+    if medicion.consultas > maximo:
+        raise PresupuestoExcedido(descripcion, maximo, medicion)
+
+def excede_presupuesto(metodo: str, ruta: str, medicion: Medicion) -> bool:
+    maximo = PRESUPUESTOS_CONSULTAS.get((metodo, ruta))
+    if maximo is None or medicion.consultas <= maximo:
+        return False
+    logger.warning(str(PresupuestoExcedido(f"{metodo} {ruta}", maximo, medicion)))
+    return True
+
+def _explicar(conn, statement: str, parameters, executemany: bool) -> List[str]:
+    if statement.lstrip()[:6].upper() not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+        return []
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [fila[-1] for fila in cursor.fetchall()]
+    except Exception as e:
+        return [f"(no se pudo obtener el plan: {e})"]
+    finally:
+        cursor.close()
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("inicio_consultas")
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+
+    medicion = medicion_actual.get()
+    if medicion is not None and not medicion.cerrada:
+        medicion.registrar(statement, duracion)
+    else:
+        for funcion in _suscriptores_fondo:
+            funcion(duracion)
+
+    if duracion >= UMBRAL_CONSULTA_LENTA:
+        plan = "\n".join(f"    {linea}" for linea in _explicar(conn, statement, parameters, executemany))
+        logger.warning(f"Consulta lenta ({duracion * 1000:.1f} ms): {' '.join(statement.split())}\n{plan}")
+
+def _descartar_inicio(contexto):
+    # Una consulta que falla no llega a after_cursor_execute
+    inicios = contexto.connection.info.get("inicio_consultas") if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+def instrumentar_motor(motor) -> None:
+    event.listen(motor, "before_cursor_execute", _antes_de_consulta)
+    event.listen(motor, "after_cursor_execute", _despues_de_consulta)
+    event.listen(motor, "handle_error", _descartar_inicio)
+
+for _motor in (engine_async.sync_engine, engine_async_escritura.sync_engine, engine_sync):
+    instrumentar_motor(_motor)
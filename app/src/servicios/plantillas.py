@@ -0,0 +1,74 @@
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from .cache import CacheLectura, AUSENTE, registrar_cache
+from .estaticos import asset
+
+# Entorno Jinja2 único para toda la aplicación: las plantillas (base.html
+# sobre todo) se compilan una sola vez por worker y no una vez por módulo de
+# rutas. El código compilado se guarda además en disco, así que un worker
+# nuevo carga el bytecode en vez de volver a analizar las plantillas; Jinja
+# lo descarta solo cuando cambia el fuente de la plantilla.
+#
+# Fragmentos en caché: los bloques caros que no dependen del usuario concreto
+# se envuelven en
+#
+#   {% fragmento "navegacion", usuario.rol.value %} ... {% endfragmento %}
+#
+# y su HTML se guarda por plantilla, nombre y valores de la clave. La clave
+# debe incluir todo lo que cambia el bloque (el rol, la versión de los datos):
+# los fragmentos no se invalidan por escrituras, solo dejan de usarse.
+DIRECTORIO_PLANTILLAS = Path(__file__).resolve().parent.parent / "templates"
+# Vacío desactiva la caché de bytecode
+DIRECTORIO_BYTECODE = os.getenv("APS_CACHE_PLANTILLAS", os.path.join(tempfile.gettempdir(), "aps-plantillas"))
+# En producción no hace falta revisar en cada render si cambió el archivo
+RECARGAR_PLANTILLAS = os.getenv("APS_PLANTILLAS_RECARGAR", "1") == "1"
+MAXIMO_FRAGMENTOS = int(os.getenv("APS_FRAGMENTOS_MAXIMO", 500))
+
+cache_fragmentos = registrar_cache(CacheLectura("fragmentos", set(), maximo=MAXIMO_FRAGMENTOS))
+
+class ExtensionFragmentos(Extension):
+    tags = {"fragmento"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        clave = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            clave.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(("name:endfragmento",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_renderizar", [nodes.Tuple(clave, "load")]), [], [], cuerpo
+        ).set_lineno(lineno)
+
+    def _renderizar(self, clave, caller):
+        html = cache_fragmentos.buscar(clave)
+        if html is AUSENTE:
+            generacion = cache_fragmentos.generacion
+            html = caller()
+            cache_fragmentos.guardar(clave, html, generacion)
+        return html
+
+def crear_plantillas(directorio_bytecode: str = DIRECTORIO_BYTECODE) -> Jinja2Templates:
+    opciones = {"extensions": [ExtensionFragmentos], "auto_reload": RECARGAR_PLANTILLAS}
+    if directorio_bytecode:
+        os.makedirs(directorio_bytecode, exist_ok=True)
+        opciones["bytecode_cache"] = FileSystemBytecodeCache(directorio_bytecode)
+    plantillas = Jinja2Templates(directory=str(DIRECTORIO_PLANTILLAS), **opciones)
+    # URL con huella de los archivos estáticos (ver servicios/estaticos.py)
+    plantillas.env.globals["asset"] = asset
+    return plantillas
+
+templates = crear_plantillas()
+
+def precompilar() -> int:
+    # Carga todas las plantillas al arrancar para que la primera petición no
+    # pague la compilación (o la lectura del bytecode)
+    nombres = templates.env.list_templates(extensions=["html"])
+    for nombre in nombres:
+        templates.get_template(nombre)
+    return len(nombres)
@@ -0,0 +1,162 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.database import AsyncSessionEscritura
+from ..models.tareas import BloqueoTarea
+
+logger = logging.getLogger(__name__)
+
+# Programador de tareas en el mismo proceso. Cada tarea corre en su propio
+# bucle asyncio y, en cada intervalo, pide su turno en bloqueos_tareas: con
+# varios workers de uvicorn solo uno la ejecuta por intervalo. Si ese worker
+# muere, otro toma el turno cuando expira.
+#
+# APS_PROGRAMADOR=0 desactiva el programador (p. ej. en scripts) y
+# APS_INTERVALO_<TAREA> cambia el intervalo en segundos de una tarea.
+PROGRAMADOR_ACTIVO = os.getenv("APS_PROGRAMADOR", "1") != "0"
+
+# El turno dura un poco menos que el intervalo para que el mismo worker lo
+# renueve a tiempo en la siguiente vuelta
+FRACCION_TURNO = 0.9
+
+FuncionTarea = Callable[[AsyncSession], Awaitable[Optional[Dict[str, Any]]]]
+
+async def tomar_bloqueo(db: AsyncSession, nombre: str, propietario: str, segundos: float) -> bool:
+    # Toma o renueva el bloqueo `nombre` en la transacción de `db`: se obtiene
+    # si no existe, si ya venció o si ya es de `propietario`. El commit queda
+    # a cargo de quien llama.
+    ahora = datetime.now(timezone.utc)
+    sentencia = insert(BloqueoTarea).values(
+        nombre=nombre, propietario=propietario, expira=ahora + timedelta(seconds=segundos)
+    )
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=[BloqueoTarea.nombre],
+        set_={"propietario": sentencia.excluded.propietario, "expira": sentencia.excluded.expira},
+        where=or_(BloqueoTarea.expira < ahora, BloqueoTarea.propietario == propietario),
+    ).returning(BloqueoTarea.propietario)
+    return (await db.execute(sentencia)).scalar_one_or_none() is not None
+
+async def liberar_bloqueo(db: AsyncSession, nombre: str, propietario: str) -> None:
+    await db.execute(
+        delete(BloqueoTarea)
+        .where(BloqueoTarea.nombre == nombre)
+        .where(BloqueoTarea.propietario == propietario)
+    )
+
+class Tarea:
+    def __init__(self, nombre: str, intervalo: float, funcion: FuncionTarea):
+        self.nombre = nombre
+        self.intervalo = float(os.getenv(f"APS_INTERVALO_{nombre.upper()}", intervalo))
+        self.funcion = funcion
+        self.ejecuciones = 0
+        self.omitidas = 0
+        self.fallos = 0
+        self.duracion_total = 0.0
+        self.duracion_maxima = 0.0
+        self.ultima_duracion: Optional[float] = None
+        self.ultima_ejecucion: Optional[datetime] = None
+        self.ultimo_resultado: Optional[Dict[str, Any]] = None
+        self.ultimo_error: Optional[str] = None
+
+    def registrar(self, duracion: float, resultado=None, error: Optional[str] = None):
+        self.ejecuciones += 1
+        self.duracion_total += duracion
+        self.duracion_maxima = max(self.duracion_maxima, duracion)
+        self.ultima_duracion = duracion
+        self.ultima_ejecucion = datetime.now(timezone.utc)
+        if error is None:
+            self.ultimo_resultado = resultado
+        else:
+            self.fallos += 1
+            self.ultimo_error = error
+
+    def metricas(self) -> Dict[str, Any]:
+        def ms(segundos):
+            return round(segundos * 1000, 2) if segundos is not None else None
+        return {
+            "intervalo": self.intervalo,
+            "ejecuciones": self.ejecuciones,
+            "omitidas": self.omitidas,
+            "fallos": self.fallos,
+            "ultima_duracion_ms": ms(self.ultima_duracion),
+            "promedio_ms": ms(self.duracion_total / self.ejecuciones) if self.ejecuciones else None,
+            "maxima_ms": ms(self.duracion_maxima) if self.ejecuciones else None,
+            "ultima_ejecucion": self.ultima_ejecucion,
+            "ultimo_resultado": self.ultimo_resultado,
+            "ultimo_error": self.ultimo_error,
+        }
+
+class Programador:
+    def __init__(self):
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.tareas: Dict[str, Tarea] = {}
+        self._bucles: List[asyncio.Task] = []
+
+    def tarea(self, nombre: str, intervalo: float):
+        def registrar(funcion: FuncionTarea) -> FuncionTarea:
+            if nombre in self.tareas:
+                raise ValueError(f"Tarea {nombre} duplicada")
+            self.tareas[nombre] = Tarea(nombre, intervalo, funcion)
+            return funcion
+        return registrar
+
+    async def _tomar_turno(self, tarea: Tarea) -> bool:
+        async with AsyncSessionEscritura() as db:
+            obtenido = await tomar_bloqueo(db, tarea.nombre, self.propietario, tarea.intervalo * FRACCION_TURNO)
+            await db.commit()
+        return obtenido
+
+    async def ejecutar(self, nombre: str) -> bool:
+        # Ejecuta la tarea si este proceso obtiene el turno; devuelve si corrió
+        tarea = self.tareas[nombre]
+        if not await self._tomar_turno(tarea):
+            tarea.omitidas += 1
+            return False
+
+        inicio = time.perf_counter()
+        try:
+            async with AsyncSessionEscritura() as db:
+                resultado = await tarea.funcion(db)
+                await db.commit()
+        except Exception as e:
+            logger.exception(f"Falló la tarea programada {nombre}")
+            tarea.registrar(time.perf_counter() - inicio, error=str(e))
+        else:
+            tarea.registrar(time.perf_counter() - inicio, resultado)
+        return True
+
+    async def _bucle(self, tarea: Tarea):
+        while True:
+            try:
+                await self.ejecutar(tarea.nombre)
+            except Exception:
+                # Falla al pedir el turno (p. ej. base de datos ocupada); se
+                # intenta de nuevo en el siguiente intervalo
+                logger.exception(f"No se pudo programar la tarea {tarea.nombre}")
+            await asyncio.sleep(tarea.intervalo)
+
+    def iniciar(self):
+        if not PROGRAMADOR_ACTIVO or self._bucles:
+            return
+        self._bucles = [asyncio.create_task(self._bucle(tarea)) for tarea in self.tareas.values()]
+
+    async def detener(self):
+        for bucle in self._bucles:
+            bucle.cancel()
+        await asyncio.gather(*self._bucles, return_exceptions=True)
+        self._bucles = []
+
+    def metricas(self) -> Dict[str, Dict[str, Any]]:
+        return {nombre: tarea.metricas() for nombre, tarea in self.tareas.items()}
+
+programador = Programador()
@@ -0,0 +1,160 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import event, inspect
+
+from ..models.colaboradores import Colaborador, RolAcceso
+
+logger = logging.getLogger(__name__)
+
+# La clave firma los tokens de sesión. Con varios workers de uvicorn debe
+# definirse APS_CLAVE_SECRETA para que todos acepten los mismos tokens.
+CLAVE_SECRETA = os.getenv("APS_CLAVE_SECRETA")
+if not CLAVE_SECRETA:
+    CLAVE_SECRETA = secrets.token_hex(32)
+    logger.warning("APS_CLAVE_SECRETA no definida: las sesiones no sobrevivirán a un reinicio")
+
+DURACION_SESION = int(os.getenv("APS_DURACION_SESION", 8 * 60 * 60))  # segundos
+MAXIMO_SESIONES = int(os.getenv("APS_MAXIMO_SESIONES", 5000))
+# Cada cuánto se vuelve a comprobar en la base una sesión del almacén: acota
+# lo que un worker sigue aceptando un token que otro worker ya revocó
+REVALIDAR_SESION = int(os.getenv("APS_REVALIDAR_SESION", 60))  # segundos
+NOMBRE_COOKIE = "sesion"
+
+class UsuarioSesion(BaseModel):
+    # Lo mínimo que necesitan las páginas autenticadas para identificar al usuario
+    id: int
+    nombre: str
+    correo: str
+    rol: RolAcceso
+
+    @classmethod
+    def desde_colaborador(cls, colaborador: Colaborador) -> "UsuarioSesion":
+        return cls(
+            id=colaborador.id,
+            nombre=f"{colaborador.nombre} {colaborador.apellido_paterno}",
+            correo=colaborador.correo,
+            rol=colaborador.rol,
+        )
+
+def _firmar(contenido: str) -> str:
+    return hmac.new(CLAVE_SECRETA.encode(), contenido.encode(), hashlib.sha256).hexdigest()
+
+def emitir_token(usuario_id: int, emitido: int) -> str:
+    # Formato: <usuario_id>.<emitido>.<nonce>.<firma>
+    contenido = f"{usuario_id}.{emitido}.{secrets.token_urlsafe(16)}"
+    return f"{contenido}.{_firmar(contenido)}"
+
+def leer_token(token: str) -> Optional[Tuple[int, int]]:
+    # Devuelve (usuario_id, emitido) si la firma es válida y no ha expirado
+    try:
+        contenido, firma = token.rsplit(".", 1)
+        usuario_id, emitido, _ = contenido.split(".", 2)
+        usuario_id, emitido = int(usuario_id), int(emitido)
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(firma, _firmar(contenido)):
+        return None
+    if time.time() - emitido > DURACION_SESION:
+        return None
+    return usuario_id, emitido
+
+# Almacén en memoria de sesiones con expiración (TTL) y desalojo LRU. Una
+# entrada se da por buena sin consultar la base durante `revalidar` segundos;
+# después obtener() devuelve None y la sesión se vuelve a validar.
+class AlmacenSesiones:
+    def __init__(self, duracion: int = DURACION_SESION, maximo: int = MAXIMO_SESIONES,
+                 revalidar: int = REVALIDAR_SESION):
+        self.duracion = duracion
+        self.maximo = maximo
+        self.revalidar = revalidar
+        self._sesiones: "OrderedDict[str, Tuple[UsuarioSesion, float, float]]" = OrderedDict()
+        self._por_usuario: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def guardar(self, token: str, usuario: UsuarioSesion, emitido: float) -> None:
+        with self._lock:
+            self._sesiones[token] = (usuario, emitido + self.duracion, time.time() + self.revalidar)
+            self._sesiones.move_to_end(token)
+            self._por_usuario.setdefault(usuario.id, set()).add(token)
+            while len(self._sesiones) > self.maximo:
+                antiguo, _ = next(iter(self._sesiones.items()))
+                self._quitar(antiguo)
+
+    def obtener(self, token: str) -> Optional[UsuarioSesion]:
+        with self._lock:
+            entrada = self._sesiones.get(token)
+            if entrada is None:
+                return None
+            usuario, expira, revalidar_en = entrada
+            ahora = time.time()
+            if ahora >= expira:
+                self._quitar(token)
+                return None
+            if ahora >= revalidar_en:
+                return None
+            self._sesiones.move_to_end(token)
+            return usuario
+
+    def eliminar(self, token: str) -> None:
+        with self._lock:
+            self._quitar(token)
+
+    def invalidar_usuario(self, usuario_id: int) -> None:
+        # Cierra todas las sesiones abiertas de un colaborador
+        with self._lock:
+            for token in list(self._por_usuario.get(usuario_id, ())):
+                self._quitar(token)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._sesiones.clear()
+            self._por_usuario.clear()
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+    def _quitar(self, token: str) -> None:
+        entrada = self._sesiones.pop(token, None)
+        if entrada is None:
+            return
+        tokens = self._por_usuario.get(entrada[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._por_usuario[entrada[0].id]
+
+almacen_sesiones = AlmacenSesiones()
+
+def crear_sesion(colaborador: Colaborador) -> str:
+    # Emite el token firmado y guarda el usuario en el almacén. Un inicio de
+    # sesión en el mismo segundo que un cierre no debe nacer ya revocado.
+    emitido = max(int(time.time()), colaborador.sesiones_validas_desde or 0)
+    token = emitir_token(colaborador.id, emitido)
+    almacen_sesiones.guardar(token, UsuarioSesion.desde_colaborador(colaborador), emitido)
+    return token
+
+def sesion_revocada(emitido: int, colaborador: Colaborador) -> bool:
+    return emitido < (colaborador.sesiones_validas_desde or 0)
+
+# Invalidar sesiones cuando se desactiva un colaborador o cambia su rol.
+# Los UPDATE masivos (update(Colaborador)...) no disparan estos eventos y
+# deben llamar a almacen_sesiones.invalidar_usuario explícitamente.
+@event.listens_for(Colaborador, "after_update")
+def _colaborador_actualizado(mapper, connection, target):
+    estado = inspect(target)
+    if estado.attrs.activo.history.has_changes() or estado.attrs.rol.history.has_changes():
+        almacen_sesiones.invalidar_usuario(target.id)
+
+@event.listens_for(Colaborador, "after_delete")
+def _colaborador_eliminado(mapper, connection, target):
+    almacen_sesiones.invalidar_usuario(target.id)
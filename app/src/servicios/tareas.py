@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import update, literal, and_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.future import select
+
+from ..models.facturacion import Factura, EstadoFactura
+from ..models.inventario import Producto, Suministro, EstadoSuministro
+from ..models.tareas import Alerta, TipoAlerta
+from .programador import programador
+
+# Tareas programadas. Cada una es un puñado de sentencias sobre conjuntos
+# (UPDATE / INSERT ... SELECT), sin recorrer filas en Python, y devuelve
+# cuántas filas cambió para las métricas del programador.
+
+ESTADOS_SIN_ENTREGAR = [EstadoSuministro.PENDIENTE, EstadoSuministro.PROCESANDO, EstadoSuministro.ENVIADO]
+
+async def _sincronizar_alertas(db, tipo: TipoAlerta, candidatos, mensaje, ahora: datetime):
+    # Abre una alerta por cada referencia que cumple la condición y resuelve
+    # las abiertas que ya no la cumplen
+    referencia = candidatos.selected_columns[0]
+    nuevas = await db.execute(
+        insert(Alerta)
+        .from_select(
+            ["tipo", "referencia_id", "mensaje", "resuelta", "fecha_creacion"],
+            candidatos.with_only_columns(
+                literal(tipo.value), referencia, mensaje, literal(False), literal(ahora)
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+    resueltas = await db.execute(
+        update(Alerta)
+        .where(Alerta.tipo == tipo.value)
+        .where(Alerta.resuelta == False)
+        .where(Alerta.referencia_id.not_in(candidatos))
+        .values(resuelta=True, fecha_resolucion=ahora)
+        .execution_options(synchronize_session=False)
+    )
+    return {"alertas_nuevas": nuevas.rowcount, "alertas_resueltas": resueltas.rowcount}
+
+@programador.tarea("facturas_vencidas", intervalo=300)
+async def marcar_facturas_vencidas(db):
+    result = await db.execute(
+        update(Factura)
+        .where(Factura.estado == EstadoFactura.PENDIENTE.value)
+        .where(Factura.fecha_vencimiento < datetime.now(timezone.utc))
+        .values(estado=EstadoFactura.VENCIDA.value)
+        .execution_options(synchronize_session=False)
+    )
+    return {"facturas_vencidas": result.rowcount}
+
+@programador.tarea("stock_bajo", intervalo=60)
+async def alertar_stock_bajo(db):
+    candidatos = select(Producto.id).where(Producto.stock_actual < Producto.stock_minimo)
+    mensaje = literal("Stock por debajo del mínimo: ") + Producto.codigo + literal(" ") + Producto.nombre
+    return await _sincronizar_alertas(db, TipoAlerta.STOCK_BAJO, candidatos, mensaje, datetime.now(timezone.utc))
+
+@programador.tarea("entregas_atrasadas", intervalo=300)
+async def alertar_entregas_atrasadas(db):
+    ahora = datetime.now(timezone.utc)
+    candidatos = select(Suministro.id).where(and_(
+        Suministro.fecha_entrega_real.is_(None),
+        Suministro.fecha_entrega_estimada < ahora,
+        Suministro.estado.in_(ESTADOS_SIN_ENTREGAR),
+    ))
+    mensaje = literal("Entrega atrasada del proveedor ") + Suministro.proveedor
+    return await _sincronizar_alertas(db, TipoAlerta.ENTREGA_ATRASADA, candidatos, mensaje, ahora)
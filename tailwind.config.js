@@ -0,0 +1,14 @@
+/** @type {import('tailwindcss').Config} */
+// Usado por app/src/scripts/construir_estaticos.py: solo se generan las
+// clases que aparecen en las plantillas.
+module.exports = {
+  content: ["./app/src/templates/**/*.html"],
+  corePlugins: {
+    // Bootstrap ya trae su propio reset
+    preflight: false,
+  },
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};